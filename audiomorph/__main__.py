@@ -0,0 +1,8 @@
+import sys
+
+from audiomorph.cli import main
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
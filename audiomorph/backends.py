@@ -0,0 +1,366 @@
+import shutil
+import threading
+
+from audiomorph import engine, metrics, pipes, probe, results
+from audiomorph.config import DEFAULT_BACKEND, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+DITHER_OPTIONS = ":dither_method=triangular"
+# What FFmpeg assumes for files that only give a number of channels
+DEFAULT_LAYOUTS = {
+    1: "mono", 2: "stereo", 3: "2.1", 4: "4.0", 5: "5.0", 6: "5.1",
+    7: "6.1", 8: "7.1",
+}
+
+
+class BackendError(Exception):
+    pass
+
+
+class ConversionCancelled(Exception):
+    pass
+
+
+class Backend:
+    name = ""
+    description = ""
+    # Whether conversions can write the input's samples to a pipe for
+    # waveform peaks
+    peak_tap = False
+
+    def available(self):
+        return True
+
+    def version(self):
+        raise NotImplementedError
+
+    def probe(self, input_file: str):
+        raise NotImplementedError
+
+    def run(
+        self, plan: engine.ConversionPlan, progress: callable = None,
+        cancelled: threading.Event = None
+    ):
+        # Returns the return code and log engine.finish_conversion checks
+        raise NotImplementedError
+
+    async def run_async(
+        self, plan: engine.ConversionPlan, progress: callable = None
+    ):
+        # Only the scheduler runs this; the GUI lists backends without
+        # loading asyncio
+        import asyncio
+
+        cancelled = threading.Event()
+        task = asyncio.ensure_future(
+            asyncio.to_thread(self.run, plan, progress, cancelled)
+        )
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            cancelled.set()
+            # The outputs can only be removed once the thread closed them
+            try:
+                await task
+            except (ConversionCancelled, engine.ConversionError):
+                pass
+            raise
+
+
+def pass_fds(plan: engine.ConversionPlan):
+    return plan.peaks.pass_fds if plan.peaks is not None else ()
+
+
+class FFmpegBackend(Backend):
+    name = "ffmpeg"
+    description = "FFmpeg and FFprobe processes"
+    peak_tap = True
+
+    def available(self):
+        return shutil.which(FFMPEG_PATH) is not None
+
+    def version(self):
+        return results.get_ffmpeg_version()
+
+    def probe(self, input_file: str):
+        return probe.probe(input_file)
+
+    def run(
+        self, plan: engine.ConversionPlan, progress: callable = None,
+        cancelled: threading.Event = None
+    ):
+        # Only run_async can stop a running FFmpeg, by killing it
+        log = pipes.LogBuffer()
+        return engine.run_ffmpeg(
+            plan.arguments, plan.duration, progress, log, pass_fds(plan)
+        ), log
+
+    async def run_async(
+        self, plan: engine.ConversionPlan, progress: callable = None
+    ):
+        from audiomorph import scheduler
+
+        log = pipes.LogBuffer()
+        return await scheduler.run_ffmpeg(
+            plan.arguments, plan.duration, progress, log, pass_fds(plan)
+        ), log
+
+
+def copy_packet(packet):
+    import av
+
+    duplicate = av.Packet(bytes(packet))
+    duplicate.pts = packet.pts
+    duplicate.dts = packet.dts
+    duplicate.duration = packet.duration
+    duplicate.time_base = packet.time_base
+    duplicate.is_keyframe = packet.is_keyframe
+    return duplicate
+
+
+class PyAVOutput:
+    def __init__(self, container, stream, graph):
+        self.container = container
+        self.stream = stream
+        self.graph = graph
+
+    def mux(self, packets: list):
+        for packet in packets:
+            self.container.mux(packet)
+
+    def encode(self, frame):
+        # None flushes the resampler and then the encoder
+        self.graph.push(frame)
+        while True:
+            try:
+                self.mux(self.stream.encode(self.graph.pull()))
+            except (BlockingIOError, EOFError):
+                break
+        if frame is None:
+            self.mux(self.stream.encode(None))
+
+
+class PyAVBackend(Backend):
+    name = "pyav"
+    description = "libav in this process through PyAV"
+
+    def __init__(self):
+        # Encoder capabilities, looked up once per batch instead of per file.
+        # The encoders themselves are opened for every file: none of the
+        # audio encoders can be reset once drained at the end of one, and
+        # without draining FLAC, MP3 and AAC lose their last samples.
+        self.encoders = {}
+        self.lock = threading.Lock()
+
+    def available(self):
+        try:
+            import av
+        except ImportError:
+            return False
+        return True
+
+    def version(self):
+        import av
+
+        libavcodec = ".".join(map(str, av.library_versions["libavcodec"]))
+        return f"PyAV {av.__version__} libavcodec {libavcodec}"
+
+    def probe(self, input_file: str):
+        import av
+
+        try:
+            with av.open(input_file) as container:
+                stream = container.streams.audio[0]
+                if container.duration is not None:
+                    duration = container.duration / av.time_base
+                elif stream.duration is not None:
+                    duration = float(stream.duration * stream.time_base)
+                else:
+                    duration = 0.0
+                return probe.ProbeInfo(
+                    duration, stream.codec_context.codec.canonical_name,
+                    stream.rate, stream.layout.nb_channels,
+                    stream.bit_rate or container.bit_rate or 0
+                )
+        except (av.FFmpegError, IndexError):
+            raise probe.ProbeError(f"Could not probe {input_file}")
+
+    def encoder(self, codec_name: str):
+        import av
+
+        with self.lock:
+            if codec_name not in self.encoders:
+                codec = av.Codec(codec_name, "w")
+                self.encoders[codec_name] = (
+                    codec.name,
+                    [sample_format.name for sample_format in (
+                        codec.audio_formats or ()
+                    )],
+                    list(codec.audio_rates or ())
+                )
+            return self.encoders[codec_name]
+
+    def sample_format(self, input_format, formats: list):
+        import av
+
+        if len(formats) == 0 or input_format.name in formats:
+            return input_format.name
+        # Like FFmpeg's format negotiation: the planar or packed twin, then
+        # the closest sample size
+        counterparts = (input_format.packed.name, input_format.planar.name)
+        return min(formats, key=lambda name: (
+            name not in counterparts,
+            abs(av.AudioFormat(name).bytes - input_format.bytes),
+            formats.index(name)
+        ))
+
+    def open_output(
+        self, input_container, input_stream, output_file: str, mode: str,
+        dither: bool, channels: int = None
+    ):
+        import av
+
+        container = av.open(output_file, "w")
+        try:
+            container.metadata.update(input_container.metadata)
+            if mode == engine.COPY_MODE:
+                return PyAVOutput(
+                    container,
+                    container.add_stream_from_template(input_stream), None
+                )
+            codec_name, formats, rates = self.encoder(
+                container.default_audio_codec
+            )
+            rate = input_stream.rate
+            if len(rates) > 0 and rate not in rates:
+                rate = min(rates, key=lambda value: abs(value - rate))
+            sample_format = self.sample_format(input_stream.format, formats)
+            layout = input_stream.layout
+            if channels is not None:
+                layout = av.AudioLayout(DEFAULT_LAYOUTS[channels])
+            elif layout.name == f"{layout.nb_channels} channels":
+                layout = av.AudioLayout(
+                    DEFAULT_LAYOUTS.get(layout.nb_channels, layout.name)
+                )
+            stream = container.add_stream(codec_name, rate=rate)
+            stream.layout = layout
+            stream.format = sample_format
+            stream.metadata.update(input_stream.metadata)
+            stream.codec_context.open()
+
+            graph = av.filter.Graph()
+            options = f"osf={sample_format}:osr={rate}:ochl={layout.name}"
+            resampler = graph.add(
+                "aresample", options + (DITHER_OPTIONS if dither else "")
+            )
+            graph.add_abuffer(template=input_stream).link_to(resampler)
+            resampler.link_to(graph.add("abuffersink"))
+            graph.configure()
+            if stream.codec_context.frame_size > 0:
+                graph.set_audio_frame_size(stream.codec_context.frame_size)
+            return PyAVOutput(container, stream, graph)
+        except Exception:
+            container.close()
+            raise
+
+    def run(
+        self, plan: engine.ConversionPlan, progress: callable = None,
+        cancelled: threading.Event = None
+    ):
+        import av
+
+        outputs = []
+        try:
+            with av.open(plan.input_file) as input_container:
+                input_stream = input_container.streams.audio[0]
+                for output_file, mode in zip(plan.output_files, plan.modes):
+                    if mode != engine.CACHED_MODE:
+                        outputs.append(self.open_output(
+                            input_container, input_stream, output_file,
+                            mode, plan.dither, plan.channels
+                        ))
+                with metrics.span("encode"):
+                    self.transcode(
+                        plan, input_container, input_stream, outputs,
+                        progress, cancelled
+                    )
+        except (av.FFmpegError, IndexError, ValueError) as error:
+            raise engine.ConversionError(
+                f"Could not convert {plan.input_file}: {error}"
+            )
+        finally:
+            for output in outputs:
+                output.container.close()
+        return 0, pipes.LogBuffer()
+
+    def transcode(
+        self, plan: engine.ConversionPlan, input_container, input_stream,
+        outputs: list, progress: callable, cancelled: threading.Event
+    ):
+        encoded = [output for output in outputs if output.graph is not None]
+        copied = [output for output in outputs if output.graph is None]
+        total_length = max(plan.duration, 0.001)
+        last_percent = -1
+        for packet in input_container.demux(input_stream):
+            if cancelled is not None and cancelled.is_set():
+                raise ConversionCancelled("Cancelled")
+            position = packet.pts
+            if position is not None:
+                position = float(position * packet.time_base)
+            if len(encoded) > 0:
+                for frame in packet.decode():
+                    for output in encoded:
+                        output.encode(frame)
+            if packet.dts is None:
+                # The empty packet that flushes the decoder
+                continue
+            for index, output in enumerate(copied):
+                # Muxing takes the packet's data, so all but the last copy
+                # get their own
+                if index < len(copied) - 1:
+                    duplicate = copy_packet(packet)
+                else:
+                    duplicate = packet
+                duplicate.stream = output.stream
+                output.container.mux(duplicate)
+            if progress is not None and position is not None:
+                percent = max(0, min(int(position*100 / total_length), 100))
+                if percent != last_percent:
+                    last_percent = percent
+                    progress(percent)
+        for output in encoded:
+            output.encode(None)
+        if progress is not None and last_percent != 100:
+            progress(100)
+
+
+BACKENDS = {
+    FFmpegBackend.name: FFmpegBackend,
+    PyAVBackend.name: PyAVBackend,
+}
+
+backends = {}
+backends_lock = threading.Lock()
+
+
+def get_backend(name: str = None):
+    name = (name or DEFAULT_BACKEND).lower()
+    with backends_lock:
+        if name not in backends:
+            if name not in BACKENDS:
+                raise BackendError(
+                    f"Unknown backend {name}, expected one of "
+                    + ", ".join(BACKENDS)
+                )
+            backend = BACKENDS[name]()
+            if not backend.available():
+                raise BackendError(f"The {name} backend is not available")
+            backends[name] = backend
+        return backends[name]
+
+
+def available_backends():
+    return [
+        name for name, backend in BACKENDS.items() if backend().available()
+    ]
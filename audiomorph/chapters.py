@@ -0,0 +1,581 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from audiomorph import engine, metrics, pipes, probe, results, segmented
+from audiomorph.config import DEFAULT_WORKERS, FFPROBE_PATH
+
+#----------------------------------------------------------------------#------#
+
+TRACKS_MODE = "tracks"
+CUE_FRAMES_PER_SECOND = 75
+CUE_ALBUM_TAGS = {"TITLE": "album", "PERFORMER": "album_artist"}
+CUE_TRACK_TAGS = {"TITLE": "title", "PERFORMER": "artist"}
+CUE_REMARK_TAGS = {"DATE": "date", "GENRE": "genre"}
+# 3:45, 1:02:03 or 12:30.5, anywhere in a line such as "[03:45] Title"
+TIMESTAMP_PATTERN = re.compile(
+    r"(?<![\d:])(?:(\d+):)?(\d{1,2}):(\d{2}(?:\.\d+)?)"
+)
+TITLE_SEPARATORS = " \t-:|.)]([–—"
+INVALID_NAME_CHARACTERS = re.compile(r'[\x00-\x1f<>:"/\\|?*]')
+MAXIMUM_TITLE_LENGTH = 100
+COPY_ARGUMENTS = ["-c:a", "copy"]
+
+
+class ChapterError(Exception):
+    pass
+
+
+@dataclass
+class Chapter:
+    start: float
+    end: float = None
+    title: str = ""
+    metadata: dict = None
+
+
+@dataclass
+class Piece:
+    start: int
+    end: int
+    track: int = None
+
+
+def cue_seconds(position: str):
+    minutes, seconds, frames = map(int, position.split(":"))
+    return minutes*60 + seconds + frames / CUE_FRAMES_PER_SECOND
+
+
+def cue_value(value: str):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def parse_cue(text: str):
+    album = {}
+    chapters = []
+    files = 0
+    for line in text.splitlines():
+        words = line.strip().split(None, 1)
+        if len(words) < 2:
+            continue
+        keyword, value = words[0].upper(), words[1]
+        if keyword == "FILE":
+            files += 1
+        elif keyword == "TRACK":
+            chapters.append(Chapter(None, metadata=dict(album)))
+        elif keyword in CUE_TRACK_TAGS and len(chapters) > 0:
+            if keyword == "TITLE":
+                chapters[-1].title = cue_value(value)
+            else:
+                chapters[-1].metadata[CUE_TRACK_TAGS[keyword]] = (
+                    cue_value(value)
+                )
+        elif keyword in CUE_ALBUM_TAGS:
+            album[CUE_ALBUM_TAGS[keyword]] = cue_value(value)
+            if keyword == "PERFORMER":
+                album.setdefault("artist", cue_value(value))
+        elif keyword == "REM" and len(chapters) == 0:
+            remark = value.split(None, 1)
+            if len(remark) == 2 and remark[0].upper() in CUE_REMARK_TAGS:
+                album[CUE_REMARK_TAGS[remark[0].upper()]] = cue_value(
+                    remark[1]
+                )
+        elif keyword == "INDEX" and len(chapters) > 0:
+            number, _, position = value.partition(" ")
+            try:
+                if int(number) == 1:
+                    chapters[-1].start = cue_seconds(position.strip())
+            except ValueError:
+                raise ChapterError(f"Invalid cue sheet index: {line.strip()}")
+    if files > 1:
+        # Each track would need the file it is in, one by one
+        raise ChapterError(
+            "Cue sheets that span several audio files are not supported"
+        )
+    if any(chapter.start is None for chapter in chapters):
+        raise ChapterError("A track of the cue sheet has no INDEX 01")
+    return chapters
+
+
+def parse_timestamps(text: str):
+    # One track per line, like the chapter lists in video descriptions
+    chapters = []
+    for line in text.splitlines():
+        match = TIMESTAMP_PATTERN.search(line)
+        if match is None:
+            continue
+        hours, minutes, seconds = match.groups()
+        start = int(hours or 0)*3600 + int(minutes)*60 + float(seconds)
+        title = line[match.end():].lstrip(TITLE_SEPARATORS).rstrip()
+        if title == "":
+            title = line[:match.start()].rstrip(TITLE_SEPARATORS).strip()
+        chapters.append(Chapter(start, title=title, metadata={}))
+    return chapters
+
+
+def load_chapters(path: str):
+    with open(path, "rb") as chapter_file:
+        data = chapter_file.read()
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Older rippers write cue sheets in the system's code page
+        text = data.decode("latin-1")
+    if os.path.splitext(path)[1].lower() == ".cue":
+        chapters = parse_cue(text)
+    else:
+        chapters = parse_timestamps(text)
+    if len(chapters) == 0:
+        raise ChapterError(f"No tracks found in {path}")
+    return chapters
+
+
+def read_chapters(input_file: str):
+    # Chapters in the container, or a cue sheet embedded in a tag as FLAC
+    # rippers do
+    result = subprocess.run([
+            FFPROBE_PATH, "-v", "error", "-show_chapters", "-show_entries",
+            "format_tags", "-of", "json", input_file
+        ],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True
+    )
+    try:
+        output = json.loads(result.stdout)
+    except ValueError:
+        return []
+    tags = {
+        key.lower(): value
+        for key, value in output.get("format", {}).get("tags", {}).items()
+    }
+    if "cuesheet" in tags:
+        return parse_cue(tags["cuesheet"])
+    chapters = []
+    for chapter in output.get("chapters", []):
+        try:
+            chapters.append(Chapter(
+                float(chapter["start_time"]), float(chapter["end_time"]),
+                chapter.get("tags", {}).get("title", ""), {}
+            ))
+        except (KeyError, ValueError):
+            continue
+    return chapters
+
+
+def find_chapters(input_file: str, chapter_file: str = None):
+    if chapter_file is not None:
+        return load_chapters(chapter_file)
+    cue_file = os.path.splitext(input_file)[0] + ".cue"
+    if os.path.isfile(cue_file):
+        return load_chapters(cue_file)
+    return read_chapters(input_file)
+
+
+def entry_chapters(info: dict):
+    # Chapters yt-dlp read from the video page or its description
+    metadata = {"album": info.get("title") or ""}
+    artist = (
+        info.get("artist") or info.get("uploader") or info.get("channel")
+    )
+    if artist:
+        metadata["artist"] = artist
+    chapters = []
+    for chapter in info.get("chapters") or []:
+        if chapter.get("start_time") is None:
+            continue
+        chapters.append(Chapter(
+            float(chapter["start_time"]), chapter.get("end_time"),
+            chapter.get("title") or "", dict(metadata)
+        ))
+    return chapters
+
+
+def finish_chapters(chapters: list, duration: float):
+    # Each track ends where the next starts, or earlier when its chapter
+    # says so; the gap is left out
+    chapters = sorted(
+        (
+            chapter for chapter in chapters
+            if 0 <= chapter.start < duration
+        ), key=lambda chapter: chapter.start
+    )
+    finished = []
+    for index, chapter in enumerate(chapters):
+        end = duration
+        if index + 1 < len(chapters):
+            end = chapters[index + 1].start
+        if chapter.end is not None:
+            end = min(end, float(chapter.end))
+        if end > chapter.start:
+            finished.append(Chapter(
+                chapter.start, end, chapter.title, chapter.metadata or {}
+            ))
+    return finished
+
+
+def track_name(number: int, count: int, title: str):
+    name = f"{number:0{max(len(str(count)), 2)}}"
+    title = INVALID_NAME_CHARACTERS.sub("_", title).strip(" .")
+    title = title[:MAXIMUM_TITLE_LENGTH].rstrip(" .")
+    return f"{name} - {title}" if title != "" else name
+
+
+def track_path(output_file: str, index: int, chapters: list):
+    # Every output file becomes a folder of that name holding the tracks
+    track_directory, extension = os.path.splitext(output_file)
+    return os.path.join(track_directory, track_name(
+        index + 1, len(chapters), chapters[index].title
+    ) + extension)
+
+
+def metadata_arguments(chapter: Chapter, number: int, count: int):
+    # Tags of the whole file are kept, apart from those that describe it as
+    # a whole
+    metadata = {
+        **chapter.metadata, "title": chapter.title,
+        "track": f"{number}/{count}", "cuesheet": ""
+    }
+    arguments = ["-map_metadata", "0", "-map_chapters", "-1"]
+    for key, value in metadata.items():
+        arguments += ["-metadata", f"{key}={value}"]
+    return arguments
+
+
+def plan_groups(tracks: list, workers: int):
+    # Runs of neighbouring tracks of about equal length, one per worker
+    first = tracks[0][0]
+    span = max(tracks[-1][1] - first, 1)
+    count = min(workers, len(tracks))
+    groups = [[] for _ in range(count)]
+    for index, (start, _) in enumerate(tracks):
+        groups[min(count - 1, (start - first) * count // span)].append(index)
+    return [group for group in groups if len(group) > 0]
+
+
+def group_pieces(tracks: list, group: list):
+    pieces = []
+    for index in group:
+        start, end = tracks[index]
+        if len(pieces) > 0 and pieces[-1].end < start:
+            pieces.append(Piece(pieces[-1].end, start))
+        pieces.append(Piece(start, end, index))
+    return pieces
+
+
+def group_arguments(
+    input_file: str, pieces: list, outputs: list, sample_rate: int,
+    start_offset: int, open_end: bool
+):
+    # outputs holds, for each track of the group, its output files with
+    # their options; every track is cut from one decode of the group's range
+    start = pieces[0].start
+    arguments = []
+    seek = start / sample_rate - segmented.SEEK_MARGIN_SECONDS
+    if seek > 0:
+        arguments += ["-ss", f"{seek:.6f}"]
+    trim = f"atrim=start_pts={start_offset + start}"
+    if not open_end:
+        trim += f":end_pts={start_offset + pieces[-1].end}"
+    # FFmpeg reports the furthest position of any output, and every track
+    # starts at zero, so an untouched copy of the range tracks progress
+    graph = [f"[0:a:0]{trim},asetpts=PTS-STARTPTS,asplit=2[position][range]"]
+    labels = [f"[piece{index}]" for index in range(len(pieces))]
+    if len(pieces) > 1:
+        boundaries = "|".join(
+            str(piece.start - start) for piece in pieces[1:]
+        )
+        graph.append(f"[range]asegment=samples={boundaries}{''.join(labels)}")
+    else:
+        labels = ["[range]"]
+    mapping = []
+    output_index = 0
+    for label, piece in zip(labels, pieces):
+        if piece.track is None:
+            graph.append(f"{label}anullsink")
+            continue
+        files = outputs[output_index]
+        output_index += 1
+        names = [f"[track{piece.track}_{number}]" for number in range(
+            len(files)
+        )]
+        split = f",asplit={len(files)}" if len(files) > 1 else ""
+        graph.append(f"{label}asetpts=PTS-STARTPTS{split}{''.join(names)}")
+        for name, (output_file, options) in zip(names, files):
+            mapping += ["-map", name, *options, output_file]
+    return arguments + [
+        "-copyts", "-i", input_file, "-filter_complex", ";".join(graph),
+        *mapping, "-map", "[position]", "-c:a", "pcm_s16le", "-f", "null",
+        "-"
+    ]
+
+
+def copy_arguments(
+    input_file: str, chapter: Chapter, output_file: str, options: list
+):
+    # Packets are copied as they are, so cuts fall on packet boundaries
+    return [
+        "-ss", f"{chapter.start:.6f}", "-t",
+        f"{chapter.end - chapter.start:.6f}", "-i", input_file,
+        "-map", "0:a:0", *options, output_file
+    ]
+
+
+def split_tracks(
+    input_file: str, info: probe.ProbeInfo, output_files: list,
+    chapters: list, codec_arguments: callable, workers: int = None,
+    progress: callable = None
+):
+    workers = workers or DEFAULT_WORKERS
+    sample_rate = info.sample_rate
+    start_offset, total_samples = segmented.stream_samples(
+        input_file, sample_rate
+    )
+    open_end = total_samples is None
+    if open_end:
+        start_offset, total_samples = 0, round(info.duration * sample_rate)
+    tracks = [
+        (
+            round(chapter.start * sample_rate),
+            total_samples if chapter.end >= info.duration
+            else round(chapter.end * sample_rate)
+        )
+        for chapter in chapters
+    ]
+    count = len(chapters)
+    parent = os.path.dirname(os.path.abspath(output_files[0]))
+    os.makedirs(parent, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix=".audiomorph-", dir=parent)
+    destinations = []
+    encoded = []
+    copied = []
+    for output_file in output_files:
+        extension = os.path.splitext(output_file)[1]
+        options = codec_arguments(output_file)
+        files = []
+        for index, chapter in enumerate(chapters):
+            temporary_file = os.path.join(
+                directory, f"{len(destinations):05}{extension}"
+            )
+            destinations.append(
+                (temporary_file, track_path(output_file, index, chapters))
+            )
+            files.append((temporary_file, [
+                *metadata_arguments(chapter, index + 1, count), *options
+            ]))
+        if options == COPY_ARGUMENTS:
+            copied += [
+                (index, temporary_file, file_options)
+                for index, (temporary_file, file_options) in enumerate(files)
+            ]
+        else:
+            encoded.append(files)
+
+    tasks = []
+    if len(encoded) > 0:
+        for group in plan_groups(tracks, workers):
+            pieces = group_pieces(tracks, group)
+            outputs = [
+                [files[index] for files in encoded] for index in group
+            ]
+            tasks.append((
+                group_arguments(
+                    input_file, pieces, outputs, sample_rate, start_offset,
+                    open_end and group[-1] == count - 1
+                ), pieces[-1].end - pieces[0].start
+            ))
+    for index, temporary_file, options in copied:
+        tasks.append((
+            copy_arguments(
+                input_file, chapters[index], temporary_file, options
+            ),
+            tracks[index][1] - tracks[index][0]
+        ))
+    total_length = max(sum(length for _, length in tasks), 1)
+    percentages = [0] * len(tasks)
+    logs = [pipes.LogBuffer() for _ in tasks]
+    lock = threading.Lock()
+    last_percent = -1
+
+    def run(index: int):
+        arguments, length = tasks[index]
+
+        def task_progress(percent: int):
+            nonlocal last_percent
+            with lock:
+                percentages[index] = percent
+                overall = int(sum(
+                    percentage * tasks[number][1]
+                    for number, percentage in enumerate(percentages)
+                ) / total_length)
+                if overall == last_percent or progress is None:
+                    return
+                last_percent = overall
+            progress(overall)
+
+        return engine.run_ffmpeg(
+            arguments, length / sample_rate, task_progress, logs[index]
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return_codes = list(pool.map(
+                metrics.carry(run), range(len(tasks))
+            ))
+        for return_code, log in zip(return_codes, logs):
+            if return_code != 0:
+                raise engine.ConversionError(engine.failure_message(
+                    f"FFmpeg failed while splitting {input_file} into tracks",
+                    log
+                ), log.text())
+        for temporary_file, output_file in destinations:
+            if not os.path.exists(temporary_file):
+                raise engine.ConversionError(
+                    f"FFmpeg wrote no {output_file} while splitting "
+                    + input_file
+                )
+        for temporary_file, output_file in destinations:
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            os.replace(temporary_file, output_file)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return [output_file for _, output_file in destinations]
+
+
+def split_many(
+    input_file: str, output_files: list, chapter_file: str = None,
+    workers: int = None, progress: callable = None, use_cache: bool = True,
+    dither: bool = False, backend: str = None
+):
+    # Files without chapters or a cue sheet are converted whole, by any
+    # backend; tracks are always cut by FFmpeg
+    from audiomorph import backends
+
+    with metrics.job("convert", input_file):
+        start_time = time.monotonic()
+        try:
+            with metrics.span("probe"):
+                info = probe.probe(input_file)
+        except probe.ProbeError as error:
+            raise engine.ConversionError(str(error))
+        try:
+            with metrics.span("chapters"):
+                chapters = finish_chapters(
+                    find_chapters(input_file, chapter_file), info.duration
+                )
+        except (OSError, ChapterError) as error:
+            raise engine.ConversionError(
+                f"Could not read the tracks of {input_file}: {error}"
+            )
+        if len(chapters) == 0:
+            return engine.convert_many(
+                input_file, output_files, progress, use_cache, dither, backend
+            )
+        backend_name = backends.get_backend(backend).name
+        if backend_name != "ffmpeg":
+            raise engine.ConversionError(
+                f"Tracks are cut by FFmpeg, not the {backend_name} backend"
+            )
+
+        def codec_arguments(output_file: str):
+            # Lossy streams are not encoded a second time
+            if engine.can_stream_copy(
+                info.codec, output_file
+            ) and not segmented.is_lossless(info.codec):
+                return COPY_ARGUMENTS
+            return engine.DITHER_ARGUMENTS if dither else []
+
+        # Tracks come from the cache only when all of them are there, since
+        # they are cut together
+        cache = results.get_default_cache() if use_cache else None
+        keys = {}
+        if cache is not None:
+            with metrics.span("cache"):
+                for output_file in output_files:
+                    options = codec_arguments(output_file)
+                    for index, chapter in enumerate(chapters):
+                        track_file = track_path(output_file, index, chapters)
+                        keys[track_file] = cache.key(input_file, track_file, [
+                            TRACKS_MODE, f"{chapter.start:.6f}",
+                            f"{chapter.end:.6f}", *metadata_arguments(
+                                chapter, index + 1, len(chapters)
+                            ), *options
+                        ])
+                for track_file, key in keys.items():
+                    os.makedirs(os.path.dirname(track_file), exist_ok=True)
+                    if not cache.fetch(key, track_file):
+                        break
+                else:
+                    if progress is not None:
+                        progress(100)
+                    elapsed = time.monotonic() - start_time
+                    return [
+                        engine.ConversionResult(
+                            input_file, track_file, info.duration, elapsed,
+                            engine.CACHED_MODE
+                        )
+                        for track_file in keys
+                    ]
+
+        track_files = split_tracks(
+            input_file, info, output_files, chapters, codec_arguments,
+            workers, progress
+        )
+        if cache is not None:
+            with metrics.span("store"):
+                for track_file in track_files:
+                    cache.store(keys[track_file], track_file)
+        metrics.note("audio_seconds", info.duration)
+        metrics.note("bytes_in", metrics.file_size(input_file))
+        metrics.add("bytes_out", sum(map(metrics.file_size, track_files)))
+        elapsed = time.monotonic() - start_time
+        return [
+            engine.ConversionResult(
+                input_file, track_file, info.duration, elapsed, TRACKS_MODE
+            )
+            for track_file in track_files
+        ]
+
+
+def split_download(
+    download_info: dict, profile: engine.OutputProfile, workers: int = None
+):
+    # The folder of tracks, or None for a video without chapters
+    input_file = download_info["filepath"]
+    try:
+        with metrics.span("probe"):
+            info = probe.run_ffprobe(input_file)
+    except probe.ProbeError as error:
+        raise engine.DownloadError(str(error))
+    chapters = finish_chapters(
+        entry_chapters(download_info) or read_chapters(input_file),
+        info.duration
+    )
+    if len(chapters) == 0:
+        return None
+    metrics.note("audio_seconds", info.duration)
+    output_file = (
+        os.path.splitext(input_file)[0]
+        + f".{engine.profile_extension(profile, info.codec)}"
+    )
+    try:
+        track_files = split_tracks(
+            input_file, info, [output_file], chapters,
+            lambda track_file: engine.profile_arguments(
+                profile, info.codec, track_file
+            ), workers
+        )
+    except engine.ConversionError as error:
+        raise engine.DownloadError(str(error), error.log)
+    os.remove(input_file)
+    metrics.add("bytes_out", sum(map(metrics.file_size, track_files)))
+    return os.path.splitext(output_file)[0]
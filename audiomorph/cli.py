@@ -0,0 +1,733 @@
+import argparse
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audiomorph import (
+    backends, chapters, downloads, engine, events, ingest, metrics, peaks,
+    probe, results, scheduler, server, watch
+)
+from audiomorph.config import AUDIO_FORMATS, DEFAULT_BACKEND, DEFAULT_WORKERS
+
+#----------------------------------------------------------------------#------#
+
+# Waveforms are drawn on a decibel scale from -48 dBFS
+WAVEFORM_FLOOR = 10 ** (-48 / 20)
+WAVEFORM_CHARACTERS = " \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="audiomorph",
+        description="Convert audio files and download audio without the GUI."
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE", default=metrics.TRACE_PATH,
+        help="Append a JSON line for every stage and job to FILE (also set "
+        + "with AUDIOMORPH_TRACE)."
+    )
+    parser.add_argument(
+        "--metrics-port", metavar="PORT", type=int,
+        default=metrics.METRICS_PORT,
+        help="Serve Prometheus metrics on this local port while running "
+        + "(also set with AUDIOMORPH_METRICS_PORT)."
+    )
+    parser.add_argument(
+        "--profile", metavar="DIRECTORY", default=metrics.PROFILE_DIRECTORY,
+        help="Write a cProfile file per job to DIRECTORY (also set with "
+        + "AUDIOMORPH_PROFILE)."
+    )
+    parser.add_argument(
+        "--profile-jobs", metavar="IDS",
+        help="Only profile these comma separated job numbers, as counted in "
+        + "the trace."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser(
+        "convert", help="Convert one or more audio files."
+    )
+    convert_parser.add_argument(
+        "inputs", nargs="+", metavar="INPUT",
+        help="Audio files, or directories searched for audio files whose "
+        + "layout is kept under the output directory."
+    )
+    convert_parser.add_argument(
+        "-f", "--format", required=True,
+        help=f"Output format, for example {', '.join(AUDIO_FORMATS)}. "
+        + "Several comma separated formats are produced in one pass."
+    )
+    convert_parser.add_argument(
+        "-o", "--output-directory", default=".",
+        help="Directory the converted files are written to."
+    )
+    convert_parser.add_argument(
+        "-j", "--workers", type=int, default=DEFAULT_WORKERS,
+        help="Number of conversions run in parallel."
+    )
+    convert_parser.add_argument(
+        "--split", action="store_true",
+        help="Split long lossless files into segments encoded in parallel "
+        + "by all workers, one file at a time."
+    )
+    convert_parser.add_argument(
+        "--segments", type=int,
+        help="Number of segments per file with --split (default: workers)."
+    )
+    convert_parser.add_argument(
+        "--verify", action="store_true",
+        help="Check split outputs against a single-pass encode."
+    )
+    convert_parser.add_argument(
+        "--tracks", action="store_true",
+        help="Split each input into a folder of tracks at its chapters, or "
+        + "at the tracks of a cue sheet with the same name, in one decode. "
+        + "Inputs without either are converted whole."
+    )
+    convert_parser.add_argument(
+        "--chapters", metavar="FILE",
+        help="Cue sheet, or list of timestamps and titles one per line, to "
+        + "split a single input at (implies --tracks)."
+    )
+    convert_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always re-encode instead of reusing earlier results."
+    )
+    convert_parser.add_argument(
+        "--dither", action="store_true",
+        help="Add triangular dither when reducing to 16-bit samples."
+    )
+    convert_parser.add_argument(
+        "--channels", type=int, choices=range(1, 9), metavar="N",
+        help="Mix every output down or up to N channels, like FFmpeg's -ac."
+    )
+    convert_parser.add_argument(
+        "--backend", default=DEFAULT_BACKEND, choices=list(backends.BACKENDS),
+        help="Conversion backend (default: %(default)s, set with "
+        + "AUDIOMORPH_BACKEND)."
+    )
+    convert_parser.add_argument(
+        "--priority", type=int, default=scheduler.DEFAULT_PRIORITY,
+        help="Scheduling priority of the conversions; lower values run "
+        + "first (default: %(default)s)."
+    )
+    convert_parser.add_argument(
+        "--peaks", action="store_true",
+        help="Also store the waveform peaks of each input while FFmpeg "
+        + "converts it, for the GUI's preview and the peaks command."
+    )
+
+    download_parser = commands.add_parser(
+        "download", help="Download the audio of one or more videos."
+    )
+    download_parser.add_argument("urls", nargs="+", metavar="URL")
+    download_parser.add_argument(
+        "-o", "--output-directory", default=".",
+        help="Directory the downloaded files are written to."
+    )
+    download_parser.add_argument(
+        "-n", "--name",
+        help="Output file name without extension. The video id is appended "
+        + "when several videos are downloaded."
+    )
+    download_parser.add_argument(
+        "-f", "--format", default=engine.DEFAULT_PROFILE.output_format,
+        help=f"Output format, or '{engine.PASSTHROUGH_FORMAT}' to keep the "
+        + "source audio stream without re-encoding."
+    )
+    download_parser.add_argument(
+        "-b", "--bitrate", type=int, help="Audio bitrate in kbps."
+    )
+    download_parser.add_argument(
+        "-r", "--sample-rate", type=int, help="Sample rate in Hz."
+    )
+    download_parser.add_argument(
+        "-j", "--workers", type=int, default=engine.DEFAULT_DOWNLOAD_WORKERS,
+        help="Number of videos downloaded in parallel."
+    )
+    download_parser.add_argument(
+        "--postprocess-workers", type=int, default=DEFAULT_WORKERS,
+        help="Number of downloads converted by FFmpeg in parallel."
+    )
+    download_parser.add_argument(
+        "--fragments", type=int, default=engine.DEFAULT_FRAGMENTS,
+        help="Fragments fetched in parallel for each fragmented download."
+    )
+    download_parser.add_argument(
+        "--no-playlist", action="store_true",
+        help="Only download the video when a URL also names a playlist."
+    )
+    download_parser.add_argument(
+        "--stream", action="store_true",
+        help="Pipe downloads straight into FFmpeg instead of converting "
+        + "a finished file (plain HTTP formats only)."
+    )
+    download_parser.add_argument(
+        "--split-chapters", action="store_true",
+        help="Write the chapters of each video as separate tracks into a "
+        + "folder named after it. Implies downloading before converting."
+    )
+    download_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always extract video information again."
+    )
+    download_parser.add_argument(
+        "--no-archive", action="store_true",
+        help="Download again even when an earlier download still exists."
+    )
+
+    probe_parser = commands.add_parser(
+        "probe", help="Probe audio files in directories to warm the cache."
+    )
+    probe_parser.add_argument("directories", nargs="+", metavar="DIRECTORY")
+    probe_parser.add_argument(
+        "-j", "--workers", type=int, default=DEFAULT_WORKERS,
+        help="Number of files probed in parallel."
+    )
+
+    peaks_parser = commands.add_parser(
+        "peaks", help="Compute and show the waveform peaks of audio files."
+    )
+    peaks_parser.add_argument(
+        "inputs", nargs="+", metavar="INPUT",
+        help="Audio files, or directories searched for audio files."
+    )
+    peaks_parser.add_argument(
+        "-j", "--workers", type=int, default=DEFAULT_WORKERS,
+        help="Number of files read in parallel."
+    )
+    peaks_parser.add_argument(
+        "--width", type=int, default=0,
+        help="Draw each file's waveform this many characters wide."
+    )
+
+    watch_parser = commands.add_parser(
+        "watch",
+        help="Convert files as they are added to directories or below them."
+    )
+    watch_parser.add_argument("directories", nargs="+", metavar="DIRECTORY")
+    watch_parser.add_argument(
+        "-f", "--format", required=True,
+        help="Output format, or several comma separated formats."
+    )
+    watch_parser.add_argument(
+        "-o", "--output-directory", required=True,
+        help="Directory the converted files are written to, outside the "
+        + "watched directories."
+    )
+    watch_parser.add_argument(
+        "-j", "--workers", type=int, default=DEFAULT_WORKERS,
+        help="Number of conversions run in parallel."
+    )
+    watch_parser.add_argument(
+        "--settle", type=float, default=watch.DEFAULT_SETTLE_SECONDS,
+        help="Seconds a file must stay unchanged before it is converted "
+        + "(default: %(default)s)."
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true",
+        help="Scan the directories periodically instead of using inotify."
+    )
+    watch_parser.add_argument(
+        "--interval", type=float, default=watch.DEFAULT_POLL_INTERVAL,
+        help="Seconds between scans when polling (default: %(default)s)."
+    )
+    watch_parser.add_argument(
+        "--once", action="store_true",
+        help="Convert what changed since the last run, then exit."
+    )
+    watch_parser.add_argument(
+        "--reset", action="store_true",
+        help="Forget which files were converted and convert them all again."
+    )
+    watch_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always re-encode instead of reusing earlier results."
+    )
+    watch_parser.add_argument(
+        "--dither", action="store_true",
+        help="Add triangular dither when reducing to 16-bit samples."
+    )
+    watch_parser.add_argument(
+        "--backend", default=DEFAULT_BACKEND, choices=list(backends.BACKENDS),
+        help="Conversion backend (default: %(default)s)."
+    )
+    watch_parser.add_argument(
+        "--priority", type=int, default=scheduler.DEFAULT_PRIORITY,
+        help="Scheduling priority of the conversions; lower values run "
+        + "first (default: %(default)s)."
+    )
+    watch_parser.add_argument(
+        "--peaks", action="store_true",
+        help="Also store the waveform peaks of the files converted."
+    )
+
+    serve_parser = commands.add_parser(
+        "serve", help="Run conversions and downloads submitted over HTTP."
+    )
+    serve_parser.add_argument(
+        "--host", default=server.SERVER_HOST,
+        help="Address to listen on (default: %(default)s, local only)."
+    )
+    serve_parser.add_argument(
+        "-p", "--port", type=int, default=server.SERVER_PORT,
+        help="Port to listen on (default: %(default)s)."
+    )
+    serve_parser.add_argument(
+        "-d", "--directory", default=server.SERVER_DIRECTORY,
+        help="Directory holding the job queue, uploads and results (also "
+        + "set with AUDIOMORPH_SERVER_DIRECTORY)."
+    )
+    serve_parser.add_argument(
+        "-j", "--workers", type=int, default=DEFAULT_WORKERS,
+        help="Number of jobs run in parallel."
+    )
+    serve_parser.add_argument(
+        "--per-client", type=int, default=server.DEFAULT_PER_CLIENT,
+        help="Number of jobs of one client, told apart by token or else by "
+        + "address, run in parallel (default: %(default)s)."
+    )
+    serve_parser.add_argument(
+        "--max-queued", type=int, default=server.DEFAULT_MAX_QUEUED,
+        help="Number of unfinished jobs one client may have "
+        + "(default: %(default)s)."
+    )
+    serve_parser.add_argument(
+        "--input-directory", metavar="DIRECTORY",
+        help="Let clients convert files under DIRECTORY by their path "
+        + "instead of uploading them."
+    )
+    serve_parser.add_argument(
+        "--token", action="append", dest="tokens",
+        help="Require a bearer token on every request. Give one per client: "
+        + "each token's jobs are limited and kept apart as one client's "
+        + "(also set with AUDIOMORPH_SERVER_TOKEN, comma separated)."
+    )
+    serve_parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Always re-encode and extract video information again."
+    )
+
+    backends_parser = commands.add_parser(
+        "backends", help="List the conversion backends and check them."
+    )
+    backends_parser.add_argument(
+        "--check", action="store_true",
+        help="Run the conformance checks on every available backend."
+    )
+    backends_parser.add_argument(
+        "-b", "--backend", choices=list(backends.BACKENDS),
+        help="Only list and check this backend."
+    )
+
+    cache_parser = commands.add_parser(
+        "cache", help="Show or clear the conversion result cache."
+    )
+    cache_parser.add_argument(
+        "--clear", action="store_true",
+        help="Remove every cached result, extracted video information, "
+        + "waveform peaks and the download archive."
+    )
+    return parser
+
+
+def report(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def run_convert(arguments):
+    output_formats = engine.parse_formats(arguments.format)
+    # Directories are read while the first files already convert
+    input_files = []
+
+    def jobs():
+        for job in ingest.conversion_jobs(
+            arguments.inputs, arguments.output_directory, output_formats
+        ):
+            input_files.append(job[0])
+            yield job
+
+    start_time = time.monotonic()
+    finished = 0
+    active = {}
+    show_active = sys.stderr.isatty()
+
+    def show_events(progress_events: list):
+        nonlocal finished
+        if show_active:
+            print("\r\033[K", end="", file=sys.stderr)
+        for event in progress_events:
+            input_file = input_files[event.job]
+            if not event.finished:
+                active[event.job] = event.percent
+                continue
+            active.pop(event.job, None)
+            finished += 1
+            if isinstance(event.result, Exception):
+                report(
+                    f"[{finished}/{len(input_files)}] FAILED {input_file}: "
+                    + f"{event.result}"
+                )
+                continue
+            if len(event.result) > len(output_formats) or (
+                event.result[0].mode == chapters.TRACKS_MODE
+            ):
+                outputs = (
+                    f"{len(event.result)} track file(s) in "
+                    + os.path.dirname(event.result[0].output_file)
+                )
+            else:
+                outputs = ", ".join(
+                    f"{output.output_file} ({output.mode})"
+                    for output in event.result
+                )
+            # The last output to finish took as long as the whole job
+            elapsed = max(output.elapsed for output in event.result)
+            report(
+                f"[{finished}/{len(input_files)}] {input_file} -> {outputs} "
+                + f"({elapsed:.2f}s)"
+            )
+        if show_active and len(active) > 0:
+            print(" | ".join(
+                f"{os.path.basename(input_files[job])} {percent}%"
+                for job, percent in active.items()
+            )[:79], end="", file=sys.stderr, flush=True)
+
+    os.makedirs(arguments.output_directory, exist_ok=True)
+    bus = events.ProgressBus()
+    bus.subscribe(show_events)
+    bus.start()
+    try:
+        results = engine.convert_batch(
+            jobs(), workers=arguments.workers, progress=bus.publish,
+            complete=bus.finish, split=arguments.split,
+            segments=arguments.segments, verify_output=arguments.verify,
+            use_cache=not arguments.no_cache, dither=arguments.dither,
+            backend=arguments.backend,
+            tracks=arguments.tracks or arguments.chapters is not None,
+            chapter_file=arguments.chapters, channels=arguments.channels,
+            priority=arguments.priority
+        )
+    except KeyboardInterrupt:
+        # convert_batch has already killed FFmpeg and removed partial files
+        bus.stop()
+        report("Cancelled")
+        return 130
+    bus.stop()
+    elapsed = max(time.monotonic() - start_time, 0.001)
+    converted = [
+        result for result in results if not isinstance(result, Exception)
+    ]
+    audio_seconds = sum(result[0].duration for result in converted)
+    copied = sum(
+        output.mode == engine.COPY_MODE
+        for result in converted for output in result
+    )
+    cached = sum(
+        output.mode == engine.CACHED_MODE
+        for result in converted for output in result
+    )
+    report(
+        f"Converted {len(converted)}/{len(results)} file(s) in "
+        + f"{elapsed:.2f}s "
+        + f"({len(converted) / elapsed:.2f} files/s, "
+        + f"{audio_seconds / elapsed:.1f}x realtime, "
+        + f"{copied} output(s) stream copied, {cached} from cache)"
+    )
+    return 0 if len(converted) == len(results) else 1
+
+
+def run_download(arguments):
+    name = arguments.name or "%(title)s [%(id)s]"
+    output_file_path = os.path.join(arguments.output_directory, name)
+    profile = engine.OutputProfile(
+        arguments.format.lower(), arguments.bitrate, arguments.sample_rate
+    )
+    entries = engine.expand_urls(
+        arguments.urls, playlist=not arguments.no_playlist,
+        use_cache=not arguments.no_cache
+    )
+    finished = 0
+
+    def show_events(progress_events: list):
+        nonlocal finished
+        for event in progress_events:
+            if not event.finished:
+                continue
+            finished += 1
+            title = engine.entry_title(entries[event.job])
+            if isinstance(event.result, Exception):
+                report(f"[{finished}/{len(entries)}] FAILED {event.result}")
+            else:
+                report(
+                    f"[{finished}/{len(entries)}] {title} -> {event.result}"
+                )
+
+    bus = events.ProgressBus()
+    bus.subscribe(show_events)
+    bus.start()
+    results = engine.download_many(
+        entries, output_file_path, profile,
+        workers=arguments.workers,
+        postprocess_workers=arguments.postprocess_workers,
+        fragments=arguments.fragments, progress=bus.publish,
+        complete=bus.finish, streaming=arguments.stream,
+        use_cache=not arguments.no_cache,
+        use_archive=not arguments.no_archive,
+        split_chapters=arguments.split_chapters
+    )
+    bus.stop()
+    failures = sum(isinstance(result, Exception) for result in results)
+    return 0 if failures == 0 else 1
+
+
+def run_probe(arguments):
+    cache = probe.get_default_cache()
+    for directory in arguments.directories:
+        start_time = time.monotonic()
+        probed = cache.warm_directory(directory, workers=arguments.workers)
+        report(
+            f"Probed {probed} file(s) in {directory} "
+            + f"({time.monotonic() - start_time:.2f}s)"
+        )
+    return 0
+
+
+def decibels(value: float):
+    return f"{20 * math.log10(value):.1f}" if value > 0 else "-inf"
+
+
+def draw_waveform(pyramid: peaks.PeakPyramid, width: int):
+    # One character per column, as tall as its loudest sample
+    minimums, maximums, _ = pyramid.view(0, pyramid.duration, width)
+    characters = []
+    for low, high in zip(minimums, maximums):
+        if math.isnan(high):
+            characters.append(" ")
+            continue
+        loudness = max(high, -low, WAVEFORM_FLOOR)
+        level = int(
+            (1 - math.log10(loudness) / math.log10(WAVEFORM_FLOOR))
+            * len(WAVEFORM_CHARACTERS)
+        )
+        characters.append(
+            WAVEFORM_CHARACTERS[min(level, len(WAVEFORM_CHARACTERS) - 1)]
+        )
+    return "".join(characters)
+
+
+def run_peaks(arguments):
+    if not peaks.available():
+        report("Waveform peaks need NumPy")
+        return 1
+    cache = peaks.get_default_cache()
+    input_files = (
+        input_file for input_file, _ in ingest.expand_sources(arguments.inputs)
+    )
+
+    def load(input_file: str):
+        start_time = time.monotonic()
+        try:
+            return input_file, cache.load(input_file), (
+                time.monotonic() - start_time
+            )
+        except peaks.PeakError as error:
+            return input_file, error, 0.0
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=arguments.workers) as pool:
+        for input_file, pyramid, elapsed in ingest.bounded_map(
+            pool, load, input_files, arguments.workers * 4
+        ):
+            if isinstance(pyramid, Exception):
+                failures += 1
+                report(f"FAILED {input_file}: {pyramid}")
+                continue
+            minimum, maximum, rms = pyramid.summary()
+            report(
+                f"{input_file}: {pyramid.duration:.1f}s, peak "
+                + f"{decibels(max(maximum, -minimum))} dBFS, RMS "
+                + f"{decibels(rms)} dBFS, {len(pyramid.levels)} levels "
+                + f"({elapsed:.2f}s)"
+            )
+            if arguments.width > 0:
+                print(draw_waveform(pyramid, arguments.width), flush=True)
+    return 0 if failures == 0 else 1
+
+
+def run_watch(arguments):
+    state = watch.WatchState()
+    if arguments.reset:
+        state.clear()
+    try:
+        watcher = watch.Watcher(
+            arguments.directories, arguments.output_directory,
+            engine.parse_formats(arguments.format), arguments.workers,
+            arguments.settle, arguments.poll, arguments.interval,
+            use_cache=not arguments.no_cache, dither=arguments.dither,
+            backend=arguments.backend, report=report, state=state,
+            priority=arguments.priority
+        )
+    except watch.WatchError as error:
+        report(str(error))
+        return 1
+    mode = "polling" if isinstance(
+        watcher.source, watch.PollingSource
+    ) else "inotify"
+    report(
+        f"Watching {', '.join(watcher.directories)} ({mode}), writing "
+        + f"{', '.join(watcher.output_formats)} to "
+        + watcher.output_directory
+    )
+    # Service managers stop daemons with SIGTERM
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    try:
+        watcher.run(once=arguments.once)
+    except KeyboardInterrupt:
+        # Running conversions were killed and are redone on the next run
+        report("Stopped")
+        return 130
+    if watcher.stopped.is_set():
+        report("Stopped")
+    return 0
+
+
+def run_serve(arguments):
+    job_server = server.JobServer(
+        arguments.directory, arguments.workers, arguments.per_client,
+        arguments.max_queued, arguments.input_directory, arguments.tokens,
+        use_cache=not arguments.no_cache
+    )
+    try:
+        port = job_server.start(arguments.port, arguments.host)
+    except OSError as error:
+        report(
+            f"Could not listen on {arguments.host}:{arguments.port}: {error}"
+        )
+        return 1
+    status = job_server.status()
+    report(
+        f"Serving jobs on http://{arguments.host}:{port}/ with "
+        + f"{arguments.workers} worker(s), "
+        + f"{status['queued'] + status['running']} job(s) left from before"
+    )
+    stopped = threading.Event()
+
+    def stop(*_):
+        # Service managers may signal FFmpeg too, which must not count as
+        # a failed job
+        job_server.stop()
+        stopped.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        job_server.stop()
+    # Running jobs are killed and run again on the next start
+    job_server.close()
+    report("Stopped")
+    return 0
+
+
+def run_backends(arguments):
+    from audiomorph import conformance
+
+    names = [arguments.backend] if arguments.backend else backends.BACKENDS
+    failures = 0
+    for name in names:
+        backend = backends.BACKENDS[name]()
+        if not backend.available():
+            report(f"{name:>8}: not available ({backend.description})")
+            if arguments.backend:
+                failures += 1
+            continue
+        report(f"{name:>8}: {backend.description}, {backend.version()}")
+        if arguments.check:
+            failures += conformance.check_backend(name, report)
+    return 0 if failures == 0 else 1
+
+
+def run_cache(arguments):
+    cache = results.get_default_cache()
+    if arguments.clear:
+        cache.clear()
+        downloads.get_default_info_cache().clear()
+        downloads.get_default_archive().clear()
+        peaks.get_default_cache().clear()
+    statistics = cache.statistics()
+    report(
+        f"{statistics['entries']} cached result(s), "
+        + f"{statistics['bytes'] / 1048576:.1f} of "
+        + f"{statistics['max_bytes'] / 1048576:.0f} MB used"
+    )
+    lookups = statistics["hits"] + statistics["misses"]
+    if lookups > 0:
+        report(
+            f"{statistics['hits']} hit(s) and {statistics['misses']} "
+            + "miss(es) since it was cleared, a hit rate of "
+            + f"{statistics['hits'] / lookups:.0%}"
+        )
+    return 0
+
+
+def run_command(arguments):
+    if arguments.command == "convert":
+        return run_convert(arguments)
+    if arguments.command == "probe":
+        return run_probe(arguments)
+    if arguments.command == "cache":
+        return run_cache(arguments)
+    if arguments.command == "backends":
+        return run_backends(arguments)
+    if arguments.command == "watch":
+        return run_watch(arguments)
+    if arguments.command == "peaks":
+        return run_peaks(arguments)
+    if arguments.command == "serve":
+        return run_serve(arguments)
+    return run_download(arguments)
+
+
+def main(argv: list = None):
+    parser = build_parser()
+    arguments = parser.parse_args(argv)
+    profile_jobs = None
+    if arguments.profile_jobs:
+        try:
+            profile_jobs = {
+                int(job_id) for job_id in arguments.profile_jobs.split(",")
+            }
+        except ValueError:
+            parser.error("--profile-jobs expects numbers like 1,3")
+    if arguments.command == "convert" and arguments.chapters is not None and (
+        len(arguments.inputs) > 1 or os.path.isdir(arguments.inputs[0])
+    ):
+        parser.error("--chapters describes a single input file")
+    if arguments.command == "convert" and arguments.backend != "ffmpeg" and (
+        arguments.split or arguments.tracks or arguments.chapters is not None
+    ):
+        # Segments and tracks are cut by FFmpeg
+        parser.error("--split and --tracks only work with --backend ffmpeg")
+    if arguments.command == "convert" and arguments.channels is not None and (
+        arguments.split or arguments.tracks or arguments.chapters is not None
+    ):
+        parser.error("--channels does not work with --split or --tracks")
+    recorder = metrics.configure(
+        arguments.trace, arguments.profile, profile_jobs,
+        arguments.metrics_port
+    )
+    if recorder.server is not None:
+        host, port = recorder.server.server_address[:2]
+        report(f"Serving metrics on http://{host}:{port}/metrics")
+    if getattr(arguments, "peaks", False):
+        peaks.get_default_cache().tap_conversions = True
+    try:
+        return run_command(arguments)
+    finally:
+        recorder.close()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+
+#----------------------------------------------------------------------#------#
+
+if getattr(sys, 'frozen', False):
+    BASE_PATH = os.path.dirname(sys.executable)
+else:
+    BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def find_executable(name: str):
+    override = os.environ.get(f"AUDIOMORPH_{name.upper()}")
+    if override:
+        return override
+    if os.name == 'nt':
+        name += ".exe"
+    bundled_path = os.path.join(BASE_PATH, "assets", "ffmpeg", "bin", name)
+    if os.path.exists(bundled_path):
+        return bundled_path
+    return shutil.which(name) or bundled_path
+
+
+FFMPEG_PATH = find_executable("ffmpeg")
+FFPROBE_PATH = find_executable("ffprobe")
+
+AUDIO_FORMATS = (
+    "aac", "aiff", "flac", "mp3", "m4a", "ogg", "wav"
+)
+
+if os.name == 'nt':
+    DOWNLOADS_DIRECTORY = os.path.join(os.environ['USERPROFILE'], 'Downloads')
+elif os.name == 'posix':
+    DOWNLOADS_DIRECTORY =  os.path.join(os.path.expanduser('~'), 'Downloads')
+else:
+    DOWNLOADS_DIRECTORY = ""
+
+if os.name == 'nt':
+    CACHE_DIRECTORY = os.path.join(
+        os.environ.get('LOCALAPPDATA', os.path.expanduser('~')),
+        'AudioMorph', 'Cache'
+    )
+else:
+    CACHE_DIRECTORY = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'audiomorph'
+    )
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_BACKEND = os.environ.get("AUDIOMORPH_BACKEND", "ffmpeg")
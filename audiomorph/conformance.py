@@ -0,0 +1,225 @@
+import array
+import math
+import os
+import tempfile
+import threading
+import time
+import wave
+
+from audiomorph import backends, engine, pcm, probe, scheduler
+from audiomorph.config import AUDIO_FORMATS
+
+#----------------------------------------------------------------------#------#
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+TONE_SECONDS = 2
+CANCEL_SECONDS = 120
+DURATION_TOLERANCE = 0.1
+CANCEL_TIMEOUT = 10.0
+CHECKS = (
+    "probe", "formats", "lossless", "copy", "dither", "errors", "cancel"
+)
+
+
+class ConformanceError(Exception):
+    pass
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise ConformanceError(message)
+
+
+def write_tone(path: str, seconds: int):
+    # A second of a stereo 16-bit tone, repeated
+    second = array.array("h", (
+        int(12000 * math.sin(2 * math.pi * frequency * index / SAMPLE_RATE))
+        for index in range(SAMPLE_RATE)
+        for frequency in (440, 660)
+    ))
+    with wave.open(path, "wb") as output_file:
+        output_file.setnchannels(CHANNELS)
+        output_file.setsampwidth(2)
+        output_file.setframerate(SAMPLE_RATE)
+        for _ in range(seconds):
+            output_file.writeframes(second.tobytes())
+    return path
+
+
+def read_samples(path: str):
+    info = pcm.read_info(path)
+    with open(path, "rb") as input_file:
+        input_file.seek(info.data_offset)
+        return input_file.read(info.frames * info.channels * 2)
+
+
+class Conformance:
+    def __init__(self, backend: str, directory: str):
+        self.backend = backends.get_backend(backend)
+        self.directory = directory
+        self.tone_file = write_tone(self.path("tone.wav"), TONE_SECONDS)
+
+    def path(self, name: str):
+        return os.path.join(self.directory, f"{self.backend.name}_{name}")
+
+    def convert(self, input_file: str, output_files: list, **options):
+        return engine.convert_many(
+            input_file, output_files, use_cache=False,
+            backend=self.backend.name, **options
+        )
+
+    def expect_audio(self, output_file: str, duration: float):
+        info = self.backend.probe(output_file)
+        expect(
+            (info.sample_rate, info.channels) == (SAMPLE_RATE, CHANNELS),
+            f"{output_file} is {info.sample_rate} Hz with {info.channels} "
+            + "channel(s)"
+        )
+        expect(
+            abs(info.duration - duration) <= DURATION_TOLERANCE,
+            f"{output_file} lasts {info.duration:.3f}s instead of "
+            + f"{duration:.3f}s"
+        )
+
+    def check_probe(self):
+        info = self.backend.probe(self.tone_file)
+        expect(info.codec == "pcm_s16le", f"Probed codec {info.codec}")
+        expect(
+            (info.sample_rate, info.channels) == (SAMPLE_RATE, CHANNELS),
+            f"Probed {info.sample_rate} Hz, {info.channels} channel(s)"
+        )
+        expect(
+            abs(info.duration - TONE_SECONDS) <= DURATION_TOLERANCE,
+            f"Probed a duration of {info.duration:.3f}s"
+        )
+        not_audio_file = self.path("not_audio.mp3")
+        with open(not_audio_file, "w") as output_file:
+            output_file.write("not audio\n")
+        try:
+            self.backend.probe(not_audio_file)
+        except probe.ProbeError:
+            return
+        raise ConformanceError("Probing a text file did not fail")
+
+    def check_formats(self):
+        output_files = [
+            self.path(f"formats.{output_format}")
+            for output_format in AUDIO_FORMATS
+        ]
+        percentages = []
+        results = self.convert(
+            self.tone_file, output_files, progress=percentages.append
+        )
+        expect(
+            [result.output_file for result in results] == output_files,
+            "Results do not match the outputs"
+        )
+        expect(
+            len(percentages) > 0 and percentages[-1] == 100,
+            f"Progress ended at {percentages[-1:]}"
+        )
+        expect(
+            percentages == sorted(percentages)
+            and 0 <= percentages[0] <= 100,
+            "Progress went backwards or out of range"
+        )
+        for output_file in output_files:
+            self.expect_audio(output_file, TONE_SECONDS)
+
+    def check_lossless(self):
+        flac_file = self.path("lossless.flac")
+        wav_file = self.path("lossless.wav")
+        self.convert(self.tone_file, [flac_file])
+        self.convert(flac_file, [wav_file])
+        expect(
+            read_samples(wav_file) == read_samples(self.tone_file),
+            "WAV to FLAC to WAV changed the samples"
+        )
+
+    def check_copy(self):
+        flac_file = self.path("copy_source.flac")
+        output_files = [self.path("copy.flac"), self.path("copy.ogg")]
+        self.convert(self.tone_file, [flac_file])
+        results = self.convert(flac_file, output_files)
+        expect(
+            [result.mode for result in results] == [engine.COPY_MODE] * 2,
+            f"Modes {[result.mode for result in results]}"
+        )
+        for output_file in output_files:
+            self.expect_audio(output_file, TONE_SECONDS)
+
+    def check_dither(self):
+        mp3_file = self.path("dither.mp3")
+        plain_file = self.path("dither_plain.wav")
+        dithered_file = self.path("dither.wav")
+        self.convert(self.tone_file, [mp3_file])
+        self.convert(mp3_file, [plain_file])
+        self.convert(mp3_file, [dithered_file], dither=True)
+        expect(
+            read_samples(plain_file) != read_samples(dithered_file),
+            "Dither did not change the 16-bit output"
+        )
+
+    def check_errors(self):
+        for input_file in (
+            self.path("missing.wav"), self.path("not_audio.mp3")
+        ):
+            try:
+                self.convert(input_file, [self.path("error.flac")])
+            except engine.ConversionError:
+                continue
+            raise ConformanceError(f"Converting {input_file} did not fail")
+
+    def check_cancel(self):
+        long_file = write_tone(self.path("long.wav"), CANCEL_SECONDS)
+        output_files = [self.path("cancel.flac"), self.path("cancel.mp3")]
+        started = threading.Event()
+
+        def progress(percent: int):
+            if percent > 0:
+                started.set()
+
+        with scheduler.Scheduler(1) as cancel_scheduler:
+            job = cancel_scheduler.submit(
+                scheduler.conversion(
+                    long_file, output_files, False,
+                    backend=self.backend.name
+                ), progress=progress
+            )
+            expect(
+                started.wait(CANCEL_TIMEOUT), "No progress before the timeout"
+            )
+            start_time = time.monotonic()
+            cancel_scheduler.cancel(job)
+            result = job.result(CANCEL_TIMEOUT)
+            elapsed = time.monotonic() - start_time
+        expect(
+            isinstance(result, scheduler.JobCancelled),
+            f"Cancelled job returned {result!r}"
+        )
+        expect(elapsed < 1.0, f"Cancelling took {elapsed:.2f}s")
+        left_over = [path for path in output_files if os.path.exists(path)]
+        expect(len(left_over) == 0, f"Partial outputs left: {left_over}")
+
+    def checks(self):
+        return [(name, getattr(self, f"check_{name}")) for name in CHECKS]
+
+
+def check_backend(name: str, report: callable = print):
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        conformance = Conformance(name, directory)
+        for check_name, check in conformance.checks():
+            start_time = time.monotonic()
+            try:
+                check()
+                status = "ok"
+            except Exception as error:
+                status = f"FAILED: {error}"
+                failures += 1
+            report(
+                f"{name:>8} {check_name:<9} {status} "
+                + f"({time.monotonic() - start_time:.2f}s)"
+            )
+    return failures
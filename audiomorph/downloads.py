@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from audiomorph.config import CACHE_DIRECTORY
+
+#----------------------------------------------------------------------#------#
+
+INFO_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "info.sqlite3")
+ARCHIVE_PATH = os.path.join(CACHE_DIRECTORY, "archive.sqlite3")
+# Format URLs handed out by most sites expire after a few hours
+DEFAULT_INFO_TTL = float(os.environ.get("AUDIOMORPH_INFO_TTL", "3600"))
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def connect(path: str):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return sqlite3.connect(path, check_same_thread=False)
+    except (OSError, sqlite3.Error):
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class InfoCache:
+    def __init__(
+        self, path: str = INFO_CACHE_PATH, ttl: float = DEFAULT_INFO_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS infos (
+                    key TEXT PRIMARY KEY,
+                    info TEXT NOT NULL,
+                    fetched REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT info FROM infos WHERE key = ? AND fetched > ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key: str, info: dict):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO infos VALUES (?, ?, ?)",
+                (key, json.dumps(info), time.time())
+            )
+            self.connection.execute(
+                "DELETE FROM infos WHERE fetched <= ? OR key IN (SELECT key "
+                + "FROM infos ORDER BY fetched DESC LIMIT -1 OFFSET ?)",
+                (time.time() - self.ttl, self.max_entries)
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM infos")
+
+
+class DownloadArchive:
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS downloads (
+                    key TEXT PRIMARY KEY,
+                    output_file TEXT NOT NULL,
+                    completed REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT output_file FROM downloads WHERE key = ?", (key,)
+            ).fetchone()
+        # Files removed since are downloaded again
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return row[0]
+
+    def put(self, key: str, output_file: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?)",
+                (key, os.path.abspath(output_file), time.time())
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM downloads")
+
+
+default_info_cache = None
+default_archive = None
+defaults_lock = threading.Lock()
+
+
+def get_default_info_cache():
+    global default_info_cache
+    with defaults_lock:
+        if default_info_cache is None:
+            default_info_cache = InfoCache()
+        return default_info_cache
+
+
+def get_default_archive():
+    global default_archive
+    with defaults_lock:
+        if default_archive is None:
+            default_archive = DownloadArchive()
+        return default_archive
@@ -0,0 +1,990 @@
+import os
+import struct
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from audiomorph import downloads, metrics, pcm, pipes, probe, results
+from audiomorph.config import DEFAULT_WORKERS, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+STREAM_COPY_CODECS = {
+    "aac": ("aac",),
+    "aiff": (
+        "pcm_s8", "pcm_s16be", "pcm_s24be", "pcm_s32be", "pcm_f32be",
+        "pcm_f64be"
+    ),
+    "flac": ("flac",),
+    "mp3": ("mp3",),
+    "m4a": ("aac", "alac"),
+    "ogg": ("vorbis", "opus", "flac"),
+    "opus": ("opus",),
+    "wav": (
+        "pcm_u8", "pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le",
+        "pcm_f64le"
+    ),
+}
+
+CACHED_MODE = "cached"
+COPY_MODE = "copy"
+TRANSCODE_MODE = "transcode"
+NATIVE_MODE = "native"
+DITHER_ARGUMENTS = ["-dither_method", "triangular"]
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_FRAGMENTS = 4
+
+STREAM_PROTOCOLS = ("http", "https")
+STREAM_CHUNK_SIZE = 10 * 1024 * 1024
+STREAM_READ_SIZE = 64 * 1024
+# Same quality as FFmpegExtractAudio with preferredquality "0"
+QUALITY_ARGUMENTS = {
+    "aac": ["-q:a", "4"],
+    "m4a": ["-q:a", "4"],
+    "mp3": ["-q:a", "0"],
+    "ogg": ["-q:a", "10"],
+}
+
+PASSTHROUGH_FORMAT = "original"
+PASSTHROUGH_CONTAINERS = {
+    "aac": "m4a",
+    "alac": "m4a",
+    "flac": "flac",
+    "mp3": "mp3",
+    "opus": "opus",
+    "vorbis": "ogg",
+}
+PASSTHROUGH_FALLBACK_CONTAINER = "mka"
+
+
+class FFmpegError(Exception):
+    def __init__(self, message: str, log: str = ""):
+        super().__init__(message)
+        # The end of FFmpeg's stderr, for reports beyond the message
+        self.log = log
+
+
+class ConversionError(FFmpegError):
+    pass
+
+
+class DownloadError(FFmpegError):
+    pass
+
+
+@dataclass
+class OutputProfile:
+    output_format: str
+    bit_rate: int = None
+    sample_rate: int = None
+
+
+DOWNLOAD_PROFILES = {
+    "FLAC (Lossless)": OutputProfile("flac"),
+    "Original Audio (No Re-encode)": OutputProfile(PASSTHROUGH_FORMAT),
+    "MP3 VBR V0": OutputProfile("mp3"),
+    "MP3 320 kbps": OutputProfile("mp3", 320),
+    "AAC 256 kbps": OutputProfile("m4a", 256),
+    "Opus 160 kbps": OutputProfile("opus", 160),
+    "WAV 48 kHz": OutputProfile("wav", sample_rate=48000),
+}
+DEFAULT_PROFILE = DOWNLOAD_PROFILES["FLAC (Lossless)"]
+
+
+@dataclass
+class ConversionResult:
+    input_file: str
+    output_file: str
+    duration: float
+    elapsed: float
+    mode: str
+
+
+@dataclass
+class ConversionPlan:
+    input_file: str
+    output_files: list
+    duration: float
+    arguments: list
+    modes: list
+    keys: dict
+    start_time: float
+    dither: bool = False
+    # Reads the input's waveform peaks from an extra FFmpeg output
+    peaks: object = None
+    # Channel count of every encoded output, when it is not the input's
+    channels: int = None
+
+
+class QuietLogger:
+    def debug(self, msg):
+        pass
+    def info(self, msg):
+        pass
+    def warning(self, msg):
+        pass
+    def error(self, msg):
+        pass
+
+#----------------------------------------------------------------------#------#
+
+def parse_formats(formats: str):
+    output_formats = []
+    for output_format in formats.split(","):
+        output_format = output_format.strip().lstrip(".").lower()
+        if output_format != "" and output_format not in output_formats:
+            output_formats.append(output_format)
+    return output_formats
+
+
+def output_path(input_file: str, output_directory: str, output_format: str):
+    file_name_without_extension = os.path.splitext(
+        os.path.basename(input_file)
+    )[0]
+    return os.path.join(
+        output_directory, f"{file_name_without_extension}.{output_format}"
+    ).replace("\\", "/")
+
+
+def can_stream_copy(codec: str, output_file: str):
+    output_format = os.path.splitext(output_file)[1][1:].lower()
+    return codec in STREAM_COPY_CODECS.get(output_format, ())
+
+
+def ffmpeg_command(arguments: list):
+    return [
+        FFMPEG_PATH, "-progress", "pipe:1", "-stats_period", "0.05",
+        "-nostats", "-loglevel", "warning", "-y", *arguments
+    ]
+
+
+def failure_message(message: str, log: pipes.LogBuffer = None):
+    last_line = log.last_line() if log is not None else ""
+    return f"{message}: {last_line}" if last_line != "" else message
+
+
+def run_ffmpeg(
+    arguments: list, duration: float, progress: callable = None,
+    log: pipes.LogBuffer = None, pass_fds: tuple = ()
+):
+    with metrics.span("spawn"):
+        process = subprocess.Popen(
+            ffmpeg_command(arguments), stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            pass_fds=pass_fds
+        )
+    with metrics.span("encode"):
+        return pipes.communicate(
+            process, pipes.ProgressParser(duration, progress),
+            log if log is not None else pipes.LogBuffer()
+        )
+
+
+def plan_conversion(
+    input_file: str, output_files: list, use_cache: bool = True,
+    dither: bool = False, backend=None, channels: int = None
+):
+    start_time = time.monotonic()
+    try:
+        with metrics.span("probe"):
+            if backend is not None:
+                info = backend.probe(input_file)
+            else:
+                info = probe.probe(input_file)
+    except probe.ProbeError as error:
+        raise ConversionError(str(error))
+    cache = results.get_default_cache() if use_cache else None
+    # Results from different encoder builds are not interchangeable
+    version = backend.version() if backend is not None else None
+    if channels == info.channels:
+        channels = None
+    arguments = ["-i", input_file]
+    modes = []
+    keys = {}
+    for output_file in output_files:
+        if channels is None and can_stream_copy(info.codec, output_file):
+            mode, options = COPY_MODE, ["-c:a", "copy"]
+        else:
+            mode, options = TRANSCODE_MODE, DITHER_ARGUMENTS if dither else []
+            if channels is not None:
+                options = ["-ac", str(channels), *options]
+        if cache is not None:
+            with metrics.span("cache"):
+                keys[output_file] = cache.key(
+                    input_file, output_file, options, version
+                )
+                cached = cache.fetch(keys[output_file], output_file)
+            if cached:
+                modes.append(CACHED_MODE)
+                continue
+        modes.append(mode)
+        arguments += [*options, output_file]
+    tap = None
+    if backend is not None and backend.peak_tap and (
+        modes.count(CACHED_MODE) < len(modes)
+    ):
+        from audiomorph import peaks
+
+        tap = peaks.get_default_cache().tap(input_file, info)
+        if tap is not None:
+            arguments += tap.arguments
+    return ConversionPlan(
+        input_file, output_files, info.duration, arguments, modes, keys,
+        start_time, dither, tap, channels
+    )
+
+
+def finish_peaks(plan: ConversionPlan, success: bool):
+    if plan.peaks is not None:
+        plan.peaks.finish(success)
+        plan.peaks = None
+
+
+def finish_conversion(
+    plan: ConversionPlan, return_code: int = None,
+    log: pipes.LogBuffer = None
+):
+    finish_peaks(plan, return_code == 0)
+    # return_code is None when every output came from the cache
+    if return_code is not None:
+        missing_files = [
+            output_file for output_file in plan.output_files
+            if not os.path.exists(output_file)
+        ]
+        if return_code != 0 or len(missing_files) > 0:
+            raise ConversionError(failure_message(
+                f"FFmpeg exited with code {return_code} "
+                + f"while converting {plan.input_file}", log
+            ), log.text() if log is not None else "")
+        with metrics.span("store"):
+            for output_file, mode in zip(plan.output_files, plan.modes):
+                if output_file in plan.keys and mode != CACHED_MODE:
+                    results.get_default_cache().store(
+                        plan.keys[output_file], output_file
+                    )
+        metrics.note("bytes_in", metrics.file_size(plan.input_file))
+        metrics.add("bytes_out", sum(
+            metrics.file_size(output_file)
+            for output_file, mode in zip(plan.output_files, plan.modes)
+            if mode != CACHED_MODE
+        ))
+    metrics.note("audio_seconds", plan.duration)
+    elapsed = time.monotonic() - plan.start_time
+    return [
+        ConversionResult(
+            plan.input_file, output_file, plan.duration, elapsed, mode
+        )
+        for output_file, mode in zip(plan.output_files, plan.modes)
+    ]
+
+
+def remove_outputs(plan: ConversionPlan):
+    finish_peaks(plan, False)
+    for output_file, mode in zip(plan.output_files, plan.modes):
+        if mode != CACHED_MODE:
+            try:
+                os.remove(output_file)
+            except OSError:
+                pass
+
+
+def native_codec(
+    info: pcm.PcmInfo, output_file: str, channels: int = None
+):
+    container = os.path.splitext(output_file)[1][1:].lower()
+    if container not in pcm.DEFAULT_CODECS:
+        return None
+    if channels is not None and channels != info.channels:
+        if not pcm.can_downmix(info, channels):
+            return None
+        codec = pcm.DEFAULT_CODECS[container]
+    elif can_stream_copy(info.codec, output_file):
+        codec = info.codec
+    else:
+        codec = pcm.DEFAULT_CODECS[container]
+    return codec if pcm.can_write(container, codec, info) else None
+
+
+def convert_native(
+    input_file: str, output_files: list, progress: callable = None,
+    dither: bool = False, channels: int = None
+):
+    # PCM to PCM conversions without starting FFprobe or FFmpeg; None when
+    # a file needs them. Cheaper than hashing it for the result cache.
+    if not pcm.available() or not all(
+        os.path.splitext(output_file)[1][1:].lower() in pcm.DEFAULT_CODECS
+        for output_file in output_files
+    ):
+        return None
+    start_time = time.monotonic()
+    try:
+        info = pcm.read_info(input_file)
+    except (OSError, struct.error, pcm.PcmError):
+        return None
+    codecs = [
+        native_codec(info, output_file, channels)
+        for output_file in output_files
+    ]
+    if None in codecs:
+        return None
+    if channels == info.channels:
+        channels = None
+    modes = []
+    for index, (output_file, codec) in enumerate(zip(output_files, codecs)):
+        def output_progress(percent: int):
+            if progress is not None:
+                progress(int((index*100 + percent) / len(output_files)))
+
+        temporary_file = temporary_path(output_file)
+        try:
+            with metrics.span("native"):
+                pcm.convert(
+                    info, input_file, temporary_file,
+                    os.path.splitext(output_file)[1][1:].lower(), codec,
+                    output_progress, dither, channels
+                )
+            os.replace(temporary_file, output_file)
+        except (OSError, ValueError) as error:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise ConversionError(f"Could not write {output_file}: {error}")
+        modes.append(
+            COPY_MODE if codec == info.codec and channels is None
+            else NATIVE_MODE
+        )
+    duration = info.frames / info.sample_rate if info.sample_rate else 0.0
+    metrics.note("audio_seconds", duration)
+    metrics.note("bytes_in", metrics.file_size(input_file))
+    metrics.add("bytes_out", sum(map(metrics.file_size, output_files)))
+    elapsed = time.monotonic() - start_time
+    return [
+        ConversionResult(input_file, output_file, duration, elapsed, mode)
+        for output_file, mode in zip(output_files, modes)
+    ]
+
+
+def convert_many(
+    input_file: str, output_files: list, progress: callable = None,
+    use_cache: bool = True, dither: bool = False, backend: str = None,
+    channels: int = None
+):
+    from audiomorph import backends
+
+    with metrics.job("convert", input_file):
+        conversion_backend = backends.get_backend(backend)
+        native_results = convert_native(
+            input_file, output_files, progress, dither, channels
+        )
+        if native_results is not None:
+            return native_results
+        plan = plan_conversion(
+            input_file, output_files, use_cache, dither, conversion_backend,
+            channels
+        )
+        if plan.modes.count(CACHED_MODE) == len(output_files):
+            if progress is not None:
+                progress(100)
+            return finish_conversion(plan)
+        try:
+            return_code, log = conversion_backend.run(plan, progress)
+        except BaseException:
+            finish_peaks(plan, False)
+            raise
+        return finish_conversion(plan, return_code, log)
+
+
+def convert(
+    input_file: str, output_file: str, progress: callable = None,
+    use_cache: bool = True, dither: bool = False, backend: str = None
+):
+    return convert_many(
+        input_file, [output_file], progress, use_cache, dither, backend
+    )[0]
+
+
+def convert_batch(
+    jobs: list, workers: int = None, progress: callable = None,
+    complete: callable = None, split: bool = False, segments: int = None,
+    verify_output: bool = False, use_cache: bool = True,
+    dither: bool = False, backend: str = None, tracks: bool = False,
+    chapter_file: str = None, channels: int = None, priority: int = 0
+):
+    from audiomorph import scheduler
+
+    workers = workers or DEFAULT_WORKERS
+    if split:
+        from audiomorph import segmented
+    if tracks:
+        from audiomorph import chapters
+
+    def job_callback(callback: callable, index: int):
+        if callback is None:
+            return None
+        def call(value):
+            callback(index, value)
+        return call
+
+    # Long files are split across the workers, so run one file at a time
+    with scheduler.Scheduler(
+        1 if split or tracks else workers
+    ) as batch_scheduler:
+        submitted = []
+        for index, (input_file, output_files) in enumerate(jobs):
+            if tracks:
+                function = scheduler.blocking(
+                    chapters.split_many, input_file, output_files,
+                    chapter_file, workers, use_cache=use_cache,
+                    dither=dither, backend=backend
+                )
+            elif split:
+                function = scheduler.blocking(
+                    segmented.convert_many, input_file, output_files,
+                    segments, workers, verify_output=verify_output,
+                    use_cache=use_cache, dither=dither, backend=backend
+                )
+            else:
+                function = scheduler.conversion(
+                    input_file, output_files, use_cache, dither, backend,
+                    channels
+                )
+            submitted.append(batch_scheduler.submit(
+                function, priority, progress=job_callback(progress, index),
+                complete=job_callback(complete, index)
+            ))
+        return [job.result() for job in submitted]
+
+
+def downloader_options(**options):
+    return {
+        "quiet": True,
+        "no_warnings": True,
+        "logtostderr": True,
+        "logger": QuietLogger(),
+        "ffmpeg_location": FFMPEG_PATH,
+        **options
+    }
+
+
+def entry_title(entry):
+    if isinstance(entry, Exception):
+        return str(entry)
+    return entry.get("title") or entry.get("url") or entry.get("id", "")
+
+
+def extract_cached(
+    downloader, url: str, key: str, ie_key: str = None,
+    use_cache: bool = True
+):
+    cache = downloads.get_default_info_cache() if use_cache else None
+    info = cache.get(key) if cache is not None else None
+    if info is not None:
+        return info
+    info = downloader.extract_info(
+        url, download=False, ie_key=ie_key, process=False
+    )
+    if info.get("_type") in ("playlist", "multi_video"):
+        info["entries"] = [entry for entry in info["entries"] if entry]
+    # The same JSON-safe form yt-dlp loads back with --load-info-json
+    info = downloader.sanitize_info(info)
+    if cache is not None:
+        cache.put(key, info)
+    return info
+
+
+def resolve_entry(downloader, entry: dict, use_cache: bool = True):
+    if entry.get("_type") != "url":
+        return dict(entry)
+    return extract_cached(
+        downloader, entry["url"], f"entry {entry['url']}",
+        entry.get("ie_key"), use_cache
+    )
+
+
+def archive_key(
+    entry, output_file_path: str, profile: OutputProfile,
+    split_chapters: bool = False
+):
+    if isinstance(entry, Exception):
+        return None
+    extractor = entry.get("ie_key") or entry.get("extractor_key")
+    if not extractor or not entry.get("id"):
+        return None
+    key = " ".join((
+        extractor.lower(), str(entry["id"]), profile.output_format,
+        str(profile.bit_rate), str(profile.sample_rate),
+        os.path.abspath(output_file_path)
+    ))
+    return key + " chapters" if split_chapters else key
+
+
+def batch_output_path(entries: list, output_file_path: str):
+    # Several downloads cannot share one fixed name
+    if len(entries) > 1 and "%(" not in os.path.basename(output_file_path):
+        return output_file_path + " [%(id)s]"
+    return output_file_path
+
+
+def existing_outputs(
+    entries: list, output_file_path: str, profile: OutputProfile,
+    split_chapters: bool = False, use_archive: bool = True
+):
+    from yt_dlp import YoutubeDL
+
+    # Files download_many would overwrite, with the names yt-dlp gives
+    # them; archived entries are returned as they are, not downloaded
+    output_file_path = batch_output_path(entries, output_file_path)
+    archive = downloads.get_default_archive() if use_archive else None
+    existing = []
+    with YoutubeDL(downloader_options(
+        outtmpl=output_file_path + ".%(ext)s"
+    )) as downloader:
+        for entry in entries:
+            if isinstance(entry, Exception):
+                continue
+            key = archive_key(entry, output_file_path, profile, split_chapters)
+            if archive is not None and key is not None and (
+                archive.get(key) is not None
+            ):
+                continue
+            name = os.path.splitext(downloader.prepare_filename(entry))[0]
+            existing += [
+                f"{name}.{extension}"
+                for extension in output_extensions(profile)
+                if os.path.exists(f"{name}.{extension}")
+            ]
+    return existing
+
+
+def expand_urls(urls: list, playlist: bool = True, use_cache: bool = True):
+    from yt_dlp import YoutubeDL
+
+    entries = []
+    with YoutubeDL(downloader_options(
+        noplaylist=not playlist, extract_flat="in_playlist"
+    )) as downloader:
+        for url in urls:
+            try:
+                with metrics.span("extract", url=url):
+                    info = extract_cached(
+                        downloader, url,
+                        f"{'playlist' if playlist else 'video'} {url}",
+                        use_cache=use_cache
+                    )
+                if info.get("_type") in ("playlist", "multi_video"):
+                    entries += [entry for entry in info["entries"] if entry]
+                else:
+                    entries.append(info)
+            except Exception as error:
+                # Reported as a failed download so other URLs still run
+                entries.append(DownloadError(f"Could not read {url}: {error}"))
+    return entries
+
+
+def download_entry(
+    entry: dict, output_file_path: str, progress: callable = None,
+    fragments: int = DEFAULT_FRAGMENTS, use_cache: bool = True
+):
+    from yt_dlp import YoutubeDL
+
+    last_percent = -1
+
+    def progress_hook(download):
+        nonlocal last_percent
+        if download['status'] == 'downloading' and progress is not None:
+            total_bytes = (
+                download.get("total_bytes")
+                or download.get("total_bytes_estimate")
+            )
+            if not total_bytes:
+                return
+            percent = int(download["downloaded_bytes"] * 100 / total_bytes)
+            if percent != last_percent:
+                last_percent = percent
+                progress(percent)
+
+    try:
+        with YoutubeDL(downloader_options(
+            progress_hooks=[progress_hook],
+            format="bestaudio/best",
+            # The name is the same on every run, so yt-dlp carries on from
+            # the .part file an interrupted run left behind
+            outtmpl=output_file_path + ".%(ext)s",
+            concurrent_fragment_downloads=fragments
+        )) as downloader:
+            with metrics.span("resolve"):
+                resolved = resolve_entry(downloader, entry, use_cache)
+            with metrics.span("download"):
+                info = downloader.process_ie_result(resolved, download=True)
+    except Exception as error:
+        raise DownloadError(
+            f"Could not download {entry_title(entry)}: {error}"
+        )
+    requested = info.get("requested_downloads") or [{}]
+    if not os.path.exists(requested[-1].get("filepath", "")):
+        raise DownloadError(
+            f"Download of {entry_title(entry)} produced no file"
+        )
+    metrics.note("bytes_in", metrics.file_size(requested[-1]["filepath"]))
+    # yt-dlp leaves out what the download shares with the video, chapters
+    # included
+    return {**info, **requested[-1]}
+
+
+def output_extensions(profile: OutputProfile):
+    if profile.output_format == PASSTHROUGH_FORMAT:
+        return (
+            *sorted(set(PASSTHROUGH_CONTAINERS.values())),
+            PASSTHROUGH_FALLBACK_CONTAINER
+        )
+    return (profile.output_format,)
+
+
+def profile_extension(profile: OutputProfile, codec: str):
+    if profile.output_format == PASSTHROUGH_FORMAT:
+        return PASSTHROUGH_CONTAINERS.get(
+            codec, PASSTHROUGH_FALLBACK_CONTAINER
+        )
+    return profile.output_format
+
+
+def profile_arguments(profile: OutputProfile, codec: str, output_file: str):
+    if profile.output_format == PASSTHROUGH_FORMAT or (
+        can_stream_copy(codec, output_file) and profile.bit_rate is None
+        and profile.sample_rate is None
+    ):
+        return ["-c:a", "copy"]
+    if profile.bit_rate is not None:
+        arguments = ["-b:a", f"{profile.bit_rate}k"]
+    else:
+        arguments = list(QUALITY_ARGUMENTS.get(profile.output_format, []))
+    if profile.sample_rate is not None:
+        arguments += ["-ar", str(profile.sample_rate)]
+    return arguments
+
+
+def temporary_path(output_file: str):
+    # Written beside the output and renamed over it once complete
+    directory = os.path.dirname(os.path.abspath(output_file))
+    extension = os.path.splitext(output_file)[1]
+    return os.path.join(
+        directory, f".audiomorph-{os.urandom(6).hex()}{extension}"
+    )
+
+
+def extract_audio(
+    download_info: dict, profile: OutputProfile, split_chapters: bool = False
+):
+    with metrics.span("postprocess"):
+        if split_chapters:
+            from audiomorph import chapters
+
+            # A folder of tracks, unless the video has no chapters
+            track_directory = chapters.split_download(download_info, profile)
+            if track_directory is not None:
+                return track_directory
+        output_file = extract_file(download_info, profile)
+    metrics.add("bytes_out", metrics.file_size(output_file))
+    return output_file
+
+
+def extract_file(download_info: dict, profile: OutputProfile):
+    input_file = download_info["filepath"]
+    try:
+        with metrics.span("probe"):
+            info = probe.run_ffprobe(input_file)
+    except probe.ProbeError as error:
+        raise DownloadError(str(error))
+    metrics.note("audio_seconds", info.duration)
+    output_file = (
+        os.path.splitext(input_file)[0]
+        + f".{profile_extension(profile, info.codec)}"
+    )
+    arguments = profile_arguments(profile, info.codec, output_file)
+    if output_file == input_file and arguments == ["-c:a", "copy"]:
+        return output_file
+    temporary_file = temporary_path(output_file)
+    log = pipes.LogBuffer()
+    return_code = run_ffmpeg(
+        ["-i", input_file, "-vn", *arguments, temporary_file], info.duration,
+        log=log
+    )
+    if return_code != 0 or not os.path.exists(temporary_file):
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        raise DownloadError(failure_message(
+            f"FFmpeg exited with code {return_code} while extracting audio "
+            + f"from {input_file}", log
+        ), log.text())
+    os.replace(temporary_file, output_file)
+    if output_file != input_file:
+        os.remove(input_file)
+    return output_file
+
+
+def read_ranges(downloader, url: str, headers: dict):
+    from yt_dlp.networking import Request
+
+    # Ranged requests keep servers that throttle long responses at speed
+    start = 0
+    while True:
+        response = downloader.urlopen(Request(url, headers={
+            **headers,
+            "Range": f"bytes={start}-{start + STREAM_CHUNK_SIZE - 1}"
+        }))
+        content_range = response.headers.get("Content-Range", "")
+        if response.status != 206 or "/" not in content_range:
+            length = response.headers.get("Content-Length")
+            yield int(length) if length else None, response
+            return
+        total_bytes = content_range.rsplit("/", 1)[1]
+        total_bytes = int(total_bytes) if total_bytes.isdigit() else None
+        yield total_bytes, response
+        start += STREAM_CHUNK_SIZE
+        if total_bytes is None or start >= total_bytes:
+            return
+
+
+def write_stream(
+    downloader, selected: dict, pipe, progress: callable = None
+):
+    received_bytes = 0
+    last_percent = -1
+    for total_bytes, response in read_ranges(
+        downloader, selected["url"], selected.get("http_headers", {})
+    ):
+        total_bytes = total_bytes or selected.get("filesize")
+        while chunk := response.read(STREAM_READ_SIZE):
+            pipe.write(chunk)
+            received_bytes += len(chunk)
+            if progress is None or not total_bytes:
+                continue
+            percent = min(int(received_bytes * 100 / total_bytes), 99)
+            if percent != last_percent:
+                last_percent = percent
+                progress(percent)
+    return received_bytes
+
+
+def stream_entry(
+    entry: dict, output_file_path: str, profile: OutputProfile,
+    progress: callable = None, use_cache: bool = True
+):
+    from yt_dlp import YoutubeDL
+
+    with YoutubeDL(downloader_options(
+        format="bestaudio/best", outtmpl=output_file_path + ".%(ext)s"
+    )) as downloader:
+        try:
+            with metrics.span("resolve"):
+                info = downloader.process_ie_result(
+                    resolve_entry(downloader, entry, use_cache),
+                    download=False
+                )
+        except Exception as error:
+            raise DownloadError(
+                f"Could not download {entry_title(entry)}: {error}"
+            )
+        selected = info.get("requested_formats") or [info]
+        if (
+            len(selected) != 1
+            or selected[0].get("protocol") not in STREAM_PROTOCOLS
+        ):
+            return None
+        selected = selected[0]
+        codec = (selected.get("acodec") or "").split(".")[0]
+        codec = "aac" if codec == "mp4a" else codec
+        if (
+            profile.output_format == PASSTHROUGH_FORMAT
+            and codec not in PASSTHROUGH_CONTAINERS
+        ):
+            # The container depends on a codec the site did not report
+            return None
+        output_file = (
+            os.path.splitext(downloader.prepare_filename(info))[0]
+            + f".{profile_extension(profile, codec)}"
+        )
+        codec_arguments = profile_arguments(profile, codec, output_file)
+        os.makedirs(
+            os.path.dirname(os.path.abspath(output_file)), exist_ok=True
+        )
+        temporary_file = temporary_path(output_file)
+        with metrics.span("spawn"):
+            process = subprocess.Popen([
+                    FFMPEG_PATH, "-nostats", "-loglevel", "warning", "-y",
+                    "-i", "pipe:0", "-vn", *codec_arguments, temporary_file
+                ], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+        # Drained while we write, so FFmpeg never blocks on a full pipe
+        log = pipes.LogBuffer()
+        reader = pipes.start_drain(process.stderr, log.write)
+        try:
+            with metrics.span("stream"):
+                received_bytes = write_stream(
+                    downloader, selected, process.stdin, progress
+                )
+                process.stdin.close()
+                return_code = process.wait()
+                reader.join()
+        except Exception as error:
+            process.kill()
+            process.wait()
+            reader.join()
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise DownloadError(failure_message(
+                f"Could not stream {entry_title(entry)}: {error}", log
+            ), log.text())
+    if return_code != 0:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        raise DownloadError(failure_message(
+            f"FFmpeg exited with code {return_code} while streaming "
+            + entry_title(entry), log
+        ), log.text())
+    os.replace(temporary_file, output_file)
+    metrics.note("bytes_in", received_bytes)
+    metrics.add("bytes_out", metrics.file_size(output_file))
+    duration = info.get("duration")
+    if not duration:
+        try:
+            duration = probe.run_ffprobe(output_file).duration
+        except probe.ProbeError:
+            duration = 0.0
+    metrics.note("audio_seconds", duration)
+    return output_file
+
+
+def download(
+    url: str, output_file_path: str,
+    profile: OutputProfile = DEFAULT_PROFILE, progress: callable = None,
+    streaming: bool = False, use_cache: bool = True,
+    split_chapters: bool = False, use_archive: bool = True
+):
+    with metrics.job("download", url):
+        entries = expand_urls([url], playlist=False, use_cache=use_cache)
+        if len(entries) == 0:
+            raise DownloadError(f"Nothing to download at {url}")
+        if isinstance(entries[0], Exception):
+            raise entries[0]
+        archive = downloads.get_default_archive() if use_archive else None
+        key = archive_key(
+            entries[0], output_file_path, profile, split_chapters
+        )
+        if archive is not None and key is not None:
+            archived_file = archive.get(key)
+            if archived_file is not None:
+                return archived_file
+        output_file = None
+        # Chapters are cut from the finished file, so it is not streamed
+        if streaming and not split_chapters:
+            output_file = stream_entry(
+                entries[0], output_file_path, profile, progress, use_cache
+            )
+        if output_file is None:
+            download_info = download_entry(
+                entries[0], output_file_path, progress, use_cache=use_cache
+            )
+            output_file = extract_audio(download_info, profile, split_chapters)
+        if archive is not None and key is not None:
+            archive.put(key, output_file)
+        return output_file
+
+
+def download_many(
+    entries: list, output_file_path: str,
+    profile: OutputProfile = DEFAULT_PROFILE,
+    workers: int = DEFAULT_DOWNLOAD_WORKERS, postprocess_workers: int = None,
+    fragments: int = DEFAULT_FRAGMENTS, progress: callable = None,
+    complete: callable = None, streaming: bool = False,
+    use_cache: bool = True, use_archive: bool = True,
+    split_chapters: bool = False
+):
+    output_file_path = batch_output_path(entries, output_file_path)
+    archive = downloads.get_default_archive() if use_archive else None
+    outputs = [None] * len(entries)
+    recorder = metrics.get_default_recorder()
+    traces = [None] * len(entries)
+    submitted = time.monotonic()
+
+    def finish(index: int, result):
+        outputs[index] = result
+        if traces[index] is not None:
+            traces[index].finish(
+                "failed" if isinstance(result, Exception) else "ok"
+            )
+        key = archive_key(
+            entries[index], output_file_path, profile, split_chapters
+        )
+        if (
+            archive is not None and key is not None
+            and not isinstance(result, Exception)
+        ):
+            archive.put(key, result)
+        if complete is not None:
+            complete(index, result)
+
+    def run_postprocess(index: int, download_info: dict, queued: float):
+        traces[index].queue_wait += time.monotonic() - queued
+        with traces[index].activate():
+            try:
+                result = extract_audio(download_info, profile, split_chapters)
+            except Exception as error:
+                result = error
+        finish(index, result)
+
+    # Network and FFmpeg work overlap: finished downloads are handed to a
+    # separate pool instead of blocking a download slot while they encode
+    with ThreadPoolExecutor(
+        max_workers=postprocess_workers or DEFAULT_WORKERS
+    ) as postprocess_pool:
+        def run_download(index: int, entry):
+            if isinstance(entry, Exception):
+                finish(index, entry)
+                return
+            traces[index] = recorder.start_job(
+                "download", entry_title(entry),
+                time.monotonic() - submitted
+            )
+            with traces[index].activate():
+                run_entry(index, entry)
+
+        def run_entry(index: int, entry: dict):
+            key = archive_key(
+                entry, output_file_path, profile, split_chapters
+            )
+            if archive is not None and key is not None:
+                archived_file = archive.get(key)
+                if archived_file is not None:
+                    finish(index, archived_file)
+                    return
+
+            def entry_progress(percent: int):
+                if progress is not None:
+                    progress(index, min(percent, 99))
+
+            try:
+                if streaming and not split_chapters:
+                    output_file = stream_entry(
+                        entry, output_file_path, profile, entry_progress,
+                        use_cache
+                    )
+                    if output_file is not None:
+                        finish(index, output_file)
+                        return
+                download_info = download_entry(
+                    entry, output_file_path, entry_progress, fragments,
+                    use_cache
+                )
+            except Exception as error:
+                finish(index, error)
+                return
+            postprocess_pool.submit(
+                run_postprocess, index, download_info, time.monotonic()
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as download_pool:
+            list(download_pool.map(run_download, range(len(entries)), entries))
+    return outputs
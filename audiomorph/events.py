@@ -0,0 +1,84 @@
+import threading
+from dataclasses import dataclass
+
+#----------------------------------------------------------------------#------#
+
+DEFAULT_INTERVAL = 0.1
+
+
+@dataclass
+class ProgressEvent:
+    job: object
+    percent: int
+    finished: bool = False
+    result: object = None
+
+
+class ProgressBus:
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.stopping = threading.Event()
+        self.percentages = {}
+        self.finished = []
+        self.subscribers = []
+        self.thread = None
+
+    def publish(self, job, percent: int):
+        with self.condition:
+            self.percentages[job] = percent
+            self.condition.notify()
+
+    def publisher(self, job):
+        def publish_job(percent: int):
+            self.publish(job, percent)
+        return publish_job
+
+    def finish(self, job, result=None):
+        with self.condition:
+            self.percentages.pop(job, None)
+            self.finished.append(ProgressEvent(job, 100, True, result))
+            self.condition.notify()
+
+    def drain(self):
+        with self.condition:
+            events = [
+                ProgressEvent(job, percent)
+                for job, percent in self.percentages.items()
+            ] + self.finished
+            self.percentages = {}
+            self.finished = []
+        return events
+
+    def subscribe(self, callback: callable):
+        self.subscribers.append(callback)
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopping.set()
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while (
+                    not self.stopping.is_set() and len(self.percentages) == 0
+                    and len(self.finished) == 0
+                ):
+                    self.condition.wait()
+            events = self.drain()
+            if len(events) > 0:
+                for subscriber in self.subscribers:
+                    subscriber(events)
+            elif self.stopping.is_set():
+                return
+            # Coalesce everything published until the next delivery
+            self.stopping.wait(self.interval)
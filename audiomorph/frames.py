@@ -0,0 +1,382 @@
+import mmap
+import os
+
+#----------------------------------------------------------------------#------#
+
+FLAC_SYNC = b"\xff\xf8"
+FLAC_STREAMINFO_LENGTH = 34
+
+MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+class FrameError(Exception):
+    pass
+
+
+def build_crc_table(polynomial: int, width: int, reflected: bool):
+    table = []
+    top_bit = 1 << (width - 1)
+    mask = (1 << width) - 1
+    for byte in range(256):
+        if reflected:
+            crc = byte
+            for _ in range(8):
+                crc = (crc >> 1) ^ polynomial if crc & 1 else crc >> 1
+        else:
+            crc = byte << (width - 8)
+            for _ in range(8):
+                crc = (crc << 1) ^ polynomial if crc & top_bit else crc << 1
+        table.append(crc & mask)
+    return table
+
+
+CRC8_TABLE = build_crc_table(0x07, 8, False)
+CRC16_TABLE = build_crc_table(0x8005, 16, False)
+CRC16_REFLECTED_TABLE = build_crc_table(0xA001, 16, True)
+
+
+def crc8(data: bytes):
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def crc16(data: bytes):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def crc16_reflected(data: bytes):
+    crc = 0
+    for byte in data:
+        crc = (crc >> 8) ^ CRC16_REFLECTED_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_multiply(a: int, b: int):
+    result = 0
+    while b:
+        if b & 1:
+            result ^= a
+        b >>= 1
+        a <<= 1
+        if a & 0x10000:
+            a ^= 0x18005
+    return result
+
+
+def crc16_shift(crc: int, length: int):
+    # crc * x^(8 * length) mod P: the CRC of data followed by length zeros
+    result = 1
+    base = 2
+    exponent = 8 * length
+    while exponent:
+        if exponent & 1:
+            result = crc16_multiply(result, base)
+        base = crc16_multiply(base, base)
+        exponent >>= 1
+    return crc16_multiply(crc, result)
+
+#----------------------------------------------------------------------#------#
+
+def read_flac_number(data, position: int):
+    first = data[position]
+    if first < 0x80:
+        return first, 1
+    length = 0
+    while first & (0x80 >> length):
+        length += 1
+    if length < 2 or length > 7:
+        raise FrameError("Invalid FLAC frame number")
+    value = first & (0x7F >> length)
+    for offset in range(1, length):
+        value = (value << 6) | (data[position + offset] & 0x3F)
+    return value, length
+
+
+def write_flac_number(value: int):
+    if value < 0x80:
+        return bytes([value])
+    for length, limit in ((2, 11), (3, 16), (4, 21), (5, 26), (6, 31)):
+        if value < (1 << limit):
+            break
+    else:
+        length = 7
+    encoded = []
+    for _ in range(length - 1):
+        encoded.insert(0, 0x80 | (value & 0x3F))
+        value >>= 6
+    encoded.insert(0, ((0xFF00 >> length) & 0xFF) | value)
+    return bytes(encoded)
+
+
+def parse_flac_header(data, position: int):
+    if position + 6 > len(data) or data[position:position + 2] != FLAC_SYNC:
+        return None
+    block_size_code = data[position + 2] >> 4
+    sample_rate_code = data[position + 2] & 0x0F
+    if block_size_code == 0 or sample_rate_code == 0x0F:
+        return None
+    try:
+        number, number_length = read_flac_number(data, position + 4)
+    except (FrameError, IndexError):
+        return None
+    extra_length = {6: 1, 7: 2}.get(block_size_code, 0)
+    extra_length += {12: 1, 13: 2, 14: 2}.get(sample_rate_code, 0)
+    crc_position = position + 4 + number_length + extra_length
+    if crc_position >= len(data):
+        return None
+    if crc8(data[position:crc_position]) != data[crc_position]:
+        return None
+    return number, number_length, crc_position + 1
+
+
+def read_flac_streaminfo(data):
+    if data[:4] != b"fLaC":
+        raise FrameError("Not a FLAC file")
+    position = 4
+    streaminfo = None
+    while True:
+        last = data[position] & 0x80
+        block_type = data[position] & 0x7F
+        length = int.from_bytes(data[position + 1:position + 4], "big")
+        if block_type == 0:
+            streaminfo = bytes(data[position + 4:position + 4 + length])
+        position += 4 + length
+        if last:
+            break
+    if streaminfo is None:
+        raise FrameError("FLAC file without STREAMINFO")
+    return streaminfo, position
+
+
+def flac_total_samples(streaminfo: bytes):
+    return int.from_bytes(streaminfo[13:18], "big") & 0xFFFFFFFFF
+
+
+def iterate_flac_frames(data, position: int):
+    expected_number = 0
+    header = parse_flac_header(data, position)
+    if header is None or header[0] != expected_number:
+        raise FrameError("FLAC audio does not start with frame 0")
+    while header is not None:
+        search = header[2]
+        next_header = None
+        while True:
+            search = data.find(FLAC_SYNC, search)
+            if search < 0:
+                break
+            next_header = parse_flac_header(data, search)
+            if next_header is not None and next_header[0] == (
+                expected_number + 1
+            ):
+                break
+            next_header = None
+            search += 1
+        end = search if next_header is not None else len(data)
+        yield position, header, end
+        position = end
+        header = next_header
+        expected_number += 1
+
+
+def write_renumbered_flac_frame(
+    output, data, position: int, header: tuple, end: int, number: int
+):
+    _, number_length, header_end = header
+    old_header = bytes(data[position:header_end])
+    new_header = bytearray(old_header[:4])
+    new_header += write_flac_number(number)
+    new_header += old_header[4 + number_length:-1]
+    new_header.append(crc8(new_header))
+    rest_length = end - 2 - header_end
+    old_crc = int.from_bytes(data[end - 2:end], "big")
+    new_crc = old_crc ^ crc16_shift(
+        crc16(old_header) ^ crc16(new_header), rest_length
+    )
+    output.write(new_header)
+    output.write(data[header_end:end - 2])
+    output.write(new_crc.to_bytes(2, "big"))
+
+
+def join_flac(segment_files: list, output_file: str):
+    segments = []
+    for segment_file in segment_files:
+        with open(segment_file, "rb") as segment:
+            data = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        segments.append(data)
+    try:
+        streaminfo, _ = read_flac_streaminfo(segments[0])
+        block_size = int.from_bytes(streaminfo[2:4], "big")
+        total_samples = 0
+        for index, data in enumerate(segments):
+            samples = flac_total_samples(read_flac_streaminfo(data)[0])
+            if index < len(segments) - 1 and samples % block_size != 0:
+                raise FrameError(
+                    "FLAC segments must be a multiple of the block size"
+                )
+            total_samples += samples
+        streaminfo = bytearray(streaminfo)
+        # Frame sizes and the MD5 signature are unknown for the joined stream
+        streaminfo[4:10] = bytes(6)
+        streaminfo[13] = (streaminfo[13] & 0xF0) | (total_samples >> 32)
+        streaminfo[14:18] = (total_samples & 0xFFFFFFFF).to_bytes(4, "big")
+        streaminfo[18:34] = bytes(16)
+        with open(output_file, "wb") as output:
+            output.write(b"fLaC")
+            output.write(bytes([0x80]))
+            output.write(FLAC_STREAMINFO_LENGTH.to_bytes(3, "big"))
+            output.write(streaminfo)
+            number = 0
+            for data in segments:
+                _, audio_start = read_flac_streaminfo(data)
+                for position, header, end in iterate_flac_frames(
+                    data, audio_start
+                ):
+                    write_renumbered_flac_frame(
+                        output, data, position, header, end, number
+                    )
+                    number += 1
+        return total_samples
+    finally:
+        for data in segments:
+            data.close()
+
+#----------------------------------------------------------------------#------#
+
+def parse_mp3_header(data, position: int):
+    if position + 4 > len(data):
+        return None
+    if data[position] != 0xFF or data[position + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[position + 1] >> 3) & 3
+    layer = (data[position + 1] >> 1) & 3
+    bitrate_index = data[position + 2] >> 4
+    sample_rate_index = (data[position + 2] >> 2) & 3
+    padding = (data[position + 2] >> 1) & 1
+    if (
+        version == 1 or layer != 1 or bitrate_index in (0, 15)
+        or sample_rate_index == 3
+    ):
+        return None
+    bitrate = MP3_BITRATES[version][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        return 144 * bitrate // sample_rate + padding, 1152
+    return 72 * bitrate // sample_rate + padding, 576
+
+
+def iterate_mp3_frames(data):
+    position = 0
+    while position < len(data):
+        header = parse_mp3_header(data, position)
+        if header is None:
+            raise FrameError(f"Invalid MP3 frame at byte {position}")
+        yield position, position + header[0], header[1]
+        position += header[0]
+
+
+def find_xing_tag(frame: bytes):
+    for tag in (b"Xing", b"Info"):
+        offset = frame.find(tag, 4, 48)
+        if offset >= 0:
+            return offset
+    return -1
+
+
+def find_lame_tag(frame: bytes):
+    offset = find_xing_tag(frame)
+    if offset < 0:
+        raise FrameError("MP3 stream without a Xing/Info frame")
+    flags = int.from_bytes(frame[offset + 4:offset + 8], "big")
+    position = offset + 8
+    for flag, length in ((1, 4), (2, 4), (4, 100), (8, 4)):
+        if flags & flag:
+            position += length
+    if position + 36 > len(frame):
+        raise FrameError("MP3 Xing/Info frame without a LAME tag")
+    return offset, flags, position
+
+
+def read_xing_delay(frame: bytes):
+    _, _, lame_tag = find_lame_tag(frame)
+    return int.from_bytes(frame[lame_tag + 21:lame_tag + 24], "big") >> 12
+
+
+def patch_xing_frame(
+    frame: bytes, frames: int, total_bytes: int, delay: int, padding: int
+):
+    offset, flags, lame_tag = find_lame_tag(frame)
+    frame = bytearray(frame)
+    if flags & 1:
+        frame[offset + 8:offset + 12] = frames.to_bytes(4, "big")
+    if flags & 2:
+        position = offset + 12 if flags & 1 else offset + 8
+        frame[position:position + 4] = total_bytes.to_bytes(4, "big")
+    frame[lame_tag + 21:lame_tag + 24] = (
+        (delay << 12) | padding
+    ).to_bytes(3, "big")
+    frame[lame_tag + 28:lame_tag + 32] = total_bytes.to_bytes(4, "big")
+    frame[lame_tag + 34:lame_tag + 36] = crc16_reflected(
+        frame[:lame_tag + 34]
+    ).to_bytes(2, "big")
+    return bytes(frame)
+
+#----------------------------------------------------------------------#------#
+
+def parse_adts_header(data, position: int):
+    if position + 7 > len(data):
+        return None
+    if data[position] != 0xFF or data[position + 1] & 0xF6 != 0xF0:
+        return None
+    length = (
+        ((data[position + 3] & 0x03) << 11) | (data[position + 4] << 3)
+        | (data[position + 5] >> 5)
+    )
+    if length < 7:
+        return None
+    return length, 1024 * ((data[position + 6] & 0x03) + 1)
+
+
+def iterate_adts_frames(data):
+    position = 0
+    while position < len(data):
+        header = parse_adts_header(data, position)
+        if header is None:
+            raise FrameError(f"Invalid ADTS frame at byte {position}")
+        yield position, position + header[0], header[1]
+        position += header[0]
+
+
+def join_frames(
+    output, segment_files: list, ranges: list, iterate: callable
+):
+    written_frames = 0
+    for segment_file, (first, last) in zip(segment_files, ranges):
+        if os.path.getsize(segment_file) == 0:
+            raise FrameError(f"Empty segment {segment_file}")
+        with open(segment_file, "rb") as segment:
+            data = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for index, (start, end, _) in enumerate(iterate(data)):
+                if index < first:
+                    continue
+                if last is not None and index >= last:
+                    break
+                output.write(data[start:end])
+                written_frames += 1
+        finally:
+            data.close()
+    return written_frames
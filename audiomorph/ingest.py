@@ -0,0 +1,95 @@
+import os
+from collections import deque
+
+from audiomorph import engine
+from audiomorph.config import AUDIO_FORMATS
+
+#----------------------------------------------------------------------#------#
+
+def is_audio_file(name: str, extensions: tuple = AUDIO_FORMATS):
+    return os.path.splitext(name)[1][1:].lower() in extensions
+
+
+def walk_directory(
+    directory: str, extensions: tuple = AUDIO_FORMATS, skip: str = None
+):
+    # Files come out while the tree is still being read, in the order the
+    # file system lists them; only directories still to visit are held.
+    # Hidden entries, symbolic links to directories and skip are skipped
+    if skip is not None:
+        skip = os.path.abspath(skip)
+    pending = [directory]
+    while len(pending) > 0:
+        subdirectories = []
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if os.path.abspath(entry.path) != skip:
+                                subdirectories.append(entry.path)
+                        elif entry.is_file() and is_audio_file(
+                            entry.name, extensions
+                        ):
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        pending.extend(reversed(subdirectories))
+
+
+def expand_sources(
+    sources: list, extensions: tuple = AUDIO_FORMATS, skip: str = None
+):
+    # Yields each input file with the directory its output goes to,
+    # relative to the output directory: files found in a folder keep their
+    # place under that folder's name, files given directly keep none
+    for source in sources:
+        if not os.path.isdir(source):
+            yield source, ""
+            continue
+        root = os.path.dirname(os.path.abspath(source))
+        directory = relative_directory = None
+        for path in walk_directory(source, extensions, skip):
+            # Files of one directory come out together
+            if os.path.dirname(path) != directory:
+                directory = os.path.dirname(path)
+                relative_directory = os.path.relpath(directory, root)
+            yield path, relative_directory
+
+
+def conversion_jobs(
+    sources: list, output_directory: str, output_formats: list,
+    extensions: tuple = AUDIO_FORMATS
+):
+    created_directory = None
+    # An output directory inside a source would have its outputs converted
+    # again on the next run, one level deeper each time
+    for input_file, relative_directory in expand_sources(
+        sources, extensions, output_directory
+    ):
+        directory = output_directory
+        if relative_directory != "":
+            directory = os.path.join(output_directory, relative_directory)
+        if directory != created_directory:
+            os.makedirs(directory, exist_ok=True)
+            created_directory = directory
+        yield input_file, [
+            engine.output_path(input_file, directory, output_format)
+            for output_format in output_formats
+        ]
+
+
+def bounded_map(pool, function: callable, items, limit: int):
+    # Like pool.map, in order, but only reads limit items ahead, so a
+    # generator over a whole library is never read in full
+    futures = deque()
+    for item in items:
+        futures.append(pool.submit(function, item))
+        if len(futures) >= limit:
+            yield futures.popleft().result()
+    while len(futures) > 0:
+        yield futures.popleft().result()
@@ -0,0 +1,388 @@
+import contextlib
+import contextvars
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+
+#----------------------------------------------------------------------#------#
+
+TRACE_PATH = os.environ.get("AUDIOMORPH_TRACE", "")
+PROFILE_DIRECTORY = os.environ.get("AUDIOMORPH_PROFILE", "")
+METRICS_PORT = int(os.environ.get("AUDIOMORPH_METRICS_PORT", "0") or 0)
+METRICS_HOST = "127.0.0.1"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+NO_JOB_KIND = "batch"
+JOB_COUNTERS = ("audio_seconds", "bytes_in", "bytes_out")
+
+current_job = contextvars.ContextVar("current_job", default=None)
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class JobTrace:
+    def __init__(
+        self, recorder, job_id: int, kind: str, name: str,
+        queue_wait: float, profile: bool
+    ):
+        self.recorder = recorder
+        self.id = job_id
+        self.kind = kind
+        self.name = name
+        self.queue_wait = queue_wait
+        self.counters = dict.fromkeys(JOB_COUNTERS, 0)
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.profile = cProfile.Profile() if profile else None
+        self.finished = False
+
+    @contextlib.contextmanager
+    def activate(self):
+        # Thread pools do not carry context over, so each thread the job
+        # moves to activates it again
+        token = current_job.set(self)
+        try:
+            yield self
+        finally:
+            current_job.reset(token)
+
+    def finish(self, status: str):
+        self.recorder.finish_job(self, status)
+
+
+class Span:
+    def __init__(self, recorder, stage: str, profile: bool, attributes: dict):
+        self.recorder = recorder
+        self.stage = stage
+        self.profile = profile
+        self.attributes = attributes
+        self.id = None
+        self.job = None
+        self.profiling = False
+
+    def __enter__(self):
+        self.id = next(self.recorder.span_ids)
+        self.job = current_job.get()
+        self.parent = current_span.get()
+        self.token = current_span.set(self.id)
+        if self.profile:
+            self.profiling = self.recorder.enable_profile(self.job)
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        duration = time.perf_counter() - self.start
+        if self.profiling:
+            self.recorder.disable_profile(self.job)
+        current_span.reset(self.token)
+        self.recorder.finish_span(self, duration, exception_type is not None)
+
+
+class Recorder:
+    def __init__(
+        self, trace_path: str = TRACE_PATH,
+        profile_directory: str = PROFILE_DIRECTORY, profile_jobs=None
+    ):
+        self.lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+        self.span_ids = itertools.count(1)
+        self.trace_file = None
+        if trace_path:
+            self.trace_file = open(trace_path, "a", encoding="utf-8")
+        self.profile_directory = profile_directory
+        # None profiles every job once a profile directory is set
+        self.profile_jobs = profile_jobs
+        self.profiling = None
+        self.stages = {}
+        self.totals = {}
+        self.jobs = {}
+        self.server = None
+
+    def write(self, record: dict):
+        if self.trace_file is None:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            self.trace_file.write(line)
+            self.trace_file.flush()
+
+    def span(self, stage: str, profile: bool = True, **attributes):
+        return Span(self, stage, profile, attributes)
+
+    def finish_span(self, span: Span, duration: float, error: bool):
+        kind = span.job.kind if span.job is not None else NO_JOB_KIND
+        with self.lock:
+            totals = self.stages.setdefault((kind, span.stage), [0, 0.0])
+            totals[0] += 1
+            totals[1] += duration
+        self.write({
+            "type": "span", "id": span.id, "parent": span.parent,
+            "job": span.job.id if span.job is not None else None,
+            "kind": kind, "stage": span.stage, "start": span.start_time,
+            "duration": duration, "thread": threading.current_thread().name,
+            "error": error, **span.attributes
+        })
+
+    def start_job(self, kind: str, name: str = "", queue_wait: float = 0.0):
+        job_id = next(self.job_ids)
+        profile = self.profile_directory != "" and (
+            self.profile_jobs is None or job_id in self.profile_jobs
+        )
+        return JobTrace(self, job_id, kind, name, queue_wait, profile)
+
+    @contextlib.contextmanager
+    def job(self, kind: str, name: str = ""):
+        # Nested calls, such as a conversion run by a scheduler job, add to
+        # the job that is already running
+        trace = current_job.get()
+        if trace is not None:
+            self.describe(kind, name)
+            yield trace
+            return
+        trace = self.start_job(kind, name)
+        status = "failed"
+        try:
+            with trace.activate():
+                yield trace
+            status = "ok"
+        finally:
+            trace.finish(status)
+
+    def describe(self, kind: str, name: str = ""):
+        trace = current_job.get()
+        if trace is not None:
+            trace.kind = kind
+            trace.name = name or trace.name
+
+    def add(self, counter: str, value: float):
+        trace = current_job.get()
+        if trace is not None:
+            with self.lock:
+                trace.counters[counter] += value
+
+    def note(self, counter: str, value: float):
+        # For counters that describe the job's input, which several passes
+        # over the same file would otherwise count again
+        trace = current_job.get()
+        if trace is not None:
+            with self.lock:
+                trace.counters[counter] = value
+
+    def finish_job(self, trace: JobTrace, status: str):
+        with self.lock:
+            if trace.finished:
+                return
+            trace.finished = True
+        duration = time.perf_counter() - trace.start
+        audio_seconds = trace.counters["audio_seconds"]
+        profile_file = None
+        if trace.profile is not None:
+            os.makedirs(self.profile_directory, exist_ok=True)
+            profile_file = os.path.join(
+                self.profile_directory, f"job-{trace.id}-{trace.kind}.prof"
+            )
+            trace.profile.dump_stats(profile_file)
+        with self.lock:
+            totals = self.totals.setdefault(
+                trace.kind, dict.fromkeys(
+                    ("seconds", "queue_wait", *JOB_COUNTERS), 0.0
+                )
+            )
+            totals["seconds"] += duration
+            totals["queue_wait"] += trace.queue_wait
+            for counter, value in trace.counters.items():
+                totals[counter] += value
+            key = (trace.kind, status)
+            self.jobs[key] = self.jobs.get(key, 0) + 1
+        self.write({
+            "type": "job", "job": trace.id, "kind": trace.kind,
+            "name": trace.name, "status": status, "start": trace.start_time,
+            "duration": duration, "queue_wait": trace.queue_wait,
+            **trace.counters,
+            "realtime_factor": (
+                audio_seconds / duration if duration > 0 else None
+            ),
+            "profile": profile_file
+        })
+
+    def enable_profile(self, trace: JobTrace):
+        # One profiler runs at a time, and Python 3.12's profiles every
+        # thread, so overlapping jobs are only profiled while alone
+        if trace is None or trace.profile is None:
+            return False
+        thread = threading.get_ident()
+        with self.lock:
+            if self.profiling is None:
+                try:
+                    trace.profile.enable()
+                except ValueError:
+                    return False
+                self.profiling = [trace, thread, 1]
+                return True
+            if self.profiling[0] is trace and self.profiling[1] == thread:
+                self.profiling[2] += 1
+                return True
+        return False
+
+    def disable_profile(self, trace: JobTrace):
+        with self.lock:
+            self.profiling[2] -= 1
+            if self.profiling[2] == 0:
+                trace.profile.disable()
+                self.profiling = None
+
+    def prometheus(self):
+        with self.lock:
+            stages = dict(self.stages)
+            totals = {kind: dict(value) for kind, value in self.totals.items()}
+            jobs = dict(self.jobs)
+        lines = [
+            "# HELP audiomorph_stage_seconds Time spent in each stage.",
+            "# TYPE audiomorph_stage_seconds summary",
+        ]
+        for (kind, stage), (count, seconds) in sorted(stages.items()):
+            labels = f'kind="{kind}",stage="{stage}"'
+            lines.append(f"audiomorph_stage_seconds_sum{{{labels}}} {seconds}")
+            lines.append(f"audiomorph_stage_seconds_count{{{labels}}} {count}")
+        lines += [
+            "# HELP audiomorph_jobs_total Finished jobs by status.",
+            "# TYPE audiomorph_jobs_total counter",
+        ]
+        for (kind, status), count in sorted(jobs.items()):
+            lines.append(
+                f'audiomorph_jobs_total{{kind="{kind}",status="{status}"}} '
+                + str(count)
+            )
+        for name, help_text in (
+            ("seconds", "Time from the start to the end of jobs."),
+            ("queue_wait", "Time jobs waited for a free worker."),
+            ("audio_seconds", "Duration of the audio jobs processed."),
+            ("bytes_in", "Bytes read or downloaded by jobs."),
+            ("bytes_out", "Bytes written by jobs."),
+        ):
+            metric = f"audiomorph_job_{name}_total"
+            lines += [
+                f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"
+            ]
+            for kind, values in sorted(totals.items()):
+                lines.append(f'{metric}{{kind="{kind}"}} {values[name]}')
+        lines += [
+            "# HELP audiomorph_realtime_factor Audio seconds per second of "
+            + "job time.",
+            "# TYPE audiomorph_realtime_factor gauge",
+        ]
+        for kind, values in sorted(totals.items()):
+            if values["seconds"] > 0:
+                lines.append(
+                    f'audiomorph_realtime_factor{{kind="{kind}"}} '
+                    + str(values["audio_seconds"] / values["seconds"])
+                )
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = METRICS_HOST):
+        # Only an endpoint that is switched on loads the HTTP server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        recorder = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.trace_file is not None:
+            with self.lock:
+                self.trace_file.close()
+                self.trace_file = None
+
+
+default_recorder = None
+default_recorder_lock = threading.Lock()
+
+
+def get_default_recorder():
+    global default_recorder
+    with default_recorder_lock:
+        if default_recorder is None:
+            default_recorder = Recorder()
+            if METRICS_PORT > 0:
+                default_recorder.serve(METRICS_PORT)
+        return default_recorder
+
+
+def configure(
+    trace_path: str = TRACE_PATH, profile_directory: str = PROFILE_DIRECTORY,
+    profile_jobs=None, port: int = METRICS_PORT
+):
+    global default_recorder
+    with default_recorder_lock:
+        if default_recorder is not None:
+            default_recorder.close()
+        default_recorder = Recorder(
+            trace_path, profile_directory, profile_jobs
+        )
+        if port > 0:
+            default_recorder.serve(port)
+        return default_recorder
+
+
+def span(stage: str, profile: bool = True, **attributes):
+    return get_default_recorder().span(stage, profile, **attributes)
+
+
+def job(kind: str, name: str = ""):
+    return get_default_recorder().job(kind, name)
+
+
+def describe(kind: str, name: str = ""):
+    get_default_recorder().describe(kind, name)
+
+
+def add(counter: str, value: float):
+    get_default_recorder().add(counter, value)
+
+
+def note(counter: str, value: float):
+    get_default_recorder().note(counter, value)
+
+
+def carry(function: callable):
+    # Thread pools do not copy context variables, so work handed to one
+    # would lose the job it belongs to
+    trace = current_job.get()
+
+    def run(*arguments, **keywords):
+        if trace is None:
+            return function(*arguments, **keywords)
+        with trace.activate():
+            return function(*arguments, **keywords)
+    return run
+
+
+def file_size(path: str):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
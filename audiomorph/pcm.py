@@ -0,0 +1,405 @@
+import struct
+from dataclasses import dataclass, replace
+
+#----------------------------------------------------------------------#------#
+
+CHUNK_FRAMES = 64 * 1024
+MAX_DATA_SIZE = 0xFFFFFFFF - 1024
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_FLOAT = 3
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+# KSDATAFORMAT_SUBTYPE GUIDs after their leading format tag
+WAV_GUID_TAIL = b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+# Chunks without tags, which FFmpeg would otherwise carry over
+WAV_PLAIN_CHUNKS = (b"fmt ", b"data", b"fact", b"PEAK")
+# FFmpeg writes its own encoder tag into every WAV file
+WAV_IGNORED_INFO = (b"ISFT",)
+AIFF_PLAIN_CHUNKS = (b"COMM", b"SSND", b"FVER")
+
+WAV_CODECS = {
+    (WAV_FORMAT_PCM, 8): "pcm_u8",
+    (WAV_FORMAT_PCM, 16): "pcm_s16le",
+    (WAV_FORMAT_PCM, 24): "pcm_s24le",
+    (WAV_FORMAT_PCM, 32): "pcm_s32le",
+    (WAV_FORMAT_FLOAT, 32): "pcm_f32le",
+    (WAV_FORMAT_FLOAT, 64): "pcm_f64le",
+}
+AIFF_CODECS = {
+    (b"NONE", 8): "pcm_s8",
+    (b"NONE", 16): "pcm_s16be",
+    (b"NONE", 24): "pcm_s24be",
+    (b"NONE", 32): "pcm_s32be",
+    (b"twos", 8): "pcm_s8",
+    (b"twos", 16): "pcm_s16be",
+    (b"sowt", 16): "pcm_s16le",
+    (b"fl32", 32): "pcm_f32be",
+    (b"FL32", 32): "pcm_f32be",
+    (b"fl64", 64): "pcm_f64be",
+    (b"FL64", 64): "pcm_f64be",
+}
+WRITABLE_CODECS = {
+    "wav": (
+        "pcm_u8", "pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le",
+        "pcm_f64le"
+    ),
+    "aiff": ("pcm_s8", "pcm_s16be", "pcm_s24be", "pcm_s32be"),
+}
+# What FFmpeg encodes to when the source codec cannot be copied
+DEFAULT_CODECS = {"wav": "pcm_s16le", "aiff": "pcm_s16be"}
+DEFAULT_CHANNEL_MASKS = {1: 0x4, 2: 0x3}
+# Source codecs FFmpeg mixes as 16-bit integers; the others are mixed as
+# floats of their own precision
+INT16_MIX_CODECS = ("pcm_u8", "pcm_s8", "pcm_s16le", "pcm_s16be")
+
+SAMPLE_TYPES = {
+    "pcm_u8": "u1",
+    "pcm_s8": "i1",
+    "pcm_s16le": "<i2",
+    "pcm_s16be": ">i2",
+    "pcm_s32le": "<i4",
+    "pcm_s32be": ">i4",
+    "pcm_f32le": "<f4",
+    "pcm_f32be": ">f4",
+    "pcm_f64le": "<f8",
+    "pcm_f64be": ">f8",
+}
+
+
+class PcmError(Exception):
+    pass
+
+
+@dataclass
+class PcmInfo:
+    container: str
+    codec: str
+    sample_rate: int
+    channels: int
+    frames: int
+    data_offset: int
+    channel_mask: int = 0
+
+
+def available():
+    try:
+        import numpy
+    except ImportError:
+        return False
+    return True
+
+
+def sample_bytes(codec: str):
+    return int(codec[5:7]) // 8
+
+
+def rounded_bits(bits: int):
+    # 12 or 20 bit samples are stored left-justified in whole bytes
+    return (bits + 7) // 8 * 8
+
+
+def unpack_extended(data: bytes):
+    exponent, mantissa = struct.unpack(">HQ", data)
+    exponent &= 0x7FFF
+    if mantissa == 0:
+        return 0
+    return round(mantissa * 2.0 ** (exponent - 16383 - 63))
+
+
+def pack_extended(value: int):
+    exponent = value.bit_length() - 1
+    return struct.pack(">HQ", 16383 + exponent, value << (63 - exponent))
+
+#----------------------------------------------------------------------#------#
+
+def chunks(input_file, start: int, end: int, byte_order: str):
+    offset = start
+    while offset + 8 <= end:
+        input_file.seek(offset)
+        chunk_id, chunk_size = struct.unpack(
+            byte_order + "4sI", input_file.read(8)
+        )
+        yield chunk_id, offset + 8, chunk_size
+        offset += 8 + chunk_size + chunk_size % 2
+
+
+def check_wav_info(input_file, offset: int, size: int):
+    input_file.seek(offset)
+    data = input_file.read(size)
+    if data[:4] != b"INFO":
+        raise PcmError("Unsupported LIST chunk")
+    position = 4
+    while position + 8 <= len(data):
+        key, length = struct.unpack("<4sI", data[position:position + 8])
+        if key not in WAV_IGNORED_INFO:
+            raise PcmError("Tagged file")
+        position += 8 + length + length % 2
+
+
+def read_wav_info(input_file, file_size: int):
+    fmt = None
+    data_offset = data_size = None
+    for chunk_id, offset, size in chunks(input_file, 12, file_size, "<"):
+        if chunk_id == b"fmt ":
+            input_file.seek(offset)
+            fmt = input_file.read(size)
+        elif chunk_id == b"data":
+            data_offset, data_size = offset, size
+            if offset + size > file_size:
+                # Unfinished or streamed files
+                data_size = file_size - offset
+                break
+        elif chunk_id == b"LIST":
+            check_wav_info(input_file, offset, size)
+        elif chunk_id not in WAV_PLAIN_CHUNKS:
+            raise PcmError(f"Unsupported {chunk_id!r} chunk")
+    if fmt is None or data_offset is None or len(fmt) < 16:
+        raise PcmError("Incomplete WAV file")
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack(
+        "<HHIIHH", fmt[:16]
+    )
+    channel_mask = 0
+    if format_tag == WAV_FORMAT_EXTENSIBLE:
+        if len(fmt) < 40 or fmt[26:40] != WAV_GUID_TAIL:
+            raise PcmError("Unsupported WAV subformat")
+        channel_mask, format_tag = struct.unpack("<IH", fmt[20:26])
+    codec = WAV_CODECS.get((format_tag, rounded_bits(bits)))
+    if codec is None or channels == 0:
+        raise PcmError("Unsupported WAV sample format")
+    if block_align != channels * sample_bytes(codec):
+        raise PcmError("Unsupported WAV block alignment")
+    return PcmInfo(
+        "wav", codec, sample_rate, channels, data_size // block_align,
+        data_offset, channel_mask
+    )
+
+
+def read_aiff_info(input_file, file_size: int, form_type: bytes):
+    comm = None
+    data_offset = data_size = None
+    for chunk_id, offset, size in chunks(input_file, 12, file_size, ">"):
+        if chunk_id == b"COMM":
+            input_file.seek(offset)
+            comm = input_file.read(size)
+        elif chunk_id == b"SSND":
+            input_file.seek(offset)
+            ssnd_offset = struct.unpack(">I", input_file.read(4))[0]
+            data_offset = offset + 8 + ssnd_offset
+            data_size = min(size, file_size - offset) - 8 - ssnd_offset
+        elif chunk_id not in AIFF_PLAIN_CHUNKS:
+            raise PcmError(f"Unsupported {chunk_id!r} chunk")
+    if comm is None or data_offset is None or len(comm) < 18:
+        raise PcmError("Incomplete AIFF file")
+    channels, frames, bits = struct.unpack(">hIh", comm[:8])
+    sample_rate = unpack_extended(comm[8:18])
+    compression = comm[18:22] if form_type == b"AIFC" else b"NONE"
+    codec = AIFF_CODECS.get((compression, rounded_bits(bits)))
+    if codec is None or channels <= 0:
+        raise PcmError("Unsupported AIFF sample format")
+    block_align = channels * sample_bytes(codec)
+    return PcmInfo(
+        "aiff", codec, sample_rate, channels,
+        min(frames, max(data_size, 0) // block_align), data_offset
+    )
+
+
+def read_info(path: str):
+    with open(path, "rb") as input_file:
+        file_size = input_file.seek(0, 2)
+        input_file.seek(0)
+        header = input_file.read(12)
+        if header[:4] == b"RIFF" and header[8:] == b"WAVE":
+            return read_wav_info(input_file, file_size)
+        if header[:4] == b"FORM" and header[8:] in (b"AIFF", b"AIFC"):
+            return read_aiff_info(input_file, file_size, header[8:])
+    raise PcmError(f"{path} is not a WAV or AIFF file")
+
+#----------------------------------------------------------------------#------#
+
+def wav_header(codec: str, info: PcmInfo, data_size: int):
+    bits = sample_bytes(codec) * 8
+    block_align = info.channels * bits // 8
+    format_tag = WAV_FORMAT_FLOAT if "_f" in codec else WAV_FORMAT_PCM
+    fields = (
+        info.channels, info.sample_rate, info.sample_rate * block_align,
+        block_align, bits
+    )
+    # Same choice of WAVEFORMATEXTENSIBLE as FFmpeg's WAV muxer
+    if info.channels > 2 or info.sample_rate > 48000 or bits > 16:
+        channel_mask = info.channel_mask or DEFAULT_CHANNEL_MASKS.get(
+            info.channels, 0
+        )
+        fmt = struct.pack(
+            "<HHIIHHHHIH", WAV_FORMAT_EXTENSIBLE, *fields, 22, bits,
+            channel_mask, format_tag
+        ) + WAV_GUID_TAIL
+    else:
+        fmt = struct.pack("<HHIIHH", format_tag, *fields)
+    header = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if format_tag == WAV_FORMAT_FLOAT:
+        header += b"fact" + struct.pack("<2I", 4, info.frames)
+    riff_size = 4 + len(header) + 8 + data_size + data_size % 2
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE" + header + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+def aiff_header(codec: str, info: PcmInfo, data_size: int):
+    comm = struct.pack(
+        ">hIh", info.channels, info.frames, sample_bytes(codec) * 8
+    ) + pack_extended(info.sample_rate)
+    form_size = 4 + 8 + len(comm) + 16 + data_size + data_size % 2
+    return (
+        b"FORM" + struct.pack(">I", form_size) + b"AIFF" + b"COMM"
+        + struct.pack(">I", len(comm)) + comm + b"SSND"
+        + struct.pack(">3I", 8 + data_size, 0, 0)
+    )
+
+
+def can_write(container: str, codec: str, info: PcmInfo):
+    data_size = info.frames * info.channels * sample_bytes(codec)
+    return codec in WRITABLE_CODECS.get(container, ()) and (
+        data_size <= MAX_DATA_SIZE
+    )
+
+
+def int24_samples(raw, codec: str):
+    import numpy
+
+    # Widened to 32 bits in place of the missing low byte, then shifted
+    triples = raw.reshape(-1, 3)
+    padded = numpy.zeros((len(triples), 4), numpy.uint8)
+    if codec == "pcm_s24le":
+        padded[:, 1:] = triples
+        return padded.view("<i4").reshape(-1) >> 8
+    padded[:, :3] = triples
+    return padded.view(">i4").reshape(-1) >> 8
+
+
+def to_int16(raw, codec: str, generator=None):
+    import numpy
+
+    # Without dither this matches FFmpeg's sample format conversion exactly
+    if codec in ("pcm_s24le", "pcm_s24be") and generator is None:
+        # The top two bytes of each sample are the value shifted by 8
+        triples = raw.reshape(-1, 3)
+        if codec == "pcm_s24le":
+            return numpy.ascontiguousarray(triples[:, 1:]).view("<i2")
+        return numpy.ascontiguousarray(triples[:, :2]).view(">i2")
+    if codec in ("pcm_s24le", "pcm_s24be"):
+        samples = int24_samples(raw, codec)
+        scaled = samples / 256.0
+    else:
+        samples = raw.reshape(-1).view(SAMPLE_TYPES[codec])
+        if codec == "pcm_u8":
+            return (samples.astype(numpy.int16) - 128) << 8
+        if codec == "pcm_s8":
+            return samples.astype(numpy.int16) << 8
+        if codec in ("pcm_s16le", "pcm_s16be"):
+            return samples
+        if codec in ("pcm_s32le", "pcm_s32be"):
+            if generator is None:
+                return (samples >> 16).astype(numpy.int16)
+            scaled = samples / 65536.0
+        else:
+            scaled = samples * samples.dtype.type(32768)
+    if generator is not None:
+        # Triangular (TPDF) dither of one least significant bit
+        scaled = scaled + (
+            generator.random(len(scaled)) - generator.random(len(scaled))
+        )
+    return numpy.clip(numpy.rint(scaled), -32768, 32767).astype(numpy.int16)
+
+
+def can_downmix(info: PcmInfo, channels: int):
+    # Only stereo to mono, whose matrix is a plain average in FFmpeg
+    return info.channels == 2 and channels == 1
+
+
+def downmix_int16(raw, codec: str, generator=None):
+    import numpy
+
+    # Bit-exact with FFmpeg's -ac 1 without dither
+    if codec in INT16_MIX_CODECS:
+        pairs = to_int16(raw, codec).astype(numpy.int32).reshape(-1, 2)
+        return ((pairs[:, 0] + pairs[:, 1] + 1) >> 1).astype(numpy.int16)
+    if codec in ("pcm_s24le", "pcm_s24be"):
+        samples = int24_samples(raw, codec).astype(numpy.float32)
+        scale = numpy.float32(2.0 ** -23)
+    elif codec in ("pcm_s32le", "pcm_s32be"):
+        samples = raw.reshape(-1).view(SAMPLE_TYPES[codec]).astype(
+            numpy.float32
+        )
+        scale = numpy.float32(2.0 ** -31)
+    else:
+        samples = raw.reshape(-1).view(SAMPLE_TYPES[codec])
+        scale = samples.dtype.type(1)
+    pairs = (samples * scale).reshape(-1, 2)
+    half = pairs.dtype.type(0.5)
+    scaled = (pairs[:, 0] * half + pairs[:, 1] * half) * pairs.dtype.type(
+        32768
+    )
+    if generator is not None:
+        scaled = scaled + (
+            generator.random(len(scaled)) - generator.random(len(scaled))
+        )
+    return numpy.clip(numpy.rint(scaled), -32768, 32767).astype(numpy.int16)
+
+
+def convert(
+    info: PcmInfo, input_file: str, output_file: str, container: str,
+    codec: str, progress: callable = None, dither: bool = False,
+    channels: int = None
+):
+    import numpy
+
+    # The channel mask of the source no longer applies to a downmix
+    downmix = channels is not None and channels != info.channels
+    output_info = replace(
+        info, channels=channels, channel_mask=0
+    ) if downmix else info
+    input_width = info.channels * sample_bytes(info.codec)
+    output_width = output_info.channels * sample_bytes(codec)
+    data_size = info.frames * output_width
+    if container == "wav":
+        header = wav_header(codec, output_info, data_size)
+    else:
+        header = aiff_header(codec, output_info, data_size)
+    with open(output_file, "wb") as output:
+        output.write(header)
+        output.truncate(len(header) + data_size + data_size % 2)
+    if info.frames == 0:
+        return
+    output_type = SAMPLE_TYPES.get(codec)
+    generator = None
+    if dither and sample_bytes(info.codec) > 2:
+        generator = numpy.random.default_rng()
+    source = numpy.memmap(
+        input_file, numpy.uint8, "r", info.data_offset,
+        (info.frames, input_width)
+    )
+    target = numpy.memmap(
+        output_file, numpy.uint8, "r+", len(header),
+        (info.frames, output_width)
+    )
+    last_percent = -1
+    for start in range(0, info.frames, CHUNK_FRAMES):
+        end = min(start + CHUNK_FRAMES, info.frames)
+        if codec == info.codec and not downmix:
+            target[start:end] = source[start:end]
+        else:
+            if downmix:
+                samples = downmix_int16(
+                    source[start:end], info.codec, generator
+                )
+            else:
+                samples = to_int16(source[start:end], info.codec, generator)
+            target[start:end] = samples.astype(
+                output_type, copy=False
+            ).view(numpy.uint8).reshape(end - start, output_width)
+        percent = int(end * 100 / info.frames)
+        if progress is not None and percent != last_percent:
+            last_percent = percent
+            progress(percent)
+    target.flush()
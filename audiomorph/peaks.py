@@ -0,0 +1,568 @@
+import hashlib
+import os
+import struct
+import subprocess
+import threading
+
+from audiomorph import engine, metrics, pcm, pipes, probe
+from audiomorph.config import CACHE_DIRECTORY, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+PEAK_CACHE_DIRECTORY = os.path.join(CACHE_DIRECTORY, "peaks")
+DEFAULT_MAX_BYTES = int(
+    os.environ.get("AUDIOMORPH_PEAK_CACHE_MB", "256")
+) * 1024 * 1024
+TAP_CONVERSIONS = os.environ.get("AUDIOMORPH_PEAKS", "") != ""
+PEAKS_EXTENSION = ".peaks"
+PEAKS_MAGIC = b"AMPEAKS1"
+# Magic, sample rate, channels, frames per block, levels, frames
+PEAKS_HEADER = struct.Struct("<8sIIIIQ")
+# Frames each row of the finest level covers; every level above halves
+# the one below it, up to a single row for the whole file
+BLOCK_FRAMES = 512
+# Rows of a level reduced at a time, so memory stays flat for any length
+REDUCE_ROWS = 1024 * 1024
+MINIMUM, MAXIMUM, RMS = range(3)
+PCM_ARGUMENTS = ["-map", "0:a:0", "-c:a", "pcm_f32le", "-f", "f32le"]
+
+
+class PeakError(Exception):
+    pass
+
+
+def available():
+    return pcm.available()
+
+
+def summarize(samples):
+    import numpy
+
+    rows = numpy.empty((len(samples), 3), numpy.float32)
+    rows[:, MINIMUM] = samples.min(axis=1)
+    rows[:, MAXIMUM] = samples.max(axis=1)
+    rows[:, RMS] = numpy.sqrt(
+        numpy.einsum("ij,ij->i", samples, samples) / samples.shape[1]
+    )
+    return rows
+
+
+def reduce_rows(rows):
+    import numpy
+
+    if len(rows) % 2 == 1:
+        rows = numpy.concatenate([rows, rows[-1:]])
+    pairs = rows.reshape(-1, 2, 3)
+    reduced = numpy.empty((len(pairs), 3), numpy.float32)
+    reduced[:, MINIMUM] = pairs[:, :, MINIMUM].min(axis=1)
+    reduced[:, MAXIMUM] = pairs[:, :, MAXIMUM].max(axis=1)
+    reduced[:, RMS] = numpy.sqrt(
+        (pairs[:, :, RMS].astype(numpy.float64) ** 2).mean(axis=1)
+    )
+    return reduced
+
+
+def pcm_samples(raw, codec: str):
+    import numpy
+
+    if codec in ("pcm_s24le", "pcm_s24be"):
+        return (
+            pcm.int24_samples(raw, codec) / numpy.float32(1 << 23)
+        ).astype(numpy.float32)
+    samples = raw.reshape(-1).view(pcm.SAMPLE_TYPES[codec])
+    if codec == "pcm_u8":
+        return (samples.astype(numpy.float32) - 128) / numpy.float32(128)
+    if "_f" in codec:
+        return samples.astype(numpy.float32)
+    return samples.astype(numpy.float32) / numpy.float32(
+        1 << (samples.dtype.itemsize * 8 - 1)
+    )
+
+
+class PeakBuilder:
+    # Reduces interleaved float samples to rows of minimum, maximum and RMS
+    # as they arrive; only one unfinished block is ever held
+    def __init__(
+        self, output_file: str, sample_rate: int, channels: int,
+        complete: callable = None, block_frames: int = BLOCK_FRAMES
+    ):
+        import numpy
+
+        if channels <= 0:
+            raise PeakError(f"Cannot summarize {channels} channels")
+        self.output_file = output_file
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.complete = complete
+        self.block_frames = block_frames
+        self.frames = 0
+        self.rows = 0
+        self.partial = b""
+        self.pending = numpy.empty(0, numpy.float32)
+        self.temporary_file = engine.temporary_path(output_file)
+        self.file = open(self.temporary_file, "w+b")
+        self.file.write(bytes(PEAKS_HEADER.size))
+
+    def feed(self, data: bytes):
+        import numpy
+
+        # Pipe reads can end in the middle of a sample
+        data = self.partial + data
+        usable = len(data) - len(data) % (self.channels * 4)
+        self.partial = data[usable:]
+        if usable > 0:
+            self.add(numpy.frombuffer(data, "<f4", usable // 4))
+
+    def add(self, samples):
+        import numpy
+
+        self.frames += len(samples) // self.channels
+        if len(self.pending) > 0:
+            samples = numpy.concatenate([self.pending, samples])
+        block_size = self.block_frames * self.channels
+        whole = len(samples) - len(samples) % block_size
+        if whole > 0:
+            self.write_rows(summarize(samples[:whole].reshape(-1, block_size)))
+        self.pending = numpy.array(samples[whole:], numpy.float32)
+
+    def write_rows(self, rows):
+        self.file.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def finish(self):
+        import numpy
+
+        try:
+            if len(self.pending) > 0:
+                self.write_rows(summarize(self.pending.reshape(1, -1)))
+            if self.rows == 0:
+                raise PeakError(f"No audio to summarize in {self.output_file}")
+            self.file.flush()
+            offset = PEAKS_HEADER.size
+            count = self.rows
+            levels = 1
+            while count > 1:
+                level = numpy.memmap(
+                    self.temporary_file, numpy.float32, "r", offset,
+                    (count, 3)
+                )
+                for start in range(0, count, REDUCE_ROWS):
+                    self.write_rows(
+                        reduce_rows(level[start:start + REDUCE_ROWS])
+                    )
+                del level
+                offset += count * 12
+                count = (count + 1) // 2
+                levels += 1
+                self.file.flush()
+            self.file.seek(0)
+            self.file.write(PEAKS_HEADER.pack(
+                PEAKS_MAGIC, self.sample_rate, self.channels,
+                self.block_frames, levels, self.frames
+            ))
+            self.file.close()
+            os.replace(self.temporary_file, self.output_file)
+        except BaseException:
+            self.abort()
+            raise
+        if self.complete is not None:
+            self.complete(True)
+
+    def abort(self):
+        if self.file.closed and not os.path.exists(self.temporary_file):
+            return
+        self.file.close()
+        try:
+            os.remove(self.temporary_file)
+        except OSError:
+            pass
+        if self.complete is not None:
+            self.complete(False)
+
+
+class PeakPyramid:
+    def __init__(self, path: str):
+        import numpy
+
+        try:
+            with open(path, "rb") as peaks_file:
+                header = PEAKS_HEADER.unpack(
+                    peaks_file.read(PEAKS_HEADER.size)
+                )
+        except struct.error:
+            raise PeakError(f"{path} is not a peak file")
+        magic, sample_rate, channels, block_frames, levels, frames = header
+        if magic != PEAKS_MAGIC or block_frames == 0 or levels == 0:
+            raise PeakError(f"{path} is not a peak file")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.frames = frames
+        data = numpy.memmap(path, numpy.float32, "r", PEAKS_HEADER.size)
+        self.levels = []
+        offset = 0
+        count = -(-frames // block_frames)
+        for _ in range(levels):
+            self.levels.append(data[offset:offset + count * 3].reshape(-1, 3))
+            offset += count * 3
+            count = (count + 1) // 2
+        if offset != len(data) or len(self.levels[-1]) != 1:
+            raise PeakError(f"{path} is incomplete")
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def summary(self):
+        # Lowest and highest sample and RMS level of the whole file
+        minimum, maximum, rms = self.levels[-1][0]
+        return float(minimum), float(maximum), float(rms)
+
+    def level_for(self, frames_per_column: float):
+        # The coarsest level that still has a row for every column
+        level = 0
+        while (
+            level + 1 < len(self.levels)
+            and self.block_frames << (level + 1) <= frames_per_column
+        ):
+            level += 1
+        return level
+
+    def view(self, start: float, end: float, width: int):
+        # Minimum, maximum and RMS of each of width columns from start to
+        # end seconds. Each column covers one or two rows of its level,
+        # so the cost only depends on the width, not on the file's length.
+        # Columns outside the file are NaN.
+        import numpy
+
+        width = max(int(width), 1)
+        start_frame = start * self.sample_rate
+        end_frame = max(end * self.sample_rate, start_frame + 1)
+        level = self.level_for((end_frame - start_frame) / width)
+        rows = self.levels[level]
+        block = self.block_frames << level
+        positions = numpy.linspace(start_frame, end_frame, width + 1)
+        first = numpy.clip(
+            numpy.floor(positions[:-1] / block).astype(numpy.int64), 0,
+            len(rows) - 1
+        )
+        # The row holding a column's last frame, which the next column
+        # starts in as well
+        last = numpy.clip(
+            numpy.ceil(positions[1:] / block).astype(numpy.int64) - 1, first,
+            len(rows) - 1
+        )
+        # reduceat runs from each index to the next one, or takes a single
+        # row when the next index is not larger
+        window = numpy.array(rows[first[0]:last[-1] + 1])
+        indices = first - first[0]
+        counts = numpy.maximum(numpy.diff(indices, append=len(window)), 1)
+        minimums = numpy.minimum(
+            numpy.minimum.reduceat(window[:, MINIMUM], indices),
+            window[last - first[0], MINIMUM]
+        )
+        maximums = numpy.maximum(
+            numpy.maximum.reduceat(window[:, MAXIMUM], indices),
+            window[last - first[0], MAXIMUM]
+        )
+        rms = numpy.sqrt(numpy.add.reduceat(
+            window[:, RMS].astype(numpy.float64) ** 2, indices
+        ) / counts).astype(numpy.float32)
+        outside = (positions[1:] <= 0) | (positions[:-1] >= self.frames)
+        for values in (minimums, maximums, rms):
+            values[outside] = numpy.nan
+        return minimums, maximums, rms
+
+
+class PeakTap:
+    # Reads the extra PCM output a conversion's FFmpeg writes to a pipe,
+    # so a file being converted anyway is not decoded a second time
+    def __init__(self, builder: PeakBuilder):
+        self.builder = builder
+        self.failed = False
+        self.read_descriptor, self.write_descriptor = os.pipe()
+        self.arguments = [*PCM_ARGUMENTS, f"pipe:{self.write_descriptor}"]
+        self.pass_fds = (self.write_descriptor,)
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def read(self):
+        with open(self.read_descriptor, "rb", buffering=0) as stream:
+            # Keeps reading after a failure, or FFmpeg would stall on the
+            # full pipe
+            while chunk := stream.read(pipes.READ_SIZE):
+                if self.failed:
+                    continue
+                try:
+                    self.builder.feed(chunk)
+                except (OSError, ValueError):
+                    self.failed = True
+
+    def finish(self, success: bool):
+        # FFmpeg has its own copy of the write end; the reader stops once
+        # both are closed
+        if self.write_descriptor >= 0:
+            os.close(self.write_descriptor)
+            self.write_descriptor = -1
+        self.reader.join()
+        if not success or self.failed:
+            self.builder.abort()
+            return
+        try:
+            with metrics.span("peaks"):
+                self.builder.finish()
+        except (OSError, ValueError, PeakError):
+            pass
+
+
+class PeakCache:
+    def __init__(
+        self, directory: str = PEAK_CACHE_DIRECTORY,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        tap_conversions: bool = TAP_CONVERSIONS
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Whether FFmpeg conversions also store the peaks of their inputs
+        self.tap_conversions = tap_conversions
+        self.lock = threading.Lock()
+        # Pyramids being built, with an event set once they are done
+        self.building = {}
+
+    def path(self, input_file: str, stat: os.stat_result = None):
+        # Keyed by file identity, so changed files get new peaks
+        input_file = os.path.abspath(input_file)
+        stat = stat or os.stat(input_file)
+        digest = hashlib.blake2b(
+            f"{input_file}\0{stat.st_size}\0{stat.st_mtime_ns}".encode(
+                "utf-8", "surrogateescape"
+            ), digest_size=16
+        )
+        return os.path.join(
+            self.directory, digest.hexdigest() + PEAKS_EXTENSION
+        )
+
+    def get(self, input_file: str):
+        path = self.path(input_file)
+        try:
+            pyramid = PeakPyramid(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, PeakError):
+            self.remove(path)
+            return None
+        try:
+            # Modification times order the least recently used for trim
+            os.utime(path)
+        except OSError:
+            pass
+        return pyramid
+
+    def claim(self, input_file: str, sample_rate: int, channels: int):
+        # A builder for the file's pyramid, or None when it exists or is
+        # being built already
+        try:
+            path = self.path(input_file)
+        except OSError:
+            return None
+        with self.lock:
+            if path in self.building or os.path.exists(path):
+                return None
+            self.building[path] = threading.Event()
+
+        def complete(built: bool):
+            with self.lock:
+                self.building.pop(path).set()
+            if built:
+                self.trim()
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return PeakBuilder(path, sample_rate, channels, complete)
+        except (OSError, PeakError):
+            complete(False)
+            return None
+
+    def wait(self, input_file: str, timeout: float = None):
+        with self.lock:
+            event = self.building.get(self.path(input_file))
+        if event is not None:
+            event.wait(timeout)
+
+    def tap(self, input_file: str, info: probe.ProbeInfo):
+        if not self.tap_conversions or os.name != "posix" or not available():
+            return None
+        builder = self.claim(input_file, info.sample_rate, info.channels)
+        if builder is None:
+            return None
+        try:
+            return PeakTap(builder)
+        except OSError:
+            builder.abort()
+            return None
+
+    def load(self, input_file: str, progress: callable = None):
+        # Waits for a pyramid that is already being built, such as by a
+        # running conversion, instead of decoding the file again
+        try:
+            while True:
+                pyramid = self.get(input_file)
+                if pyramid is not None:
+                    return pyramid
+                self.wait(input_file)
+                pyramid = self.get(input_file)
+                if pyramid is not None:
+                    return pyramid
+                info = probe.probe(input_file)
+                builder = self.claim(
+                    input_file, info.sample_rate, info.channels
+                )
+                if builder is not None:
+                    build(input_file, builder, info, progress)
+                    pyramid = self.get(input_file)
+                    if pyramid is None:
+                        raise PeakError(
+                            f"Could not store the peaks of {input_file}"
+                        )
+                    return pyramid
+        except (OSError, probe.ProbeError) as error:
+            raise PeakError(f"Could not read {input_file}: {error}")
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def trim(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                files = [
+                    (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                    for entry in entries
+                    if entry.name.endswith(PEAKS_EXTENSION)
+                ]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def clear(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(PEAKS_EXTENSION):
+                        self.remove(entry.path)
+        except OSError:
+            pass
+
+#----------------------------------------------------------------------#------#
+
+def build_native(input_file: str, builder: PeakBuilder, progress: callable):
+    # Plain WAV and AIFF samples are read straight from the file; False
+    # when FFmpeg has to decode it
+    import numpy
+
+    try:
+        info = pcm.read_info(input_file)
+    except (OSError, struct.error, pcm.PcmError):
+        return False
+    if info.channels != builder.channels or info.frames == 0:
+        return False
+    width = info.channels * pcm.sample_bytes(info.codec)
+    last_percent = -1
+    # Read in chunks rather than mapped, so the file's pages do not add up
+    # in memory
+    with open(input_file, "rb") as source:
+        source.seek(info.data_offset)
+        for start in range(0, info.frames, pcm.CHUNK_FRAMES):
+            end = min(start + pcm.CHUNK_FRAMES, info.frames)
+            raw = source.read((end - start) * width)
+            if len(raw) < (end - start) * width:
+                raise PeakError(f"{input_file} ended early")
+            builder.add(pcm_samples(
+                numpy.frombuffer(raw, numpy.uint8).reshape(-1, width),
+                info.codec
+            ))
+            percent = int(end * 100 / info.frames)
+            if progress is not None and percent != last_percent:
+                last_percent = percent
+                progress(percent)
+    return True
+
+
+def build_ffmpeg(
+    input_file: str, builder: PeakBuilder, info: probe.ProbeInfo,
+    progress: callable
+):
+    with metrics.span("spawn"):
+        process = subprocess.Popen([
+                FFMPEG_PATH, "-nostdin", "-v", "error", "-i", input_file,
+                *PCM_ARGUMENTS, "pipe:1"
+            ],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    log = pipes.LogBuffer()
+    reader = pipes.start_drain(process.stderr, log.write)
+    total_bytes = max(info.duration * info.sample_rate * info.channels * 4, 1)
+    read_bytes = 0
+    last_percent = -1
+    try:
+        while chunk := process.stdout.read1(pipes.READ_SIZE):
+            builder.feed(chunk)
+            read_bytes += len(chunk)
+            percent = min(int(read_bytes * 100 / total_bytes), 100)
+            if progress is not None and percent != last_percent:
+                last_percent = percent
+                progress(percent)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        reader.join()
+        return_code = process.wait()
+    if return_code != 0:
+        raise PeakError(engine.failure_message(
+            f"FFmpeg exited with code {return_code} while reading "
+            + input_file, log
+        ))
+
+
+def build(
+    input_file: str, builder: PeakBuilder, info: probe.ProbeInfo,
+    progress: callable = None
+):
+    with metrics.job("peaks", input_file):
+        try:
+            with metrics.span("peaks"):
+                if not build_native(input_file, builder, progress):
+                    build_ffmpeg(input_file, builder, info, progress)
+                builder.finish()
+        except BaseException:
+            builder.abort()
+            raise
+        metrics.note("audio_seconds", info.duration)
+        metrics.note("bytes_in", metrics.file_size(input_file))
+        if progress is not None:
+            progress(100)
+
+
+default_cache = None
+default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    global default_cache
+    with default_cache_lock:
+        if default_cache is None:
+            default_cache = PeakCache()
+        return default_cache
+
+
+def load(input_file: str, progress: callable = None):
+    return get_default_cache().load(input_file, progress)
@@ -0,0 +1,97 @@
+import threading
+
+#----------------------------------------------------------------------#------#
+
+READ_SIZE = 64 * 1024
+DEFAULT_LOG_BYTES = 16 * 1024
+PROGRESS_KEY = b"\nout_time_us="
+
+
+class LogBuffer:
+    def __init__(self, max_bytes: int = DEFAULT_LOG_BYTES):
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.dropped_bytes = 0
+
+    def write(self, chunk: bytes):
+        self.data += chunk
+        excess = len(self.data) - self.max_bytes
+        if excess > 0:
+            del self.data[:excess]
+            self.dropped_bytes += excess
+
+    def text(self):
+        text = self.data.decode("utf-8", "replace")
+        if self.dropped_bytes > 0:
+            # The oldest line was cut in half
+            text = text.partition("\n")[2]
+        return text.strip()
+
+    def last_line(self):
+        lines = self.text().splitlines()
+        return lines[-1].strip() if len(lines) > 0 else ""
+
+
+class ProgressParser:
+    def __init__(self, duration: float, progress: callable = None):
+        self.total_length_us = max(duration*1000000, 1)
+        self.progress = progress
+        self.pending = b"\n"
+        self.last_percent = -1
+
+    def feed(self, chunk: bytes):
+        if self.progress is None:
+            return
+        data = self.pending + chunk
+        end = data.rfind(b"\n")
+        # Keep the unfinished line, after the newline its key starts on
+        self.pending = data[end:]
+        # Only the newest position in a read matters, so skip the others
+        index = data.rfind(PROGRESS_KEY, 0, end)
+        if index < 0:
+            return
+        value_start = index + len(PROGRESS_KEY)
+        try:
+            out_time_us = int(data[value_start:data.index(b"\n", value_start)])
+        except ValueError:
+            # N/A until the first packet is written
+            return
+        percent = max(0, min(int(out_time_us*100 / self.total_length_us), 100))
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.progress(percent)
+
+
+def drain(stream, write: callable):
+    while chunk := stream.read1(READ_SIZE):
+        write(chunk)
+
+
+def start_drain(stream, write: callable):
+    # Pipes cannot be polled on Windows, so each extra one gets a reader
+    reader = threading.Thread(target=drain, args=(stream, write), daemon=True)
+    reader.start()
+    return reader
+
+
+def communicate(process, parser: ProgressParser, log: LogBuffer):
+    reader = start_drain(process.stderr, log.write)
+    drain(process.stdout, parser.feed)
+    reader.join()
+    return process.wait()
+
+
+async def drain_async(stream, write: callable):
+    while chunk := await stream.read(READ_SIZE):
+        write(chunk)
+
+
+async def communicate_async(process, parser: ProgressParser, log: LogBuffer):
+    # Imported here so that the GUI's start-up does not load asyncio
+    import asyncio
+
+    await asyncio.gather(
+        drain_async(process.stdout, parser.feed),
+        drain_async(process.stderr, log.write)
+    )
+    return await process.wait()
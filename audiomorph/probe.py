@@ -0,0 +1,177 @@
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from audiomorph.config import (
+    AUDIO_FORMATS, CACHE_DIRECTORY, DEFAULT_WORKERS, FFPROBE_PATH
+)
+
+#----------------------------------------------------------------------#------#
+
+PROBE_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "probe.sqlite3")
+DEFAULT_MAX_ENTRIES = 100000
+
+
+class ProbeError(Exception):
+    pass
+
+
+@dataclass
+class ProbeInfo:
+    duration: float
+    codec: str
+    sample_rate: int
+    channels: int
+    bit_rate: int
+
+
+def run_ffprobe(input_file: str):
+    result = subprocess.run([
+            FFPROBE_PATH, "-v", "error", "-select_streams", "a:0",
+            "-show_entries",
+            "format=duration,bit_rate:stream=codec_name,sample_rate,"
+            + "channels,bit_rate",
+            "-of", "json", input_file
+        ],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True
+    )
+    try:
+        output = json.loads(result.stdout)
+        file_format = output["format"]
+        stream = output["streams"][0]
+        return ProbeInfo(
+            float(file_format["duration"]),
+            stream.get("codec_name", ""),
+            int(stream.get("sample_rate", 0)),
+            int(stream.get("channels", 0)),
+            int(stream.get("bit_rate", file_format.get("bit_rate", 0)))
+        )
+    except (ValueError, KeyError, IndexError):
+        raise ProbeError(f"Could not probe {input_file}")
+
+
+class ProbeCache:
+    def __init__(
+        self, path: str = PROBE_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+        except (OSError, sqlite3.Error):
+            self.connection = sqlite3.connect(
+                ":memory:", check_same_thread=False
+            )
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS probes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    duration REAL NOT NULL,
+                    codec TEXT NOT NULL,
+                    sample_rate INTEGER NOT NULL,
+                    channels INTEGER NOT NULL,
+                    bit_rate INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS probes_last_used "
+                + "ON probes (last_used)"
+            )
+
+    def get(self, path: str, stat: os.stat_result = None):
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT duration, codec, sample_rate, channels, bit_rate "
+                + "FROM probes WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE probes SET last_used = ? WHERE path = ?",
+                (time.time(), path)
+            )
+        return ProbeInfo(*row)
+
+    def put(self, path: str, info: ProbeInfo, stat: os.stat_result = None):
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, "
+                + "?, ?)",
+                (
+                    path, stat.st_size, stat.st_mtime_ns, info.duration,
+                    info.codec, info.sample_rate, info.channels,
+                    info.bit_rate, time.time()
+                )
+            )
+            self.connection.execute(
+                "DELETE FROM probes WHERE path IN (SELECT path FROM probes "
+                + "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def probe(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise ProbeError(f"Could not probe {path}")
+        info = self.get(path, stat)
+        if info is None:
+            info = run_ffprobe(path)
+            self.put(path, info, stat)
+        return info
+
+    def warm_directory(
+        self, directory: str, workers: int = None,
+        extensions: tuple = AUDIO_FORMATS
+    ):
+        from audiomorph import ingest
+
+        def probe_file(path: str):
+            try:
+                self.probe(path)
+                return True
+            except ProbeError:
+                return False
+
+        workers = workers or DEFAULT_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(ingest.bounded_map(
+                pool, probe_file, ingest.walk_directory(directory, extensions),
+                workers * 4
+            ))
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM probes")
+
+
+default_cache = None
+default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    global default_cache
+    with default_cache_lock:
+        if default_cache is None:
+            default_cache = ProbeCache()
+        return default_cache
+
+
+def probe(input_file: str):
+    return get_default_cache().probe(input_file)
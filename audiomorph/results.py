@@ -0,0 +1,240 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+
+from audiomorph.config import CACHE_DIRECTORY, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+RESULT_CACHE_DIRECTORY = os.path.join(CACHE_DIRECTORY, "results")
+RESULT_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "results.sqlite3")
+DEFAULT_MAX_BYTES = int(
+    os.environ.get("AUDIOMORPH_RESULT_CACHE_MB", "2048")
+) * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+ffmpeg_version = None
+ffmpeg_version_lock = threading.Lock()
+
+
+def get_ffmpeg_version():
+    global ffmpeg_version
+    with ffmpeg_version_lock:
+        if ffmpeg_version is None:
+            try:
+                result = subprocess.run(
+                    [FFMPEG_PATH, "-version"], stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                    text=True
+                )
+                ffmpeg_version = result.stdout.split("\n")[0]
+            except OSError:
+                ffmpeg_version = ""
+        return ffmpeg_version
+
+
+def hash_file(path: str):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as input_file:
+        while chunk := input_file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source: str, destination: str):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ResultCache:
+    def __init__(
+        self, path: str = RESULT_CACHE_PATH,
+        directory: str = RESULT_CACHE_DIRECTORY,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+        except (OSError, sqlite3.Error):
+            self.connection = sqlite3.connect(
+                ":memory:", check_same_thread=False
+            )
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    digest TEXT NOT NULL
+                )
+            """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used "
+                + "ON results (last_used)"
+            )
+            # Hits and misses of every run since the cache was cleared
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+    def content_hash(self, path: str):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT digest FROM hashes "
+                + "WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        digest = hash_file(path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest)
+            )
+        return digest
+
+    def key(
+        self, input_file: str, output_file: str, options: list,
+        version: str = None
+    ):
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (
+            self.content_hash(input_file), version or get_ffmpeg_version(),
+            os.path.splitext(output_file)[1].lower(), *options
+        ):
+            digest.update(part.encode("utf-8") + b"\0")
+        return digest.hexdigest()
+
+    def remove_entry(self, key: str, file: str):
+        self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+        try:
+            os.remove(file)
+        except OSError:
+            pass
+
+    def count(self, name: str):
+        self.connection.execute(
+            "INSERT INTO counters VALUES (?, 1) "
+            + "ON CONFLICT (name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def fetch(self, key: str, output_file: str):
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT file, size, mtime FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                file, size, mtime = row
+                try:
+                    stat = os.stat(file)
+                    valid = (stat.st_size, stat.st_mtime_ns) == (size, mtime)
+                except OSError:
+                    valid = False
+                if valid:
+                    self.connection.execute(
+                        "UPDATE results SET last_used = ? WHERE key = ?",
+                        (time.time(), key)
+                    )
+                else:
+                    # The cached file was changed in place through a link
+                    self.remove_entry(key, file)
+                    row = None
+            if row is None:
+                self.count("misses")
+                return False
+            self.count("hits")
+        if os.path.lexists(output_file):
+            os.remove(output_file)
+        link_or_copy(file, output_file)
+        return True
+
+    def store(self, key: str, output_file: str):
+        file = os.path.join(
+            self.directory, key + os.path.splitext(output_file)[1].lower()
+        )
+        temporary_file = f"{file}.{threading.get_ident()}.tmp"
+        try:
+            link_or_copy(output_file, temporary_file)
+            os.replace(temporary_file, file)
+            stat = os.stat(file)
+        except OSError:
+            return
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, file, stat.st_size, stat.st_mtime_ns, time.time())
+            )
+            self.evict()
+
+    def evict(self):
+        total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        for key, file, size in self.connection.execute(
+            "SELECT key, file, size FROM results ORDER BY last_used"
+        ).fetchall():
+            self.remove_entry(key, file)
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+
+    def statistics(self):
+        with self.lock:
+            entries, total_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            counters = dict(self.connection.execute(
+                "SELECT name, value FROM counters"
+            ).fetchall())
+            return {
+                "hits": counters.get("hits", 0),
+                "misses": counters.get("misses", 0), "entries": entries,
+                "bytes": total_bytes, "max_bytes": self.max_bytes
+            }
+
+    def clear(self):
+        with self.lock, self.connection:
+            for key, file in self.connection.execute(
+                "SELECT key, file FROM results"
+            ).fetchall():
+                self.remove_entry(key, file)
+            self.connection.execute("DELETE FROM hashes")
+            self.connection.execute("DELETE FROM counters")
+
+
+default_cache = None
+default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    global default_cache
+    with default_cache_lock:
+        if default_cache is None:
+            default_cache = ResultCache()
+        return default_cache
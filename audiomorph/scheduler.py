@@ -0,0 +1,316 @@
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from audiomorph import backends, engine, metrics, pipes
+from audiomorph.config import DEFAULT_WORKERS
+
+#----------------------------------------------------------------------#------#
+
+DEFAULT_MAX_PENDING = 1024
+DEFAULT_PRIORITY = 0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class SchedulerFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(
+        self, function: callable, priority: int, progress: callable,
+        complete: callable
+    ):
+        self.function = function
+        self.priority = priority
+        self.progress = progress
+        self.complete = complete
+        self.future = Future()
+        self.task = None
+        self.submitted = time.monotonic()
+
+    def publish(self, percent: int):
+        if self.progress is not None:
+            self.progress(percent)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout: float = None):
+        return self.future.result(timeout)
+
+
+class Scheduler:
+    def __init__(
+        self, workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.sequence = itertools.count()
+        self.loop = None
+        self.thread = None
+        self.queue = None
+        self.slots = None
+        self.dispatcher = None
+        self.running = set()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.shutdown(cancel=exception is not None)
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.queue = asyncio.PriorityQueue(self.max_pending)
+            self.slots = asyncio.Condition()
+            self.dispatcher = self.loop.create_task(self.dispatch())
+            self.loop.call_soon(started.set)
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def call(self, coroutine, timeout: float = None):
+        return asyncio.run_coroutine_threadsafe(
+            coroutine, self.loop
+        ).result(timeout)
+
+    def submit(
+        self, function: callable, priority: int = DEFAULT_PRIORITY,
+        progress: callable = None, complete: callable = None,
+        block: bool = True, timeout: float = None
+    ):
+        # Lower priorities run first, equal priorities in submission order
+        job = Job(function, priority, progress, complete)
+        future = asyncio.run_coroutine_threadsafe(
+            self.enqueue(job, block), self.loop
+        )
+        try:
+            future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise SchedulerFull(f"{self.max_pending} jobs already queued")
+        return job
+
+    async def enqueue(self, job: Job, block: bool):
+        item = (job.priority, next(self.sequence), job)
+        if block:
+            await self.queue.put(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            raise SchedulerFull(f"{self.max_pending} jobs already queued")
+
+    def set_workers(self, workers: int):
+        async def notify():
+            async with self.slots:
+                self.workers = workers
+                self.slots.notify_all()
+        self.call(notify())
+
+    async def dispatch(self):
+        while True:
+            async with self.slots:
+                await self.slots.wait_for(
+                    lambda: len(self.running) < self.workers
+                )
+            # Only take a job once a slot is free, so that jobs submitted
+            # meanwhile with a lower priority value still go first
+            _, _, job = await self.queue.get()
+            if job.done():
+                continue
+            self.running.add(job)
+            job.task = asyncio.create_task(self.run_job(job))
+
+    async def run_job(self, job: Job):
+        trace = metrics.get_default_recorder().start_job(
+            "job", queue_wait=time.monotonic() - job.submitted
+        )
+        status = "failed"
+        try:
+            with trace.activate():
+                result = await job.function(job.publish)
+            status = "ok"
+        except asyncio.CancelledError:
+            result = JobCancelled("Cancelled")
+            status = "cancelled"
+        except Exception as error:
+            result = error
+        trace.finish(status)
+        self.running.discard(job)
+        async with self.slots:
+            self.slots.notify_all()
+        self.finish(job, result)
+
+    def finish(self, job: Job, result):
+        if job.done():
+            return
+        # Failures are results too, like engine.convert_batch returns them
+        job.future.set_result(result)
+        if job.complete is not None:
+            job.complete(result)
+
+    def cancel(self, job: Job):
+        self.loop.call_soon_threadsafe(self.cancel_job, job)
+
+    def cancel_job(self, job: Job):
+        if job.task is not None:
+            # The task kills its FFmpeg process and removes partial outputs
+            job.task.cancel()
+        else:
+            self.finish(job, JobCancelled("Cancelled"))
+
+    async def stop(self, cancel: bool):
+        if cancel:
+            while not self.queue.empty():
+                self.cancel_job(self.queue.get_nowait()[2])
+            for job in list(self.running):
+                self.cancel_job(job)
+        else:
+            while not self.queue.empty() or len(self.running) > 0:
+                async with self.slots:
+                    await self.slots.wait()
+        tasks = [job.task for job in self.running]
+        if len(tasks) > 0:
+            await asyncio.wait(tasks)
+        self.dispatcher.cancel()
+
+    def shutdown(self, cancel: bool = True):
+        if self.loop is None:
+            return
+        self.call(self.stop(cancel))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+        self.thread = None
+
+#----------------------------------------------------------------------#------#
+
+async def run_ffmpeg(
+    arguments: list, duration: float, progress: callable = None,
+    log: pipes.LogBuffer = None, pass_fds: tuple = ()
+):
+    # Spans on the event loop are not profiled, since other jobs run there
+    # in between
+    with metrics.span("spawn", profile=False):
+        process = await asyncio.create_subprocess_exec(
+            *engine.ffmpeg_command(arguments),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            pass_fds=pass_fds
+        )
+    try:
+        with metrics.span("encode", profile=False):
+            return await pipes.communicate_async(
+                process, pipes.ProgressParser(duration, progress),
+                log if log is not None else pipes.LogBuffer()
+            )
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+
+
+def abandon_plan(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is None:
+        engine.finish_peaks(task.result(), False)
+
+
+async def convert_many(
+    input_file: str, output_files: list, progress: callable = None,
+    use_cache: bool = True, dither: bool = False, backend: str = None,
+    channels: int = None
+):
+    metrics.describe("convert", input_file)
+    conversion_backend = backends.get_backend(backend)
+    # In-process PCM conversions, probing and cache lookups are blocking
+    # file I/O, kept off the loop
+    native_results = await asyncio.to_thread(
+        engine.convert_native, input_file, output_files, progress, dither,
+        channels
+    )
+    if native_results is not None:
+        return native_results
+    planning = asyncio.ensure_future(asyncio.to_thread(
+        engine.plan_conversion, input_file, output_files, use_cache, dither,
+        conversion_backend, channels
+    ))
+    try:
+        plan = await asyncio.shield(planning)
+    except asyncio.CancelledError:
+        # A plan finished after all may hold a peak tap to close
+        planning.add_done_callback(abandon_plan)
+        raise
+    if plan.modes.count(engine.CACHED_MODE) == len(output_files):
+        if progress is not None:
+            progress(100)
+        return engine.finish_conversion(plan)
+    try:
+        return_code, log = await conversion_backend.run_async(plan, progress)
+    except asyncio.CancelledError:
+        engine.remove_outputs(plan)
+        raise
+    except BaseException:
+        engine.finish_peaks(plan, False)
+        raise
+    return await asyncio.to_thread(
+        engine.finish_conversion, plan, return_code, log
+    )
+
+
+def conversion(
+    input_file: str, output_files: list, use_cache: bool = True,
+    dither: bool = False, backend: str = None, channels: int = None
+):
+    async def run(progress: callable):
+        return await convert_many(
+            input_file, output_files, progress, use_cache, dither, backend,
+            channels
+        )
+    return run
+
+
+def blocking(function: callable, *arguments, **keywords):
+    # For work without a subprocess of its own to kill; cancelling it only
+    # takes effect before it starts
+    async def run(progress: callable):
+        return await asyncio.to_thread(
+            function, *arguments, progress=progress, **keywords
+        )
+    return run
+
+
+default_scheduler = None
+default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    global default_scheduler
+    with default_scheduler_lock:
+        if default_scheduler is None:
+            default_scheduler = Scheduler()
+            default_scheduler.start()
+        return default_scheduler
+
+
+def shutdown_default_scheduler():
+    global default_scheduler
+    with default_scheduler_lock:
+        if default_scheduler is not None:
+            default_scheduler.shutdown()
+            default_scheduler = None
@@ -0,0 +1,536 @@
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+
+from audiomorph import engine, frames, metrics, pipes, probe, results
+from audiomorph.config import DEFAULT_WORKERS, FFMPEG_PATH, FFPROBE_PATH
+
+#----------------------------------------------------------------------#------#
+
+SEGMENTED_MODE = "segmented"
+MINIMUM_SEGMENT_SECONDS = 60
+SEEK_MARGIN_SECONDS = 1
+FLAC_BLOCK_SIZE = 4096
+PRE_ROLL_FRAMES = 4
+POST_ROLL_FRAMES = 2
+VERIFY_SNR_TOLERANCE = 1.0
+
+LOSSLESS_CODECS = ("alac", "ape", "flac", "tta", "wavpack")
+PCM_FORMATS = ("aiff", "wav")
+LOSSY_ENCODERS = {"aac": "aac", "m4a": "aac", "mp3": "libmp3lame"}
+MP3_DECODER_DELAY = 528 + 1
+
+encoder_grids = {}
+encoder_grids_lock = threading.Lock()
+
+
+@dataclass
+class Segment:
+    start: int
+    end: int
+    encode_start: int
+    encode_end: int
+    first_frame: int
+    last_frame: int
+
+
+def is_lossless(codec: str):
+    return codec.startswith("pcm_") or codec in LOSSLESS_CODECS
+
+
+def output_format_of(output_file: str):
+    return os.path.splitext(output_file)[1][1:].lower()
+
+
+def can_segment(info: probe.ProbeInfo, output_file: str):
+    output_format = output_format_of(output_file)
+    return is_lossless(info.codec) and (
+        output_format in PCM_FORMATS or output_format == "flac"
+        or output_format in LOSSY_ENCODERS
+    )
+
+
+def encoder_grid(encoder: str, sample_rate: int):
+    with encoder_grids_lock:
+        if (encoder, sample_rate) in encoder_grids:
+            return encoder_grids[(encoder, sample_rate)]
+    result = subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-f", "lavfi", "-i",
+            f"aevalsrc=0:s={sample_rate}:d=0.5", "-c:a", encoder,
+            "-f", "framecrc", "-"
+        ],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True
+    )
+    output_rate = re.search(r"#sample_rate 0: (\d+)", result.stdout)
+    packets = [
+        line.split(",") for line in result.stdout.splitlines()
+        if line != "" and not line.startswith("#")
+    ]
+    if output_rate is None or len(packets) == 0:
+        raise engine.ConversionError(f"Could not inspect encoder {encoder}")
+    if int(output_rate.group(1)) != sample_rate:
+        grid = None
+    else:
+        grid = (int(packets[0][3]), -int(packets[0][2]))
+    with encoder_grids_lock:
+        encoder_grids[(encoder, sample_rate)] = grid
+    return grid
+
+
+def stream_samples(input_file: str, sample_rate: int):
+    result = subprocess.run([
+            FFPROBE_PATH, "-v", "error", "-select_streams", "a:0",
+            "-show_entries", "stream=time_base,start_pts,duration_ts",
+            "-of", "json", input_file
+        ],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True
+    )
+    try:
+        stream = json.loads(result.stdout)["streams"][0]
+        numerator, denominator = map(int, stream["time_base"].split("/"))
+        start = int(stream.get("start_pts", 0))
+        duration = int(stream["duration_ts"])
+    except (ValueError, KeyError, IndexError):
+        return None, None
+    scale = numerator * sample_rate / denominator
+    return round(start * scale), round(duration * scale)
+
+
+def plan_segments(
+    total_samples: int, count: int, grid_size: int = 1, grid_delay: int = 0,
+    pre_roll: int = 0, post_roll: int = 0, first_frame: int = 0
+):
+    boundaries = [0]
+    for index in range(1, count):
+        target = total_samples * index // count
+        boundary = (
+            (target + grid_delay) // grid_size * grid_size - grid_delay
+        )
+        if boundaries[-1] < boundary < total_samples:
+            boundaries.append(boundary)
+    boundaries.append(total_samples)
+    segments = []
+    for index in range(len(boundaries) - 1):
+        start, end = boundaries[index], boundaries[index + 1]
+        last = index == len(boundaries) - 2
+        if index == 0:
+            encode_start = 0
+            keep_from = first_frame
+            kept_frames = (end + grid_delay) // grid_size
+        else:
+            encode_start = start - pre_roll
+            keep_from = (pre_roll + grid_delay) // grid_size
+            kept_frames = (end - start) // grid_size
+        segments.append(Segment(
+            start, end, encode_start, None if last else end + post_roll,
+            keep_from, None if last else keep_from + kept_frames
+        ))
+    return segments
+
+
+def codec_arguments(output_format: str, index: int):
+    if output_format == "flac":
+        return ["-c:a", "flac", "-frame_size", str(FLAC_BLOCK_SIZE)]
+    if output_format == "mp3":
+        return [
+            "-c:a", "libmp3lame", "-reservoir", "0", "-id3v2_version", "0",
+            "-write_xing", "1" if index == 0 else "0", "-f", "mp3"
+        ]
+    if output_format in LOSSY_ENCODERS:
+        return ["-c:a", LOSSY_ENCODERS[output_format], "-f", "adts"]
+    return []
+
+
+def segment_arguments(
+    input_file: str, segment_file: str, segment: Segment, index: int,
+    output_format: str, sample_rate: int, start_offset: int,
+    options: list = ()
+):
+    arguments = []
+    seek = segment.encode_start / sample_rate - SEEK_MARGIN_SECONDS
+    if seek > 0:
+        arguments += ["-ss", f"{seek:.6f}"]
+    trim = f"atrim=start_pts={start_offset + segment.encode_start}"
+    if segment.encode_end is not None:
+        trim += f":end_pts={start_offset + segment.encode_end}"
+    return arguments + [
+        "-copyts", "-i", input_file, "-map", "0:a:0", "-map_metadata", "-1",
+        "-af", f"{trim},asetpts=PTS-STARTPTS",
+        *codec_arguments(output_format, index), *options, segment_file
+    ]
+
+
+def remux(input_file: str, metadata_file: str, output_file: str, *options):
+    log = pipes.LogBuffer()
+    return_code = engine.run_ffmpeg([
+        *options, "-i", input_file, "-i", metadata_file, "-map", "0:a",
+        "-map_metadata", "1", "-c", "copy", output_file
+    ], 0, log=log)
+    if return_code != 0:
+        raise engine.ConversionError(engine.failure_message(
+            f"Could not write {output_file}", log
+        ), log.text())
+
+
+def join_segments(
+    input_file: str, output_file: str, output_format: str,
+    segment_files: list, segments: list, grid: tuple, total_samples: int,
+    sample_rate: int, directory: str
+):
+    if output_format in PCM_FORMATS:
+        list_file = os.path.join(directory, "segments.txt")
+        with open(list_file, "w", encoding="utf-8") as segment_list:
+            for segment_file in segment_files:
+                segment_list.write(f"file '{segment_file}'\n")
+        remux(
+            list_file, input_file, output_file, "-f", "concat", "-safe", "0"
+        )
+    elif output_format == "flac":
+        joined_file = os.path.join(directory, "joined.flac")
+        frames.join_flac(segment_files, joined_file)
+        remux(joined_file, input_file, output_file)
+    elif output_format == "mp3":
+        frame_size, delay = grid
+        with open(segment_files[0], "rb") as first_segment:
+            header = first_segment.read(4)
+            xing_length = frames.parse_mp3_header(header, 0)[0]
+            xing_frame = header + first_segment.read(xing_length - 4)
+        joined_file = os.path.join(directory, "joined.mp3")
+        with open(joined_file, "wb") as joined:
+            joined.write(xing_frame)
+            frame_count = frames.join_frames(
+                joined, segment_files,
+                [(segment.first_frame, segment.last_frame)
+                 for segment in segments],
+                frames.iterate_mp3_frames
+            )
+            encoder_delay = delay - MP3_DECODER_DELAY
+            padding = frame_count * frame_size - encoder_delay - total_samples
+            if not 0 <= padding < 4096:
+                raise engine.ConversionError(
+                    f"Segments of {input_file} do not line up"
+                )
+            total_bytes = joined.tell()
+            joined.seek(0)
+            joined.write(frames.patch_xing_frame(
+                xing_frame, frame_count, total_bytes, encoder_delay, padding
+            ))
+        remux(joined_file, input_file, output_file)
+    else:
+        frame_size, delay = grid
+        joined_file = os.path.join(directory, "joined.aac")
+        with open(joined_file, "wb") as joined:
+            frames.join_frames(
+                joined, segment_files,
+                [(segment.first_frame, segment.last_frame)
+                 for segment in segments],
+                frames.iterate_adts_frames
+            )
+        if output_format == "aac":
+            shutil.move(joined_file, output_file)
+        else:
+            remux(
+                joined_file, input_file, output_file,
+                "-itsoffset", f"{-delay / sample_rate:.6f}"
+            )
+
+
+def audio_statistics(arguments: list):
+    result = subprocess.run(
+        [FFMPEG_PATH, "-nostats", "-hide_banner", *arguments, "-f", "null",
+         "-"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE, text=True
+    )
+    samples = re.findall(r"Number of samples: (\d+)", result.stderr)
+    rms = re.findall(r"RMS level dB: (\S+)", result.stderr)
+    if len(samples) == 0 or len(rms) == 0:
+        raise engine.ConversionError("Could not measure the output")
+    return int(samples[-1]), float(rms[-1])
+
+
+def audio_md5(audio_file: str):
+    result = subprocess.run(
+        [FFMPEG_PATH, "-v", "error", "-i", audio_file, "-map", "0:a:0",
+         "-f", "md5", "-"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True
+    )
+    return result.stdout.strip()
+
+
+def signal_to_noise(decoded_file: str, input_file: str, skip: int):
+    _, source_rms = audio_statistics([
+        "-i", input_file, "-af",
+        "aformat=sample_fmts=dbl:channel_layouts=mono,"
+        + "astats=measure_perchannel=none"
+    ])
+    _, difference_rms = audio_statistics([
+        "-i", decoded_file, "-i", input_file, "-filter_complex",
+        f"[0:a:0]atrim=start_sample={skip},asetpts=PTS-STARTPTS,"
+        + "aformat=sample_fmts=dbl:channel_layouts=mono[a];"
+        + "[1:a:0]aformat=sample_fmts=dbl:channel_layouts=mono[b];"
+        + "[a][b]amerge=inputs=2,pan=mono|c0=c0-c1,"
+        + "astats=measure_perchannel=none"
+    ])
+    return source_rms - difference_rms
+
+
+def verify(
+    input_file: str, output_file: str, output_format: str, grid: tuple,
+    directory: str, options: list = ()
+):
+    reference_file = os.path.join(directory, f"reference.{output_format}")
+    arguments = ["-i", input_file, "-map", "0:a:0", *options]
+    if output_format == "mp3":
+        arguments += ["-reservoir", "0"]
+    log = pipes.LogBuffer()
+    if engine.run_ffmpeg([*arguments, reference_file], 0, log=log) != 0:
+        raise engine.ConversionError(engine.failure_message(
+            "Could not encode the reference", log
+        ), log.text())
+    if output_format in PCM_FORMATS or output_format == "flac":
+        if audio_md5(output_file) != audio_md5(reference_file):
+            raise engine.ConversionError(
+                f"Segmented output of {input_file} differs from a "
+                + "single-pass encode"
+            )
+        return
+    output_samples, _ = audio_statistics(
+        ["-i", output_file, "-af", "astats=measure_perchannel=none"]
+    )
+    reference_samples, _ = audio_statistics(
+        ["-i", reference_file, "-af", "astats=measure_perchannel=none"]
+    )
+    # Raw ADTS carries no gapless information, so skip the priming samples
+    skip = grid[1] if output_format == "aac" else 0
+    output_snr = signal_to_noise(output_file, input_file, skip)
+    reference_snr = signal_to_noise(reference_file, input_file, skip)
+    if (
+        output_samples != reference_samples
+        or output_snr < reference_snr - VERIFY_SNR_TOLERANCE
+    ):
+        raise engine.ConversionError(
+            f"Segmented output of {input_file} differs from a single-pass "
+            + f"encode ({output_samples} vs {reference_samples} samples, "
+            + f"{output_snr:.1f} vs {reference_snr:.1f} dB SNR)"
+        )
+
+
+def convert_segmented(
+    input_file: str, output_file: str, segments: int = None,
+    workers: int = None, progress: callable = None,
+    verify_output: bool = False, use_cache: bool = True,
+    dither: bool = False, backend: str = None
+):
+    from audiomorph import backends
+
+    start_time = time.monotonic()
+
+    def convert_whole():
+        return engine.convert(
+            input_file, output_file, progress, use_cache, dither, backend
+        )
+
+    # Segments are cut and joined by FFmpeg, so other backends convert the
+    # file in one pass
+    if backends.get_backend(backend).name != "ffmpeg":
+        return convert_whole()
+    try:
+        with metrics.span("probe"):
+            info = probe.probe(input_file)
+    except probe.ProbeError as error:
+        raise engine.ConversionError(str(error))
+    output_format = output_format_of(output_file)
+    workers = workers or DEFAULT_WORKERS
+    count = min(
+        segments or workers,
+        int(info.duration // MINIMUM_SEGMENT_SECONDS)
+    )
+    # Dither noise would differ at every segment boundary from a single
+    # pass, and PCM outputs gain nothing from segments anyway
+    if count < 2 or not can_segment(info, output_file) or (
+        dither and output_format in PCM_FORMATS
+    ):
+        return convert_whole()
+    start_offset, total_samples = stream_samples(input_file, info.sample_rate)
+    if total_samples is None:
+        return convert_whole()
+    options = engine.DITHER_ARGUMENTS if dither else []
+    cache = results.get_default_cache() if use_cache else None
+    if cache is not None:
+        # Lossy segment joins differ slightly from a single pass and with
+        # the number of segments, so they are cached apart
+        with metrics.span("cache"):
+            key = cache.key(input_file, output_file, [
+                SEGMENTED_MODE, str(count), *options
+            ])
+            if cache.fetch(key, output_file):
+                if progress is not None:
+                    progress(100)
+                return engine.ConversionResult(
+                    input_file, output_file, info.duration,
+                    time.monotonic() - start_time, engine.CACHED_MODE
+                )
+
+    grid = None
+    if output_format == "flac":
+        plan = plan_segments(total_samples, count, FLAC_BLOCK_SIZE)
+    elif output_format in LOSSY_ENCODERS:
+        grid = encoder_grid(LOSSY_ENCODERS[output_format], info.sample_rate)
+        if grid is None:
+            return convert_whole()
+        frame_size, delay = grid
+        pre_roll_frames = math.ceil(
+            (PRE_ROLL_FRAMES * frame_size + delay) / frame_size
+        )
+        plan = plan_segments(
+            total_samples, count, frame_size, delay,
+            pre_roll_frames * frame_size - delay,
+            POST_ROLL_FRAMES * frame_size,
+            1 if output_format == "mp3" else 0
+        )
+    else:
+        plan = plan_segments(total_samples, count)
+
+    directory = tempfile.mkdtemp(
+        prefix=".audiomorph-",
+        dir=os.path.dirname(os.path.abspath(output_file))
+    )
+    segment_extension = "aac" if output_format == "m4a" else output_format
+    segment_files = [
+        os.path.join(directory, f"segment{index:04}.{segment_extension}")
+        for index in range(len(plan))
+    ]
+    percentages = [0] * len(plan)
+    logs = [pipes.LogBuffer() for _ in plan]
+    lock = threading.Lock()
+    last_percent = -1
+
+    def encode(index: int):
+        nonlocal last_percent
+        segment = plan[index]
+
+        def segment_progress(percent: int):
+            nonlocal last_percent
+            with lock:
+                percentages[index] = percent
+                overall = int(sum(
+                    percentage * (plan[number].end - plan[number].start)
+                    for number, percentage in enumerate(percentages)
+                ) / total_samples)
+                if overall == last_percent or progress is None:
+                    return
+                last_percent = overall
+            progress(overall)
+
+        end = segment.encode_end or total_samples
+        return engine.run_ffmpeg(segment_arguments(
+                input_file, segment_files[index], segment, index,
+                output_format, info.sample_rate, start_offset, options
+            ), (end - segment.encode_start) / info.sample_rate,
+            segment_progress, logs[index]
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return_codes = list(pool.map(
+                metrics.carry(encode), range(len(plan))
+            ))
+        for return_code, log in zip(return_codes, logs):
+            if return_code != 0:
+                raise engine.ConversionError(engine.failure_message(
+                    f"FFmpeg failed while encoding segments of {input_file}",
+                    log
+                ), log.text())
+        temporary_output = os.path.join(
+            directory, f"output.{output_format}"
+        )
+        try:
+            with metrics.span("join"):
+                join_segments(
+                    input_file, temporary_output, output_format,
+                    segment_files, plan, grid, total_samples,
+                    info.sample_rate, directory
+                )
+        except frames.FrameError as error:
+            raise engine.ConversionError(str(error))
+        if verify_output:
+            with metrics.span("verify"):
+                verify(
+                    input_file, temporary_output, output_format, grid,
+                    directory, options
+                )
+        os.replace(temporary_output, output_file)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if cache is not None:
+        with metrics.span("store"):
+            cache.store(key, output_file)
+    metrics.note("audio_seconds", info.duration)
+    metrics.note("bytes_in", metrics.file_size(input_file))
+    metrics.add("bytes_out", metrics.file_size(output_file))
+    return engine.ConversionResult(
+        input_file, output_file, info.duration,
+        time.monotonic() - start_time, SEGMENTED_MODE
+    )
+
+
+def convert_many(
+    input_file: str, output_files: list, segments: int = None,
+    workers: int = None, progress: callable = None,
+    verify_output: bool = False, use_cache: bool = True,
+    dither: bool = False, backend: str = None
+):
+    # Passes run one after another; like the outputs of one FFmpeg run,
+    # each output's time counts from the start of the job
+    start_time = time.monotonic()
+    with metrics.job("convert", input_file):
+        try:
+            with metrics.span("probe"):
+                info = probe.probe(input_file)
+        except probe.ProbeError as error:
+            raise engine.ConversionError(str(error))
+        split_files = [
+            output_file for output_file in output_files
+            if can_segment(info, output_file)
+        ]
+        other_files = [
+            output_file for output_file in output_files
+            if output_file not in split_files
+        ]
+        passes = len(split_files) + (1 if len(other_files) > 0 else 0)
+        outputs = {}
+
+        def pass_progress(number: int):
+            def scaled_progress(percent: int):
+                if progress is not None:
+                    progress((number * 100 + percent) // passes)
+            return scaled_progress
+
+        if len(other_files) > 0:
+            for result in engine.convert_many(
+                input_file, other_files, pass_progress(0), use_cache, dither,
+                backend
+            ):
+                outputs[result.output_file] = replace(
+                    result, elapsed=time.monotonic() - start_time
+                )
+        first_pass = passes - len(split_files)
+        for number, output_file in enumerate(split_files, start=first_pass):
+            outputs[output_file] = replace(convert_segmented(
+                input_file, output_file, segments, workers,
+                pass_progress(number), verify_output, use_cache, dither,
+                backend
+            ), elapsed=time.monotonic() - start_time)
+        return [outputs[output_file] for output_file in output_files]
@@ -0,0 +1,830 @@
+import hashlib
+import hmac
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from audiomorph import backends, downloads, engine, scheduler
+from audiomorph.config import (
+    AUDIO_FORMATS, CACHE_DIRECTORY, DEFAULT_BACKEND, DEFAULT_WORKERS
+)
+
+#----------------------------------------------------------------------#------#
+
+SERVER_DIRECTORY = os.environ.get(
+    "AUDIOMORPH_SERVER_DIRECTORY", os.path.join(CACHE_DIRECTORY, "server")
+)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8750
+SERVER_TOKENS = [
+    token for token in os.environ.get(
+        "AUDIOMORPH_SERVER_TOKEN", ""
+    ).split(",") if token != ""
+]
+DEFAULT_PER_CLIENT = 2
+DEFAULT_MAX_QUEUED = 100
+# A label clients may put on their jobs; it does not make them a
+# different client
+CLIENT_HEADER = "X-AudioMorph-Client"
+MAX_LABEL_LENGTH = 200
+# Comments sent on idle event streams, so proxies keep them open
+KEEPALIVE_SECONDS = 15.0
+MAX_REQUEST_BYTES = 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_NAME = "%(title)s [%(id)s]"
+# Formats become file extensions, so only these names are accepted
+OUTPUT_FORMATS = tuple(sorted(
+    set(AUDIO_FORMATS) | set(engine.STREAM_COPY_CODECS)
+))
+DOWNLOAD_FORMATS = (*OUTPUT_FORMATS, engine.PASSTHROUGH_FORMAT)
+
+CONVERT_TYPE = "convert"
+DOWNLOAD_TYPE = "download"
+QUEUED_STATUS = "queued"
+RUNNING_STATUS = "running"
+DONE_STATUS = "done"
+FAILED_STATUS = "failed"
+CANCELLED_STATUS = "cancelled"
+FINISHED_STATUSES = (DONE_STATUS, FAILED_STATUS, CANCELLED_STATUS)
+
+ROUTE = re.compile(r"^/jobs(?:/(\d+)(?:/(events|files)(?:/(.+))?)?)?/?$")
+
+
+class ServerError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.connection = downloads.connect(path)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    client TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT NOT NULL,
+                    submitted REAL NOT NULL,
+                    started REAL,
+                    finished REAL
+                )
+            """)
+
+    def row_job(self, row: tuple):
+        return {
+            "id": row[0], "client": row[1], "label": row[2],
+            "request": json.loads(row[3]), "status": row[4],
+            "error": row[5], "submitted": row[6], "started": row[7],
+            "finished": row[8]
+        }
+
+    def add(self, client: str, label: str, request: dict):
+        with self.lock, self.connection:
+            return self.connection.execute(
+                "INSERT INTO jobs (client, label, request, status, error, "
+                + "submitted) VALUES (?, ?, ?, ?, '', ?)", (
+                    client, label, json.dumps(request), QUEUED_STATUS,
+                    time.time()
+                )
+            ).lastrowid
+
+    def get(self, job_id: int):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return None if row is None else self.row_job(row)
+
+    def list(self, client: str, label: str = None):
+        with self.lock:
+            if label is None:
+                rows = self.connection.execute(
+                    "SELECT * FROM jobs WHERE client = ? ORDER BY id",
+                    (client,)
+                ).fetchall()
+            else:
+                rows = self.connection.execute(
+                    "SELECT * FROM jobs WHERE client = ? AND label = ? "
+                    + "ORDER BY id", (client, label)
+                ).fetchall()
+        return [self.row_job(row) for row in rows]
+
+    def update_request(self, job_id: int, request: dict):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET request = ? WHERE id = ?",
+                (json.dumps(request), job_id)
+            )
+
+    def start(self, job_id: int):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ?",
+                (RUNNING_STATUS, time.time(), job_id)
+            )
+
+    def finish(self, job_id: int, status: str, error: str = ""):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? "
+                + "WHERE id = ?", (status, error, time.time(), job_id)
+            )
+
+    def requeue(self):
+        # Jobs that were running when the server stopped start over
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                "SELECT id FROM jobs WHERE status = ?", (RUNNING_STATUS,)
+            ).fetchall()
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, started = NULL WHERE status = ?",
+                (QUEUED_STATUS, RUNNING_STATUS)
+            )
+        return [row[0] for row in rows]
+
+    def queued(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, client, request FROM jobs WHERE status = ? "
+                + "ORDER BY id", (QUEUED_STATUS,)
+            ).fetchall()
+        jobs = [
+            (job_id, client, json.loads(request).get(
+                "priority", scheduler.DEFAULT_PRIORITY
+            ))
+            for job_id, client, request in rows
+        ]
+        return sorted(jobs, key=lambda job: job[2])
+
+    def delete(self, job_id: int):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+class JobServer:
+    def __init__(
+        self, directory: str = SERVER_DIRECTORY,
+        workers: int = DEFAULT_WORKERS, per_client: int = DEFAULT_PER_CLIENT,
+        max_queued: int = DEFAULT_MAX_QUEUED, input_directory: str = None,
+        tokens: list = None, use_cache: bool = True
+    ):
+        self.directory = os.path.abspath(directory)
+        self.workers = workers
+        self.per_client = per_client
+        self.max_queued = max_queued
+        self.input_directory = None
+        if input_directory is not None:
+            self.input_directory = os.path.realpath(input_directory)
+        # With tokens, each one is a client of its own
+        self.tokens = SERVER_TOKENS if tokens is None else list(tokens)
+        self.use_cache = use_cache
+        os.makedirs(os.path.join(self.directory, "jobs"), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, "uploads"), exist_ok=True)
+        self.store = JobStore(os.path.join(self.directory, "jobs.sqlite3"))
+        self.condition = threading.Condition()
+        # Job ids with their client and priority, in the order they run
+        self.queue = []
+        # Job id to client and scheduler job, None until it is submitted
+        self.running = {}
+        self.cancelling = set()
+        self.progress = {}
+        # Bumped on every change a job's event stream reports
+        self.versions = {}
+        self.closing = False
+        self.scheduler = scheduler.Scheduler(workers)
+        self.dispatcher = None
+        self.server = None
+
+    def job_directory(self, job_id: int, *parts):
+        return os.path.join(self.directory, "jobs", str(job_id), *parts)
+
+    def start(self, port: int = SERVER_PORT, host: str = SERVER_HOST):
+        for job_id in self.store.requeue():
+            shutil.rmtree(self.job_directory(job_id, "output"), True)
+        self.queue = self.store.queued()
+        self.scheduler.start()
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+        server = self
+
+        class JobHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self, "GET")
+
+            def do_POST(self):
+                server.handle(self, "POST")
+
+            def do_DELETE(self):
+                server.handle(self, "DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), JobHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        # Jobs that end from here on were killed with the server, or by the
+        # signal that stops it; they stay running in the queue, so that the
+        # next start runs them again
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+
+    def close(self):
+        self.stop()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+            self.dispatcher = None
+        self.scheduler.shutdown(cancel=True)
+
+    def changed(self, job_id: int):
+        self.versions[job_id] = self.versions.get(job_id, 0) + 1
+        self.condition.notify_all()
+
+    def next_job(self):
+        if len(self.running) >= self.workers:
+            return None
+        # The oldest job whose client still has a slot, so one client's
+        # backlog never holds up the others
+        active = Counter(client for client, _ in self.running.values())
+        for index, (job_id, client, _) in enumerate(self.queue):
+            if active[client] < self.per_client:
+                return index
+        return None
+
+    def dispatch(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.closing or self.next_job() is not None
+                )
+                if self.closing:
+                    return
+                job_id, client, priority = self.queue.pop(self.next_job())
+                self.running[job_id] = (client, None)
+                self.changed(job_id)
+            self.store.start(job_id)
+            job = self.store.get(job_id)
+            try:
+                function = self.job_function(job_id, job["request"])
+            except (OSError, ServerError) as error:
+                self.complete(job_id, error)
+                continue
+
+            def progress(percent: int, job_id: int = job_id):
+                self.publish(job_id, percent)
+
+            def complete(result, job_id: int = job_id):
+                self.complete(job_id, result)
+
+            submitted = self.scheduler.submit(
+                function, priority, progress=progress, complete=complete
+            )
+            with self.condition:
+                if job_id in self.running:
+                    self.running[job_id] = (client, submitted)
+                if job_id in self.cancelling:
+                    self.scheduler.cancel(submitted)
+
+    def job_function(self, job_id: int, request: dict):
+        output_directory = self.job_directory(job_id, "output")
+        os.makedirs(output_directory, exist_ok=True)
+        if request["type"] == DOWNLOAD_TYPE:
+            return scheduler.blocking(self.download, request, output_directory)
+        if not os.path.isfile(request["input"]):
+            name = os.path.basename(request["input"])
+            raise ServerError(410, f"{name} no longer exists")
+        output_files = [
+            engine.output_path(
+                request["input"], output_directory, output_format
+            )
+            for output_format in request["formats"]
+        ]
+        for output_file in output_files:
+            if not is_inside(output_file, output_directory):
+                raise ServerError(
+                    400, f"{os.path.basename(output_file)} would be written "
+                    + "outside the job's directory"
+                )
+        if request["tracks"]:
+            from audiomorph import chapters
+
+            return scheduler.blocking(
+                chapters.split_many, request["input"], output_files, None, 1,
+                use_cache=self.use_cache, dither=request["dither"],
+                backend=request["backend"]
+            )
+        return scheduler.conversion(
+            request["input"], output_files, self.use_cache,
+            request["dither"], request["backend"]
+        )
+
+    def download(
+        self, request: dict, output_directory: str, progress: callable
+    ):
+        entries = engine.expand_urls(
+            [request["url"]], playlist=request["playlist"],
+            use_cache=self.use_cache
+        )
+        if len(entries) == 0:
+            raise engine.DownloadError(
+                f"Nothing to download at {request['url']}"
+            )
+        percents = [0] * len(entries)
+
+        def entry_progress(index: int, percent: int):
+            percents[index] = percent
+            progress(sum(percents) // len(percents))
+
+        # The archive could hand back another job's file, outside this
+        # job's directory
+        return engine.download_many(
+            entries, os.path.join(output_directory, DOWNLOAD_NAME),
+            engine.OutputProfile(
+                request["format"], request["bitrate"], request["sample_rate"]
+            ),
+            postprocess_workers=1, progress=entry_progress,
+            complete=lambda index, _: entry_progress(index, 100),
+            streaming=request["stream"], use_cache=self.use_cache,
+            use_archive=False, split_chapters=request["split_chapters"]
+        )
+
+    def publish(self, job_id: int, percent: int):
+        with self.condition:
+            if job_id in self.running and self.progress.get(job_id) != percent:
+                self.progress[job_id] = percent
+                self.changed(job_id)
+
+    def complete(self, job_id: int, result):
+        with self.condition:
+            if self.closing and isinstance(result, Exception):
+                return
+        status, error = DONE_STATUS, ""
+        if isinstance(result, scheduler.JobCancelled):
+            status = CANCELLED_STATUS
+            shutil.rmtree(self.job_directory(job_id, "output"), True)
+        elif isinstance(result, Exception):
+            status, error = FAILED_STATUS, str(result)
+        else:
+            # Downloads report each video of a playlist on its own
+            failures = [
+                str(output) for output in result
+                if isinstance(output, Exception)
+            ]
+            if len(failures) > 0:
+                status, error = FAILED_STATUS, "\n".join(failures)
+        self.store.finish(job_id, status, error)
+        with self.condition:
+            self.running.pop(job_id, None)
+            self.cancelling.discard(job_id)
+            self.progress.pop(job_id, None)
+            self.changed(job_id)
+
+    def check_client(self, client: str):
+        with self.condition:
+            jobs = sum(
+                queued[1] == client for queued in self.queue
+            ) + sum(
+                running_client == client
+                for running_client, _ in self.running.values()
+            )
+        if jobs >= self.max_queued:
+            raise ServerError(
+                429, f"{client} already has {self.max_queued} jobs waiting"
+            )
+
+    def submit(
+        self, client: str, label: str, request: dict, upload: str = None
+    ):
+        # Uploads are moved into the job's directory once it has an id
+        self.check_client(client)
+        job_id = self.store.add(client, label, request)
+        if upload is not None:
+            input_file = self.job_directory(
+                job_id, "input", os.path.basename(request["input"])
+            )
+            os.makedirs(os.path.dirname(input_file), exist_ok=True)
+            os.replace(upload, input_file)
+            request["input"] = input_file
+            self.store.update_request(job_id, request)
+        # Lower priorities run first, equal priorities in submission order
+        priority = request["priority"]
+        with self.condition:
+            position = len(self.queue)
+            while position > 0 and self.queue[position - 1][2] > priority:
+                position -= 1
+            self.queue.insert(position, (job_id, client, priority))
+            self.changed(job_id)
+        return job_id
+
+    def cancel(self, job_id: int):
+        with self.condition:
+            queued = [job for job in self.queue if job[0] == job_id]
+            if len(queued) > 0:
+                self.queue.remove(queued[0])
+            elif job_id in self.running:
+                _, submitted = self.running[job_id]
+                request = self.store.get(job_id)["request"]
+                if request["type"] == DOWNLOAD_TYPE or request["tracks"]:
+                    # Their threads cannot be stopped once they run
+                    raise ServerError(
+                        409, f"Job {job_id} cannot be stopped once started"
+                    )
+                self.cancelling.add(job_id)
+                if submitted is not None:
+                    self.scheduler.cancel(submitted)
+                return False
+        if len(queued) == 0:
+            job = self.store.get(job_id)
+            if job is None:
+                raise ServerError(404, f"No job {job_id}")
+            # Finished jobs are removed along with their files
+            self.store.delete(job_id)
+            shutil.rmtree(self.job_directory(job_id), True)
+            with self.condition:
+                self.versions.pop(job_id, None)
+                self.condition.notify_all()
+            return True
+        self.complete(job_id, scheduler.JobCancelled("Cancelled"))
+        return False
+
+    def files(self, job_id: int):
+        output_directory = self.job_directory(job_id, "output")
+        files = []
+        for directory, names, file_names in os.walk(output_directory):
+            # Partial outputs are hidden until they are renamed into place
+            names[:] = sorted(name for name in names if name[0] != ".")
+            for name in sorted(file_names):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(
+                    path, output_directory
+                ).replace("\\", "/")
+                files.append({
+                    "name": relative_path, "size": os.path.getsize(path),
+                    "url": f"/jobs/{job_id}/files/{quote(relative_path)}"
+                })
+        return files
+
+    def describe(self, job_id: int):
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        request = dict(job.pop("request"))
+        if request["type"] == CONVERT_TYPE:
+            request["input"] = os.path.basename(request["input"])
+        job.update(request)
+        with self.condition:
+            job["progress"] = self.progress.get(job_id, 0)
+            positions = [queued[0] for queued in self.queue]
+            if job_id in positions:
+                job["position"] = positions.index(job_id)
+        if job["status"] == DONE_STATUS:
+            job["progress"] = 100
+        if job["status"] in (DONE_STATUS, FAILED_STATUS):
+            job["files"] = self.files(job_id)
+        return job
+
+    def status(self):
+        with self.condition:
+            return {
+                "workers": self.workers, "per_client": self.per_client,
+                "queued": len(self.queue), "running": len(self.running)
+            }
+
+    def convert_request(self, options: dict, input_file: str):
+        formats = options.get("formats", options.get("format", ""))
+        if isinstance(formats, str):
+            formats = engine.parse_formats(formats)
+        if not isinstance(formats, list) or len(formats) == 0:
+            raise ServerError(400, "Conversions need at least one format")
+        formats = [str(output_format).lower() for output_format in formats]
+        for output_format in formats:
+            check_format(output_format, OUTPUT_FORMATS)
+        backend = options.get("backend") or None
+        if backend is not None and backend not in backends.BACKENDS:
+            raise ServerError(400, f"Unknown backend {backend}")
+        tracks = flag(options.get("tracks"))
+        if tracks and (backend or DEFAULT_BACKEND).lower() != "ffmpeg":
+            raise ServerError(400, "Tracks are only cut by the ffmpeg backend")
+        return {
+            "type": CONVERT_TYPE, "input": input_file,
+            "formats": formats,
+            "dither": flag(options.get("dither")),
+            "tracks": tracks, "backend": backend,
+            "priority": job_priority(options)
+        }
+
+    def download_request(self, options: dict):
+        if not isinstance(options.get("url"), str):
+            raise ServerError(400, "Downloads need a url")
+        try:
+            bitrate = optional_number(options.get("bitrate"))
+            sample_rate = optional_number(options.get("sample_rate"))
+        except ValueError:
+            raise ServerError(400, "bitrate and sample_rate are numbers")
+        output_format = str(options.get(
+            "format", engine.DEFAULT_PROFILE.output_format
+        )).lower()
+        check_format(output_format, DOWNLOAD_FORMATS)
+        return {
+            "type": DOWNLOAD_TYPE, "url": options["url"],
+            "format": output_format,
+            "bitrate": bitrate, "sample_rate": sample_rate,
+            "playlist": flag(options.get("playlist", True)),
+            "stream": flag(options.get("stream")),
+            "split_chapters": flag(options.get("split_chapters")),
+            "priority": job_priority(options)
+        }
+
+    def input_file(self, path: str):
+        # Only files under the input directory can be named by clients
+        if self.input_directory is None:
+            raise ServerError(
+                403, "This server only converts uploaded files"
+            )
+        input_file = os.path.realpath(os.path.join(self.input_directory, path))
+        if not is_inside(
+            input_file, self.input_directory
+        ) or not os.path.isfile(input_file):
+            raise ServerError(404, f"No file {path} in the input directory")
+        return input_file
+
+    def receive_upload(self, handler, name: str, length: int):
+        upload = os.path.join(
+            self.directory, "uploads", f".{os.urandom(6).hex()}"
+        )
+        try:
+            with open(upload, "wb") as upload_file:
+                while length > 0:
+                    data = handler.rfile.read(min(length, COPY_CHUNK_SIZE))
+                    if len(data) == 0:
+                        raise ServerError(400, f"{name} was cut short")
+                    upload_file.write(data)
+                    length -= len(data)
+        except BaseException:
+            if os.path.exists(upload):
+                os.remove(upload)
+            raise
+        return upload
+
+    def handle(self, handler, method: str):
+        try:
+            self.route(handler, method)
+        except ServerError as error:
+            send_json(handler, error.status, {"error": str(error)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as error:
+            # Every request gets an answer, even one the server did not
+            # expect; a response already under way is cut short instead
+            try:
+                send_json(handler, 500, {
+                    "error": f"{type(error).__name__}: {error}"
+                })
+            except OSError:
+                pass
+
+    def client(self, handler):
+        # Limits and job ownership follow the token a request was sent
+        # with, or without tokens the address it came from; the client
+        # header cannot be used to get around them
+        if len(self.tokens) == 0:
+            return handler.client_address[0]
+        authorization = handler.headers.get("Authorization", "")
+        for token in self.tokens:
+            if hmac.compare_digest(
+                authorization.encode("utf-8"),
+                f"Bearer {token}".encode("utf-8")
+            ):
+                return "token-" + hashlib.sha256(
+                    token.encode("utf-8")
+                ).hexdigest()[:12]
+        raise ServerError(401, "A valid token is required")
+
+    def route(self, handler, method: str):
+        client = self.client(handler)
+        label = handler.headers.get(CLIENT_HEADER, "")[:MAX_LABEL_LENGTH]
+        url = urlsplit(handler.path)
+        if url.path == "/" and method == "GET":
+            send_json(handler, 200, self.status())
+            return
+        match = ROUTE.match(url.path)
+        if match is None:
+            raise ServerError(404, f"No resource {url.path}")
+        job_id, resource, file_name = match.groups()
+        if job_id is None:
+            if method == "GET":
+                send_json(handler, 200, {"jobs": [
+                    self.describe(job["id"])
+                    for job in self.store.list(client, label or None)
+                ]})
+                return
+            if method == "POST":
+                job_id = self.post_job(handler, client, label, url.query)
+                send_json(
+                    handler, 201, self.describe(job_id),
+                    {"Location": f"/jobs/{job_id}"}
+                )
+                return
+            raise ServerError(405, f"{method} is not supported here")
+        job_id = int(job_id)
+        job = self.store.get(job_id)
+        # Other clients' jobs are not found, rather than forbidden
+        if job is None or job["client"] != client:
+            raise ServerError(404, f"No job {job_id}")
+        if method == "DELETE" and resource is None:
+            if self.cancel(job_id):
+                handler.send_response(204)
+                handler.end_headers()
+            else:
+                # Running jobs finish cancelling in the background
+                job = self.describe(job_id)
+                send_json(
+                    handler, 200 if job["status"] in FINISHED_STATUSES
+                    else 202, job
+                )
+            return
+        if method != "GET":
+            raise ServerError(405, f"{method} is not supported here")
+        if resource is None:
+            send_json(handler, 200, self.describe(job_id))
+        elif resource == "events":
+            self.send_events(handler, job_id)
+        elif file_name is None:
+            send_json(handler, 200, {"files": self.files(job_id)})
+        else:
+            self.send_file(handler, job_id, unquote(file_name))
+
+    def post_job(self, handler, client: str, label: str, query: str):
+        header = handler.headers.get("Content-Length")
+        if header is None:
+            raise ServerError(411, "Requests need a Content-Length")
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ServerError(400, f"Content-Length {header} is not valid")
+        content_type = handler.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip() == "application/json":
+            if length > MAX_REQUEST_BYTES:
+                raise ServerError(413, "The request is too large")
+            try:
+                options = json.loads(handler.rfile.read(length))
+            except ValueError:
+                raise ServerError(400, "The request is not valid JSON")
+            if not isinstance(options, dict):
+                raise ServerError(400, "The request is not a JSON object")
+            if options.get("type", CONVERT_TYPE) == DOWNLOAD_TYPE:
+                return self.submit(
+                    client, label, self.download_request(options)
+                )
+            if not isinstance(options.get("input"), str):
+                raise ServerError(400, "Conversions need an input")
+            return self.submit(client, label, self.convert_request(
+                options, self.input_file(options["input"])
+            ))
+        # Any other body is the file to convert, described by the query
+        options = {
+            key: values[-1] for key, values in parse_qs(query).items()
+        }
+        name = os.path.basename(options.get("name", "")).lstrip(".")
+        try:
+            if name == "":
+                raise ServerError(400, "Uploads need a file name")
+            request = self.convert_request(options, name)
+            self.check_client(client)
+        except ServerError:
+            # Read past the upload, so that the client sees the answer
+            # instead of a connection closed while it sends
+            discard_body(handler, length)
+            raise
+        upload = self.receive_upload(handler, name, length)
+        try:
+            return self.submit(client, label, request, upload)
+        finally:
+            if os.path.exists(upload):
+                os.remove(upload)
+
+    def send_events(self, handler, job_id: int):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        version = None
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.versions.get(job_id, 0) != version
+                    or self.closing, KEEPALIVE_SECONDS
+                )
+                if self.closing:
+                    return
+                latest = self.versions.get(job_id, 0)
+            if latest == version:
+                handler.wfile.write(b": keep-alive\n\n")
+                handler.wfile.flush()
+                continue
+            version = latest
+            job = self.describe(job_id)
+            if job is None:
+                return
+            handler.wfile.write((
+                f"id: {version}\nevent: {job['status']}\n"
+                + f"data: {json.dumps(job)}\n\n"
+            ).encode("utf-8"))
+            handler.wfile.flush()
+            if job["status"] in FINISHED_STATUSES:
+                return
+
+    def send_file(self, handler, job_id: int, name: str):
+        output_directory = self.job_directory(job_id, "output")
+        path = os.path.realpath(os.path.join(output_directory, name))
+        if not is_inside(path, output_directory) or not os.path.isfile(path):
+            raise ServerError(404, f"No file {name} in job {job_id}")
+        handler.send_response(200)
+        handler.send_header(
+            "Content-Type",
+            mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+        handler.send_header("Content-Length", str(os.path.getsize(path)))
+        handler.send_header(
+            "Content-Disposition",
+            f"attachment; filename*=UTF-8''{quote(os.path.basename(path))}"
+        )
+        handler.end_headers()
+        with open(path, "rb") as output_file:
+            shutil.copyfileobj(output_file, handler.wfile, COPY_CHUNK_SIZE)
+
+
+def check_format(output_format: str, output_formats: tuple):
+    if output_format not in output_formats:
+        raise ServerError(
+            400, f"Unknown format {output_format}, expected one of "
+            + ", ".join(output_formats)
+        )
+
+
+def is_inside(path: str, directory: str):
+    directory = os.path.realpath(directory)
+    return os.path.commonpath(
+        [os.path.realpath(path), directory]
+    ) == directory
+
+
+def discard_body(handler, length: int):
+    while length > 0:
+        data = handler.rfile.read(min(length, COPY_CHUNK_SIZE))
+        if len(data) == 0:
+            return
+        length -= len(data)
+
+
+def flag(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def optional_number(value):
+    return None if value in (None, "") else int(value)
+
+
+def job_priority(options: dict):
+    try:
+        priority = optional_number(options.get("priority"))
+    except (TypeError, ValueError):
+        raise ServerError(400, "priority is a number")
+    return scheduler.DEFAULT_PRIORITY if priority is None else priority
+
+
+def send_json(handler, status: int, body: dict, headers: dict = None):
+    data = json.dumps(body).encode("utf-8")
+    handler.send_response(status)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
@@ -0,0 +1,393 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from audiomorph import downloads, engine, ingest, scheduler
+from audiomorph.config import AUDIO_FORMATS, CACHE_DIRECTORY, DEFAULT_WORKERS
+
+#----------------------------------------------------------------------#------#
+
+WATCH_STATE_PATH = os.path.join(CACHE_DIRECTORY, "watch.sqlite3")
+# A file counts as written once its size and modification time have held
+# still this long
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 5.0
+CONVERTED_STATUS = "converted"
+FAILED_STATUS = "failed"
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+EVENT_BUFFER_SIZE = 64 * 1024
+
+
+class WatchError(Exception):
+    pass
+
+
+class WatchState:
+    def __init__(self, path: str = WATCH_STATE_PATH):
+        self.lock = threading.Lock()
+        self.connection = downloads.connect(path)
+        with self.lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    processed REAL NOT NULL,
+                    PRIMARY KEY (path, target)
+                )
+            """)
+
+    def is_current(self, path: str, target: str, stat: os.stat_result):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM files WHERE path = ? AND target = ? "
+                + "AND size = ? AND mtime = ?",
+                (path, target, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        return row is not None
+
+    def put(
+        self, path: str, target: str, stat: os.stat_result, status: str
+    ):
+        # Failures are recorded too, so a broken file is only tried again
+        # once it changes
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    path, target, stat.st_size, stat.st_mtime_ns, status,
+                    time.time()
+                )
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM files")
+
+
+class InotifySource:
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self.descriptor = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.directories = {}
+
+    def add(self, directory: str):
+        # Subdirectories are watched too, except those walk_directory
+        # skips; one that is gone by the time it is reached is left out
+        pending = [directory]
+        while len(pending) > 0:
+            path = pending.pop()
+            watch = self.libc.inotify_add_watch(
+                self.descriptor, os.fsencode(path), WATCH_MASK
+            )
+            if watch < 0:
+                if path == directory:
+                    error = ctypes.get_errno()
+                    raise OSError(error, os.strerror(error), directory)
+                continue
+            self.directories[watch] = path
+            try:
+                with os.scandir(path) as entries:
+                    pending.extend(
+                        entry.path for entry in entries
+                        if not entry.name.startswith(".")
+                        and entry.is_dir(follow_symlinks=False)
+                    )
+            except OSError:
+                continue
+
+    def read(self, timeout: float):
+        # Returns the paths that changed, or None when the kernel dropped
+        # events and every directory has to be scanned again
+        readable, _, _ = select.select([self.descriptor], [], [], timeout)
+        if len(readable) == 0:
+            return []
+        try:
+            data = os.read(self.descriptor, EVENT_BUFFER_SIZE)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset < len(data):
+            watch, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                # The directory was removed
+                self.directories.pop(watch, None)
+                continue
+            if watch not in self.directories or len(name) == 0:
+                continue
+            path = os.path.join(self.directories[watch], os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith(
+                    b"."
+                ):
+                    # Files can land in a new directory before its watch
+                    # does, and a moved one arrives full
+                    self.add(path)
+                    paths.extend(ingest.walk_directory(path))
+                continue
+            paths.append(path)
+        return paths
+
+    def close(self):
+        if self.descriptor >= 0:
+            os.close(self.descriptor)
+            self.descriptor = -1
+
+
+class PollingSource:
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self.next_scan = time.monotonic() + interval
+
+    def add(self, directory: str):
+        pass
+
+    def read(self, timeout: float):
+        now = time.monotonic()
+        if now + timeout < self.next_scan:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(self.next_scan - now, 0))
+        self.next_scan = time.monotonic() + self.interval
+        return None
+
+    def close(self):
+        pass
+
+
+def open_source(
+    polling: bool = False, interval: float = DEFAULT_POLL_INTERVAL
+):
+    if not polling:
+        try:
+            return InotifySource()
+        except (OSError, AttributeError):
+            pass
+    return PollingSource(interval)
+
+
+class Watcher:
+    def __init__(
+        self, directories: list, output_directory: str, output_formats: list,
+        workers: int = DEFAULT_WORKERS,
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+        polling: bool = False, interval: float = DEFAULT_POLL_INTERVAL,
+        use_cache: bool = True, dither: bool = False, backend: str = None,
+        report: callable = print, state: WatchState = None,
+        priority: int = scheduler.DEFAULT_PRIORITY
+    ):
+        self.directories = [
+            os.path.abspath(directory) for directory in directories
+        ]
+        self.output_directory = os.path.abspath(output_directory)
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                raise WatchError(f"{directory} is not a directory")
+            if os.path.commonpath(
+                [directory, self.output_directory]
+            ) == directory:
+                # Every output would show up as a new input
+                raise WatchError(
+                    f"Outputs cannot be written inside the watched {directory}"
+                )
+        self.output_formats = output_formats
+        self.workers = workers
+        self.settle_seconds = settle_seconds
+        self.use_cache = use_cache
+        self.dither = dither
+        self.backend = backend
+        self.priority = priority
+        self.report = report
+        self.state = state or WatchState()
+        # Outputs written elsewhere or in other formats are new work
+        self.target = "|".join([self.output_directory, *output_formats])
+        self.source = open_source(polling, interval)
+        for directory in self.directories:
+            self.source.add(directory)
+        self.pending = {}
+        self.converting = {}
+        # Signatures already in the state, so rescans stay in memory
+        self.known = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.scheduler = scheduler.Scheduler(workers)
+
+    def is_candidate(self, path: str):
+        name = os.path.basename(path)
+        # Hidden names cover partial files, ours included
+        return (
+            not name.startswith(".")
+            and os.path.splitext(name)[1][1:].lower() in AUDIO_FORMATS
+        )
+
+    def scan(self):
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                self.report(f"Could not scan {directory}: it is gone")
+                continue
+            for path in ingest.walk_directory(directory):
+                if self.is_candidate(path):
+                    self.check(path)
+
+    def target_directory(self, path: str):
+        # Files keep their place below the watched directory they are in,
+        # the innermost one when watched directories are nested
+        directory = os.path.dirname(path)
+        for root in sorted(self.directories, key=len, reverse=True):
+            if os.path.commonpath([root, directory]) == root:
+                return os.path.normpath(os.path.join(
+                    self.output_directory, os.path.relpath(directory, root)
+                ))
+        return self.output_directory
+
+    def check(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            known = self.known.get(path) == signature
+        if known or self.state.is_current(path, self.target, stat):
+            with self.lock:
+                self.known[path] = signature
+            self.pending.pop(path, None)
+            return
+        if path not in self.pending or self.pending[path][0] != signature:
+            self.pending[path] = (signature, time.monotonic())
+
+    def settled(self):
+        # Pending files are checked again before they count as written,
+        # which also catches writers that inotify does not report
+        now = time.monotonic()
+        ready = []
+        for path in list(self.pending):
+            self.check(path)
+            if path not in self.pending:
+                continue
+            if now - self.pending[path][1] < self.settle_seconds:
+                continue
+            with self.lock:
+                if path in self.converting:
+                    continue
+            ready.append(path)
+        return ready
+
+    def next_timeout(self):
+        if len(self.pending) == 0:
+            return self.settle_seconds
+        now = time.monotonic()
+        return max(min(
+            changed + self.settle_seconds - now
+            for _, changed in self.pending.values()
+        ), 0.1)
+
+    def submit(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        del self.pending[path]
+        output_directory = self.target_directory(path)
+        try:
+            os.makedirs(output_directory, exist_ok=True)
+        except OSError as error:
+            self.report(f"FAILED {path}: {error}")
+            return
+        output_files = [
+            engine.output_path(path, output_directory, output_format)
+            for output_format in self.output_formats
+        ]
+        with self.lock:
+            self.converting[path] = stat
+
+        def complete(result):
+            with self.lock:
+                self.converting.pop(path, None)
+            if isinstance(result, scheduler.JobCancelled):
+                return
+            status = FAILED_STATUS
+            if not isinstance(result, Exception):
+                status = CONVERTED_STATUS
+            self.state.put(path, self.target, stat, status)
+            with self.lock:
+                self.known[path] = (stat.st_size, stat.st_mtime_ns)
+            if isinstance(result, Exception):
+                self.report(f"FAILED {path}: {result}")
+                return
+            outputs = ", ".join(output.output_file for output in result)
+            self.report(f"{path} -> {outputs} ({result[0].elapsed:.2f}s)")
+
+        self.scheduler.submit(
+            scheduler.conversion(
+                path, output_files, self.use_cache, self.dither, self.backend
+            ), self.priority, complete=complete
+        )
+
+    def idle(self):
+        with self.lock:
+            return len(self.pending) == 0 and len(self.converting) == 0
+
+    def run(self, once: bool = False):
+        # With once, only the files changed since the last run are
+        # converted before returning
+        os.makedirs(self.output_directory, exist_ok=True)
+        self.scheduler.start()
+        # Stopping, or Ctrl+C, kills running conversions; they are not
+        # recorded, so the next run picks them up again
+        cancel = True
+        try:
+            self.scan()
+            while not self.stopped.is_set():
+                for path in self.settled():
+                    self.submit(path)
+                if once and self.idle():
+                    cancel = False
+                    break
+                paths = self.source.read(self.next_timeout())
+                if paths is None:
+                    self.scan()
+                    continue
+                for path in paths:
+                    if self.is_candidate(path):
+                        self.check(path)
+        finally:
+            self.scheduler.shutdown(cancel=cancel)
+            self.source.close()
+
+    def stop(self):
+        self.stopped.set()
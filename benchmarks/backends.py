@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import backends, conformance, engine
+
+#----------------------------------------------------------------------#------#
+
+def time_backend(
+    name: str, source_files: list, output_formats: list, workers: int,
+    directory: str
+):
+    jobs = [
+        (source_file, [
+            engine.output_path(source_file, directory, f"{name}.{extension}")
+            for extension in output_formats
+        ])
+        for source_file in source_files
+    ]
+    start_time = time.perf_counter()
+    results = engine.convert_batch(
+        jobs, workers=workers, use_cache=False, backend=name
+    )
+    elapsed = time.perf_counter() - start_time
+    failures = [result for result in results if isinstance(result, Exception)]
+    if len(failures) > 0:
+        raise failures[0]
+    return elapsed
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Compare how fast each backend converts a batch of "
+        + "short files, where starting FFmpeg dominates."
+    )
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seconds", type=int, default=1)
+    parser.add_argument("--formats", default="flac,mp3")
+    parser.add_argument("--workers", type=int, default=1)
+    arguments = parser.parse_args(argv)
+    output_formats = engine.parse_formats(arguments.formats)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source_files = [
+            conformance.write_tone(
+                os.path.join(directory, f"source{number}.wav"),
+                arguments.seconds
+            )
+            for number in range(arguments.files)
+        ]
+        for name in backends.available_backends():
+            elapsed = time_backend(
+                name, source_files, output_formats, arguments.workers,
+                directory
+            )
+            print(
+                f"{name:>7}: {arguments.files} x {arguments.seconds}s WAV -> "
+                + f"{','.join(output_formats)} in {elapsed:.2f}s "
+                + f"({arguments.files / elapsed:.1f} files/s)"
+            )
+    return 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
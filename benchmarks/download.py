@@ -0,0 +1,143 @@
+import argparse
+import functools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import engine
+from audiomorph.config import FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+SOURCE_NAME = "source.webm"
+SAMPLE_INTERVAL = 0.005
+
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    bandwidth = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        start_time = time.perf_counter()
+        sent_bytes = 0
+        while chunk := source.read(64 * 1024):
+            try:
+                outputfile.write(chunk)
+            except ConnectionError:
+                # The extractor only sniffs the start of the file
+                return
+            sent_bytes += len(chunk)
+            delay = sent_bytes / self.bandwidth - (
+                time.perf_counter() - start_time
+            )
+            if delay > 0:
+                time.sleep(delay)
+
+
+def make_source(directory: str, seconds: float):
+    source_file = os.path.join(directory, SOURCE_NAME)
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            f"anoisesrc=d={seconds}:c=pink:a=0.3", "-ac", "2", "-c:a",
+            "libopus", "-b:a", "160k", source_file
+        ], check=True
+    )
+    return source_file
+
+
+def directory_size(directory: str):
+    size = 0
+    for entry in os.scandir(directory):
+        try:
+            size += entry.stat().st_size
+        except OSError:
+            pass
+    return size
+
+
+def measure(url: str, output_format: str, streaming: bool):
+    with tempfile.TemporaryDirectory() as directory:
+        peak = 0
+        stopping = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not stopping.wait(SAMPLE_INTERVAL):
+                peak = max(peak, directory_size(directory))
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        start_time = time.perf_counter()
+        try:
+            engine.download(
+                url, os.path.join(directory, "output"),
+                engine.OutputProfile(output_format),
+                streaming=streaming
+            )
+        finally:
+            elapsed = time.perf_counter() - start_time
+            stopping.set()
+            sampler.join()
+        return elapsed, max(peak, directory_size(directory))
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Compare time to finished file and peak disk usage of "
+        + "download-then-convert against streaming into FFmpeg."
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=600.0,
+        help="Duration of the generated source audio."
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, default=4.0,
+        help="Simulated network bandwidth in MB/s."
+    )
+    parser.add_argument("--format", default="flac")
+    parser.add_argument("--runs", type=int, default=3)
+    arguments = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as serve_directory:
+        source_file = make_source(serve_directory, arguments.seconds)
+        ThrottledHandler.bandwidth = arguments.bandwidth * 1000000
+        server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(
+            ThrottledHandler, directory=serve_directory
+        ))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/{SOURCE_NAME}"
+        print(
+            f"Source: {arguments.seconds:.0f}s, "
+            + f"{os.path.getsize(source_file) / 1e6:.1f} MB at "
+            + f"{arguments.bandwidth:.1f} MB/s -> {arguments.format}"
+        )
+        print(f"{'mode':>9} {'finished file':>14} {'peak disk':>10}")
+        for streaming in (False, True):
+            samples = [
+                measure(url, arguments.format, streaming)
+                for _ in range(arguments.runs)
+            ]
+            elapsed = statistics.median(sample[0] for sample in samples)
+            peak = max(sample[1] for sample in samples)
+            print(
+                f"{'stream' if streaming else 'download':>9} "
+                + f"{elapsed:>13.2f}s {peak / 1e6:>7.1f} MB"
+            )
+        server.shutdown()
+    return 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import engine
+from audiomorph.config import FFMPEG_PATH, FFPROBE_PATH
+
+#----------------------------------------------------------------------#------#
+
+SOURCES = [
+    ("wav", "pcm_u8", 2, 44100),
+    ("wav", "pcm_s16le", 1, 44100),
+    ("wav", "pcm_s24le", 2, 48000),
+    ("wav", "pcm_s24le", 1, 96000),
+    ("wav", "pcm_s32le", 6, 48000),
+    ("wav", "pcm_f32le", 2, 44100),
+    ("wav", "pcm_f64le", 2, 22050),
+    ("aiff", "pcm_s8", 1, 8000),
+    ("aiff", "pcm_s16be", 2, 44100),
+    ("aiff", "pcm_s24be", 2, 88200),
+    ("aiff", "pcm_s32be", 1, 48000),
+    ("aiff", "pcm_s16le", 2, 44100),
+]
+OUTPUT_FORMATS = ("wav", "aiff")
+
+
+def make_source(
+    directory: str, name: str, codec: str, channels: int, sample_rate: int,
+    seconds: float
+):
+    source_file = os.path.join(directory, name)
+    # Loud enough that float sources clip, with an odd number of frames
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            f"anoisesrc=d={seconds}:c=pink:a=1:r={sample_rate}",
+            "-af", "volume=1.5", "-ac", str(channels), "-frames:a",
+            str(int(seconds * sample_rate) | 1), "-c:a", codec, source_file
+        ], check=True
+    )
+    return source_file
+
+
+def convert_ffmpeg(input_file: str, output_file: str):
+    plan = engine.plan_conversion(input_file, [output_file], False)
+    engine.finish_conversion(
+        plan, engine.run_ffmpeg(plan.arguments, plan.duration)
+    )
+
+
+def describe(path: str):
+    stream = subprocess.run([
+            FFPROBE_PATH, "-v", "error", "-select_streams", "a:0",
+            "-show_entries", "stream=codec_name,sample_rate,channels",
+            "-of", "csv=p=0", path
+        ], stdout=subprocess.PIPE, text=True, check=True
+    ).stdout.strip()
+    samples = subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-i", path, "-map", "0:a", "-c",
+            "copy", "-f", "md5", "-"
+        ], stdout=subprocess.PIPE, text=True, check=True
+    ).stdout.strip()
+    return stream, samples
+
+
+def check_matrix(directory: str):
+    failures = 0
+    for number, (container, codec, channels, sample_rate) in enumerate(
+        SOURCES
+    ):
+        source_file = make_source(
+            directory, f"source{number}.{container}", codec, channels,
+            sample_rate, 0.5
+        )
+        for output_format in OUTPUT_FORMATS:
+            native_file = os.path.join(
+                directory, f"native{number}.{output_format}"
+            )
+            ffmpeg_file = os.path.join(
+                directory, f"ffmpeg{number}.{output_format}"
+            )
+            results = engine.convert_native(source_file, [native_file])
+            convert_ffmpeg(source_file, ffmpeg_file)
+            if results is None:
+                status = "FFmpeg only"
+            elif describe(native_file) == describe(ffmpeg_file):
+                status = f"bit-exact ({results[0].mode})"
+            else:
+                status = "DIFFERENT"
+                failures += 1
+            print(
+                f"{container:>4} {codec:>9} {channels}ch {sample_rate:>5} -> "
+                + f"{output_format:<4} {describe(ffmpeg_file)[0]:<21} "
+                + status
+            )
+    return failures
+
+
+def time_batch(directory: str, files: int, seconds: float):
+    source_files = [
+        make_source(
+            directory, f"batch{number}.wav", "pcm_s24le", 2, 48000, seconds
+        )
+        for number in range(files)
+    ]
+    for name, convert in (
+        ("ffmpeg", convert_ffmpeg),
+        ("native", lambda input_file, output_file: engine.convert_native(
+            input_file, [output_file]
+        )),
+    ):
+        start_time = time.perf_counter()
+        for source_file in source_files:
+            convert(source_file, os.path.splitext(source_file)[0] + ".aiff")
+        elapsed = time.perf_counter() - start_time
+        print(
+            f"{name:>7}: {files} x {seconds:g}s 24-bit WAV -> AIFF in "
+            + f"{elapsed:.2f}s ({files / elapsed:.1f} files/s)"
+        )
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Check the in-process PCM path against FFmpeg and "
+        + "compare their speed on small files."
+    )
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    arguments = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = check_matrix(directory)
+        time_batch(directory, arguments.files, arguments.seconds)
+    return 1 if failures > 0 else 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import engine, peaks, probe
+from audiomorph.config import FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+VIEWS = 50
+
+
+def make_source(path: str, seconds: int):
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            f"anoisesrc=d={seconds}:c=pink:a=0.5:r=44100", "-ac", "2", path
+        ], check=True
+    )
+    return path
+
+
+def decode_whole(input_file: str):
+    import numpy
+
+    # The naive preview: every sample in memory, reduced on each view
+    output = subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-i", input_file,
+            *peaks.PCM_ARGUMENTS, "pipe:1"
+        ], stdout=subprocess.PIPE, check=True
+    ).stdout
+    return numpy.frombuffer(output, "<f4")
+
+
+def view_samples(samples, start: int, end: int, width: int):
+    columns = samples[start:end - (end - start) % width].reshape(width, -1)
+    return columns.min(axis=1), columns.max(axis=1)
+
+
+def time_views(view: callable, duration: float, width: int):
+    # Zooms in from the whole file to a second, around its middle
+    start_time = time.perf_counter()
+    for step in range(VIEWS):
+        span = duration * (1 / duration) ** (step / (VIEWS - 1))
+        view(duration / 2 - span / 2, duration / 2 + span / 2, width)
+    return (time.perf_counter() - start_time) / VIEWS
+
+
+def time_conversion(input_file: str, output_file: str, tap: bool):
+    cache = peaks.get_default_cache()
+    cache.tap_conversions = tap
+    cache.clear()
+    start_time = time.perf_counter()
+    engine.convert(input_file, output_file, use_cache=False)
+    return time.perf_counter() - start_time
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Compare previews from a decode of the whole file with "
+        + "the peak pyramid, and time conversions that store peaks."
+    )
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--source", default="flac")
+    parser.add_argument("--width", type=int, default=1000)
+    arguments = parser.parse_args(argv)
+    seconds = arguments.minutes * 60
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Conversions store their peaks here too
+        cache = peaks.default_cache = peaks.PeakCache(
+            os.path.join(directory, "peaks")
+        )
+        source_file = make_source(
+            os.path.join(directory, f"source.{arguments.source}"), seconds
+        )
+        info = probe.run_ffprobe(source_file)
+
+        start_time = time.perf_counter()
+        samples = decode_whole(source_file)
+        decode_seconds = time.perf_counter() - start_time
+        channels = info.channels
+
+        def naive_view(start: float, end: float, width: int):
+            view_samples(
+                samples, int(start * info.sample_rate) * channels,
+                int(end * info.sample_rate) * channels, width
+            )
+
+        naive_seconds = time_views(naive_view, seconds, arguments.width)
+        print(
+            f"{'whole decode':>16}: first view after {decode_seconds:.2f}s, "
+            + f"{samples.nbytes / 1048576:.0f} MB held, "
+            + f"{naive_seconds * 1000:.2f} ms per view"
+        )
+        del samples
+
+        start_time = time.perf_counter()
+        pyramid = cache.load(source_file)
+        build_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        pyramid = cache.load(source_file)
+        open_seconds = time.perf_counter() - start_time
+        pyramid_seconds = time_views(pyramid.view, seconds, arguments.width)
+        print(
+            f"{'peak pyramid':>16}: first view after {build_seconds:.2f}s, "
+            + f"{os.path.getsize(pyramid.path) / 1048576:.1f} MB on disk, "
+            + f"{open_seconds * 1000:.2f} ms to open again, "
+            + f"{pyramid_seconds * 1000:.2f} ms per view"
+        )
+
+        output_file = os.path.join(directory, "output.mp3")
+        plain_seconds = time_conversion(source_file, output_file, False)
+        tapped_seconds = time_conversion(source_file, output_file, True)
+        print(
+            f"{'conversion':>16}: {plain_seconds:.2f}s to mp3, "
+            + f"{tapped_seconds:.2f}s storing peaks on the way"
+        )
+    return 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
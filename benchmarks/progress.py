@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+
+from audiomorph import events
+
+#----------------------------------------------------------------------#------#
+
+class Receiver(QObject):
+    progress = pyqtSignal(int, int)
+    progress_events = pyqtSignal(list)
+
+    def __init__(self):
+        super().__init__()
+        self.percentages = {}
+        self.deliveries = 0
+        self.progress.connect(self.on_progress)
+        self.progress_events.connect(self.on_progress_events)
+
+    def show_status(self):
+        # Stands in for repainting the progress bar and status bar
+        return " | ".join(
+            f"{job} {percent}%" for job, percent in self.percentages.items()
+        )
+
+    def on_progress(self, job: int, percent: int):
+        self.deliveries += 1
+        self.percentages[job] = percent
+        self.show_status()
+
+    def on_progress_events(self, progress_events: list):
+        self.deliveries += 1
+        for event in progress_events:
+            self.percentages[event.job] = event.percent
+        self.show_status()
+
+
+def run_jobs(
+    application: QCoreApplication, jobs: int, rate: float, seconds: float,
+    use_bus: bool
+):
+    receiver = Receiver()
+    bus = events.ProgressBus()
+    if use_bus:
+        bus.subscribe(receiver.progress_events.emit)
+        publish = bus.publish
+        bus.start()
+    else:
+        publish = receiver.progress.emit
+    stopping = threading.Event()
+
+    def job(index: int):
+        percent = 0
+        while not stopping.wait(1 / rate):
+            percent = (percent + 1) % 100
+            publish(index, percent)
+
+    threads = [
+        threading.Thread(target=job, args=(index,)) for index in range(jobs)
+    ]
+    for thread in threads:
+        thread.start()
+    QTimer.singleShot(int(seconds * 1000), application.quit)
+    start_cpu = time.thread_time()
+    start_time = time.perf_counter()
+    application.exec()
+    elapsed = time.perf_counter() - start_time
+    cpu = time.thread_time() - start_cpu
+    stopping.set()
+    for thread in threads:
+        thread.join()
+    if use_bus:
+        bus.stop()
+    application.processEvents()
+    return receiver.deliveries / elapsed, cpu / elapsed
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Measure GUI thread load from progress updates."
+    )
+    parser.add_argument(
+        "--jobs", default="1,4,16,64,256",
+        help="Comma separated numbers of concurrent jobs."
+    )
+    parser.add_argument(
+        "--rate", type=float, default=20.0,
+        help="Updates per second per job (FFmpeg -stats_period 0.05)."
+    )
+    parser.add_argument("--seconds", type=float, default=3.0)
+    arguments = parser.parse_args(argv)
+
+    application = QCoreApplication(sys.argv[:1])
+    print(
+        f"{'jobs':>5} {'mode':>6} {'deliveries/s':>13} "
+        + f"{'GUI thread CPU':>15}"
+    )
+    for jobs in map(int, arguments.jobs.split(",")):
+        for use_bus in (False, True):
+            deliveries, load = run_jobs(
+                application, jobs, arguments.rate, arguments.seconds,
+                use_bus
+            )
+            print(
+                f"{jobs:>5} {'bus' if use_bus else 'direct':>6} "
+                + f"{deliveries:>13.1f} {load * 100:>14.1f}%"
+            )
+    return 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
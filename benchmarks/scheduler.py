@@ -0,0 +1,99 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import engine, scheduler
+
+#----------------------------------------------------------------------#------#
+
+def source_arguments(seconds: float):
+    return [
+        "-re", "-f", "lavfi", "-i", f"sine=d={seconds}:sample_rate=48000",
+        "-f", "null", "-"
+    ]
+
+
+def ffmpeg_processes():
+    result = subprocess.run(
+        ["pgrep", "-c", "-x", "ffmpeg"], stdout=subprocess.PIPE, text=True
+    )
+    return int(result.stdout.strip() or 0)
+
+
+def run_threads(jobs: int, workers: int, seconds: float):
+    # One thread per job, the way each job used to get its own QThread
+    slots = threading.Semaphore(workers)
+    stopping = threading.Event()
+
+    def job():
+        with slots:
+            if not stopping.is_set():
+                engine.run_ffmpeg(source_arguments(seconds), seconds)
+
+    threads = [threading.Thread(target=job) for _ in range(jobs)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds / 2)
+    peak_threads = threading.active_count()
+    start_time = time.perf_counter()
+    stopping.set()
+    for thread in threads:
+        thread.join()
+    # Running FFmpeg processes can only be waited for
+    return peak_threads, time.perf_counter() - start_time
+
+
+def run_scheduler(jobs: int, workers: int, seconds: float):
+    def job():
+        async def run(progress: callable):
+            return await scheduler.run_ffmpeg(
+                source_arguments(seconds), seconds, progress
+            )
+        return run
+
+    job_scheduler = scheduler.Scheduler(workers, max_pending=jobs)
+    job_scheduler.start()
+    for _ in range(jobs):
+        job_scheduler.submit(job())
+    time.sleep(seconds / 2)
+    peak_threads = threading.active_count()
+    start_time = time.perf_counter()
+    job_scheduler.shutdown(cancel=True)
+    return peak_threads, time.perf_counter() - start_time
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Compare threads held by queued jobs and the time to "
+        + "cancel a batch for thread-per-job and the asyncio scheduler."
+    )
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--seconds", type=float, default=2.0,
+        help="Length of the audio each FFmpeg job generates in real time."
+    )
+    arguments = parser.parse_args(argv)
+
+    print(f"{'mode':>9} {'threads':>8} {'cancel all':>11} {'left over':>10}")
+    for name, run in (("threads", run_threads), ("scheduler", run_scheduler)):
+        peak_threads, cancel_time = run(
+            arguments.jobs, arguments.workers, arguments.seconds
+        )
+        print(
+            f"{name:>9} {peak_threads:>8} {cancel_time:>10.3f}s "
+            + f"{ffmpeg_processes():>10}"
+        )
+    return 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
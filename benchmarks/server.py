@@ -0,0 +1,205 @@
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import server
+from audiomorph.config import DEFAULT_WORKERS, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+def make_source(path: str, seconds: int):
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            f"anoisesrc=d={seconds}:c=pink:a=0.5:r=44100", "-ac", "2", path
+        ], check=True
+    )
+    return path
+
+
+def request(port: int, token: str, method: str, path: str, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    connection.request(
+        method, path, body, {"Authorization": f"Bearer {token}"}
+    )
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+
+def upload(port: int, token: str, input_file: str, output_format: str):
+    with open(input_file, "rb") as source:
+        status, data = request(
+            port, token, "POST",
+            f"/jobs?format={output_format}"
+            + f"&name={os.path.basename(input_file)}", source.read()
+        )
+    if status != 201:
+        raise RuntimeError(f"Upload failed with {status}: {data}")
+    return json.loads(data)["id"]
+
+
+def follow(port: int, token: str, job_id: int):
+    # Reads the job's event stream until it finishes
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    connection.request(
+        "GET", f"/jobs/{job_id}/events",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    response = connection.getresponse()
+    events = 0
+    job = None
+    for line in response:
+        if line.startswith(b"data: "):
+            events += 1
+            job = json.loads(line[6:])
+    connection.close()
+    return job, events
+
+
+def fetch_files(port: int, token: str, job: dict):
+    total = 0
+    for output in job.get("files", []):
+        status, data = request(port, token, "GET", output["url"])
+        if status != 200 or len(data) != output["size"]:
+            raise RuntimeError(f"Could not fetch {output['url']}")
+        total += len(data)
+    return total
+
+
+def most_running(jobs: list):
+    # The most jobs of one client whose runs overlapped
+    moments = sorted(
+        [(job["started"], 1) for job in jobs]
+        + [(job["finished"], -1) for job in jobs]
+    )
+    running = most = 0
+    for _, change in moments:
+        running += change
+        most = max(most, running)
+    return most
+
+
+def run_clients(
+    port: int, tokens: list, source_files: list, output_format: str
+):
+    finished = []
+    lock = threading.Lock()
+
+    def run_client(token: str):
+        job_ids = [
+            upload(port, token, source_file, output_format)
+            for source_file in source_files
+        ]
+        for job_id in job_ids:
+            job, events = follow(port, token, job_id)
+            size = fetch_files(port, token, job)
+            with lock:
+                finished.append((job["client"], job, events, size))
+
+    threads = [
+        threading.Thread(target=run_client, args=(token,))
+        for token in tokens
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return finished
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Submit conversions to a job server on localhost from "
+        + "several clients, follow them and fetch their results, then "
+        + "check that queued jobs survive a restart."
+    )
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--format", default="mp3")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--per-client", type=int, default=server.DEFAULT_PER_CLIENT
+    )
+    arguments = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source_files = [
+            make_source(
+                os.path.join(directory, f"source-{number}.flac"),
+                arguments.seconds
+            )
+            for number in range(arguments.files)
+        ]
+        job_directory = os.path.join(directory, "server")
+        # Each client has its own token, as on a shared server
+        tokens = [f"client-{number}" for number in range(arguments.clients)]
+        job_server = server.JobServer(
+            job_directory, arguments.workers, arguments.per_client,
+            tokens=tokens, use_cache=False
+        )
+        port = job_server.start(0)
+        start_time = time.perf_counter()
+        finished = run_clients(
+            port, tokens, source_files, arguments.format
+        )
+        elapsed = time.perf_counter() - start_time
+        failures = [
+            job for _, job, _, _ in finished if job["status"] != "done"
+        ]
+        per_client = max(
+            most_running([
+                job for client, job, _, _ in finished if client == name
+            ])
+            for name in {client for client, _, _, _ in finished}
+        )
+        waits = [
+            job["started"] - job["submitted"] for _, job, _, _ in finished
+        ]
+        print(
+            f"{len(finished)} jobs from {arguments.clients} clients in "
+            + f"{elapsed:.2f}s ({len(finished) / elapsed:.2f} jobs/s), "
+            + f"{len(failures)} failed, "
+            + f"{sum(events for _, _, events, _ in finished)} events, "
+            + f"{sum(size for _, _, _, size in finished) / 1048576:.1f} MB "
+            + f"fetched, longest wait {max(waits):.2f}s, at most "
+            + f"{per_client} of one client's jobs at once (limit "
+            + f"{arguments.per_client})"
+        )
+
+        # Jobs still queued or running come back after a restart
+        job_ids = [
+            upload(port, tokens[0], source_file, arguments.format)
+            for source_file in source_files
+        ]
+        job_server.close()
+        job_server = server.JobServer(
+            job_directory, arguments.workers, arguments.per_client,
+            tokens=tokens, use_cache=False
+        )
+        port = job_server.start(0)
+        restarted = [
+            follow(port, tokens[0], job_id)[0] for job_id in job_ids
+        ]
+        job_server.close()
+        print(
+            f"{sum(job['status'] == 'done' for job in restarted)}/"
+            + f"{len(job_ids)} jobs queued before a restart finished after it"
+        )
+    return 0 if len(failures) == 0 else 1
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
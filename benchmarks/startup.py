@@ -0,0 +1,155 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+#----------------------------------------------------------------------#------#
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_PATH = os.path.join(REPOSITORY_PATH, "main.py")
+FIRST_PAINT_MARKER = "AUDIOMORPH_FIRST_PAINT"
+# Loaded by the first conversion, download or waveform, never by the window
+DEFERRED_MODULES = (
+    "asyncio", "http.server", "numpy", "av", "yt_dlp",
+    "audiomorph.scheduler", "audiomorph.peaks"
+)
+
+
+def benchmark_environment():
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    environment["AUDIOMORPH_STARTUP_BENCHMARK"] = "1"
+    return environment
+
+
+def parse_import_times(text: str):
+    modules = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        modules[fields[2].strip()] = int(fields[1])
+    return modules
+
+
+def import_times(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPOSITORY_PATH, env=benchmark_environment(),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    return parse_import_times(result.stderr)
+
+
+def time_to_first_paint(timeout: float, options: tuple = (), stderr=None):
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *options, MAIN_PATH], cwd=REPOSITORY_PATH,
+        env=benchmark_environment(), stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=stderr or subprocess.DEVNULL,
+        text=True
+    )
+    try:
+        for line in process.stdout:
+            if line.strip() == FIRST_PAINT_MARKER:
+                return time.perf_counter() - start_time
+            if time.perf_counter() - start_time > timeout:
+                break
+        return None
+    finally:
+        process.kill()
+        process.wait()
+
+
+def first_paint_imports(timeout: float):
+    # Everything the window imported until it was first painted, including
+    # what building it imports lazily
+    with tempfile.TemporaryFile("w+") as log:
+        if time_to_first_paint(timeout, ("-X", "importtime"), log) is None:
+            return None
+        log.seek(0)
+        return parse_import_times(log.read())
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Measure AudioMorph import time and time to first paint."
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget", type=float,
+        help="Fail when the median time to first paint exceeds this (s)."
+    )
+    parser.add_argument(
+        "--import-budget", type=float,
+        help="Fail when importing main takes longer than this (ms)."
+    )
+    parser.add_argument(
+        "--no-deferred-check", dest="deferred_check", action="store_false",
+        help="Do not fail when the window loads a module meant to be "
+        + "imported on first use."
+    )
+    parser.add_argument("--timeout", type=float, default=60.0)
+    arguments = parser.parse_args(argv)
+
+    modules = import_times("main")
+    print(f"Import time of main: {modules.get('main', 0) / 1000:.1f} ms")
+    print("Heaviest imports (cumulative):")
+    for name, cumulative_time in sorted(
+        modules.items(), key=lambda module: module[1], reverse=True
+    )[:arguments.top]:
+        print(f"  {cumulative_time / 1000:9.1f} ms  {name}")
+    failed = False
+    if (
+        arguments.import_budget is not None
+        and modules.get("main", 0) / 1000 > arguments.import_budget
+    ):
+        print(
+            f"Over import budget: {modules.get('main', 0) / 1000:.1f} ms > "
+            + f"{arguments.import_budget:.1f} ms", file=sys.stderr
+        )
+        failed = True
+
+    if arguments.deferred_check:
+        loaded = first_paint_imports(arguments.timeout)
+        if loaded is None:
+            print("The window was never painted", file=sys.stderr)
+            return 1
+        early = [name for name in DEFERRED_MODULES if name in loaded]
+        if early:
+            print(
+                "Loaded before the first paint: " + ", ".join(early),
+                file=sys.stderr
+            )
+            failed = True
+
+    samples = []
+    for _ in range(arguments.runs):
+        sample = time_to_first_paint(arguments.timeout)
+        if sample is None:
+            print("The window was never painted", file=sys.stderr)
+            return 1
+        samples.append(sample)
+    median = statistics.median(samples)
+    print(
+        f"Time to first paint: median {median * 1000:.1f} ms, "
+        + f"min {min(samples) * 1000:.1f} ms, "
+        + f"max {max(samples) * 1000:.1f} ms over {len(samples)} run(s)"
+    )
+    if arguments.budget is not None and median > arguments.budget:
+        print(
+            f"Over budget: {median:.3f}s > {arguments.budget:.3f}s",
+            file=sys.stderr
+        )
+        failed = True
+    return 1 if failed else 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:
+    # Windows: wall time and realtime factor only
+    resource = None
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import backends, engine, results
+from audiomorph.config import AUDIO_FORMATS, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+REPORT_VERSION = 1
+SOURCES = {
+    "sine": "sine=f=440:sample_rate=44100:d={seconds}",
+    "noise": "anoisesrc=c=pink:a=0.3:r=44100:d={seconds}",
+}
+DOWNLOAD_SOURCE_NAME = "source.webm"
+DOWNLOAD_FORMATS = ("flac", "mp3", engine.PASSTHROUGH_FORMAT)
+DEFAULT_THRESHOLD = 0.1
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        try:
+            super().copyfile(source, outputfile)
+        except ConnectionError:
+            # The extractor only sniffs the start of the file
+            pass
+
+
+def make_input(
+    directory: str, source: str, seconds: float, input_format: str
+):
+    input_file = os.path.join(
+        directory, f"{source}_{seconds:g}s.{input_format}"
+    )
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            SOURCES[source].format(seconds=seconds), "-ac", "2", input_file
+        ], check=True
+    )
+    return input_file
+
+
+def make_download_source(directory: str, seconds: float):
+    source_file = os.path.join(directory, DOWNLOAD_SOURCE_NAME)
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            SOURCES["noise"].format(seconds=seconds), "-ac", "2", "-c:a",
+            "libopus", "-b:a", "160k", source_file
+        ], check=True
+    )
+    return source_file
+
+
+def usage():
+    if resource is None:
+        return None
+    return (
+        resource.getrusage(resource.RUSAGE_SELF),
+        resource.getrusage(resource.RUSAGE_CHILDREN)
+    )
+
+
+def usage_difference(before, after):
+    if before is None:
+        return None, None
+    cpu = sum(
+        (end.ru_utime + end.ru_stime) - (start.ru_utime + start.ru_stime)
+        for start, end in zip(before, after)
+    )
+    # Peaks over this process and the FFmpeg processes it waited for;
+    # Linux counts kilobytes, macOS bytes
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak_rss = max(end.ru_maxrss for end in after) * scale
+    return cpu, peak_rss
+
+
+def measure(function: callable, runs: int):
+    wall_times = []
+    before = usage()
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        value = function()
+        wall_times.append(time.perf_counter() - start_time)
+    cpu, peak_rss = usage_difference(before, usage())
+    return value, {
+        "wall": statistics.median(wall_times),
+        "cpu": cpu / runs if cpu is not None else None,
+        "peak_rss": peak_rss,
+    }
+
+
+def run_task(task: dict):
+    # Runs in a fresh process, so the peak RSS is this task's alone
+    with tempfile.TemporaryDirectory() as directory:
+        if task["kind"] == "convert":
+            # Importing the backend's libraries is not part of a conversion
+            backends.get_backend(task["backend"])
+            output_file = os.path.join(
+                directory, f"output.{task['output_format']}"
+            )
+            conversion_results, metrics = measure(
+                lambda: engine.convert_many(
+                    task["input_file"], [output_file], use_cache=False,
+                    backend=task["backend"]
+                ), task["runs"]
+            )
+            metrics["mode"] = conversion_results[0].mode
+        else:
+            output_file, metrics = measure(
+                lambda: engine.download(
+                    task["url"], os.path.join(directory, "output"),
+                    engine.OutputProfile(task["output_format"]),
+                    streaming=task["mode"] == "stream", use_cache=False
+                ), task["runs"]
+            )
+        metrics["output_bytes"] = os.path.getsize(output_file)
+    return metrics
+
+
+def run_worker(task: dict, cache_directory: str):
+    environment = dict(os.environ)
+    # Keep the user's probe, result and download caches out of it
+    environment["XDG_CACHE_HOME"] = cache_directory
+    environment["LOCALAPPDATA"] = cache_directory
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker",
+            json.dumps(task)],
+        env=environment, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {"error": lines[-1] if len(lines) > 0 else "Worker failed"}
+    return json.loads(result.stdout)
+
+
+def result_key(result: dict):
+    if result["kind"] == "convert":
+        return (
+            "convert", result["backend"], result["source"],
+            result["seconds"], result["input_format"],
+            result["output_format"]
+        )
+    return ("download", result["mode"], result["output_format"])
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPOSITORY_PATH,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPOSITORY_PATH, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+    except OSError:
+        return None, None
+    return revision or None, changes != ""
+
+
+def environment_report(backend_names: list):
+    revision, dirty = git_revision()
+    return {
+        "commit": revision,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": results.get_ffmpeg_version(),
+        "backends": {
+            name: backends.get_backend(name).version()
+            for name in backend_names
+        },
+    }
+
+
+def print_result(result: dict):
+    if result["kind"] == "convert":
+        name = (
+            f"{result['backend']:>6} {result['source']:>5} "
+            + f"{result['seconds']:>5g}s {result['input_format']:>4} -> "
+            + f"{result['output_format']:<4}"
+        )
+    else:
+        name = f"{result['mode']:>8} {result['output_format']:<8}"
+    if "error" in result:
+        print(f"{name} FAILED: {result['error']}", flush=True)
+        return
+    cpu = f"{result['cpu']:.2f}s" if result["cpu"] is not None else "-"
+    rss = (
+        f"{result['peak_rss'] / 1048576:.0f} MB"
+        if result["peak_rss"] is not None else "-"
+    )
+    print(
+        f"{name} {result['wall']:>7.3f}s wall {cpu:>7} cpu {rss:>7} "
+        + f"{result['realtime']:>7.1f}x",
+        flush=True
+    )
+
+
+def run_suite(arguments):
+    backend_names = [
+        name for name in engine.parse_formats(arguments.backends)
+        if name in backends.available_backends()
+    ]
+    input_formats = engine.parse_formats(arguments.formats)
+    output_formats = input_formats
+    durations = [float(seconds) for seconds in arguments.durations.split(",")]
+    sources = engine.parse_formats(arguments.sources)
+    report = {
+        "version": REPORT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": environment_report(backend_names),
+        "settings": {
+            "formats": input_formats, "durations": durations,
+            "sources": sources, "backends": backend_names,
+            "runs": arguments.runs,
+            "download_seconds": arguments.download_seconds,
+        },
+        "results": [],
+    }
+
+    def record(result: dict, task: dict):
+        result = {**task, **result}
+        for key in ("input_file", "url", "runs"):
+            result.pop(key, None)
+        if "error" not in result:
+            result["realtime"] = result["seconds"] / max(result["wall"], 1e-9)
+        report["results"].append(result)
+        print_result(result)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_directory = os.path.join(directory, "cache")
+        for source in sources:
+            for seconds in durations:
+                for input_format in input_formats:
+                    input_file = make_input(
+                        directory, source, seconds, input_format
+                    )
+                    for backend in backend_names:
+                        for output_format in output_formats:
+                            task = {
+                                "kind": "convert", "backend": backend,
+                                "source": source, "seconds": seconds,
+                                "input_format": input_format,
+                                "output_format": output_format,
+                                "input_file": input_file,
+                                "runs": arguments.runs,
+                            }
+                            record(run_worker(task, cache_directory), task)
+
+        if arguments.download_seconds > 0:
+            serve_directory = os.path.join(directory, "serve")
+            os.makedirs(serve_directory)
+            make_download_source(serve_directory, arguments.download_seconds)
+            server = ThreadingHTTPServer(
+                ("127.0.0.1", 0),
+                functools.partial(QuietHandler, directory=serve_directory)
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = (
+                f"http://127.0.0.1:{server.server_port}/"
+                + DOWNLOAD_SOURCE_NAME
+            )
+            for mode in ("download", "stream"):
+                for output_format in DOWNLOAD_FORMATS:
+                    task = {
+                        "kind": "download", "mode": mode,
+                        "output_format": output_format,
+                        "seconds": arguments.download_seconds, "url": url,
+                        "runs": arguments.runs,
+                    }
+                    record(run_worker(task, cache_directory), task)
+            server.shutdown()
+    return report
+
+
+def compare_reports(baseline: dict, report: dict, threshold: float):
+    baseline_results = {
+        result_key(result): result for result in baseline["results"]
+        if "error" not in result
+    }
+    regressions = 0
+    print(
+        f"{baseline['environment']['commit'] or 'baseline'} -> "
+        + f"{report['environment']['commit'] or 'report'}"
+    )
+    for result in report["results"]:
+        old = baseline_results.get(result_key(result))
+        if old is None or "error" in result:
+            continue
+        ratio = result["wall"] / max(old["wall"], 1e-9)
+        if ratio > 1 + threshold:
+            status = "SLOWER"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            continue
+        print(
+            f"{status:>6} {' '.join(map(str, result_key(result)))}: "
+            + f"{old['wall']:.3f}s -> {result['wall']:.3f}s "
+            + f"({ratio:.2f}x)"
+        )
+    print(f"{regressions} result(s) slower by more than {threshold:.0%}")
+    return regressions
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Time every conversion format pair on generated audio "
+        + "and downloads from a local HTTP server, and write a JSON report "
+        + "that can be compared across commits."
+    )
+    parser.add_argument("--formats", default=",".join(AUDIO_FORMATS))
+    parser.add_argument(
+        "--durations", default="1,30",
+        help="Comma separated input durations in seconds."
+    )
+    parser.add_argument("--sources", default=",".join(SOURCES))
+    parser.add_argument(
+        "--backends", default=",".join(backends.BACKENDS),
+        help="Backends to convert with, where available."
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--download-seconds", type=float, default=60.0,
+        help="Duration of the downloaded source, 0 to skip downloads."
+    )
+    parser.add_argument("-o", "--output", help="Write the JSON report here.")
+    parser.add_argument(
+        "--report",
+        help="Compare this earlier report instead of running the suite."
+    )
+    parser.add_argument(
+        "--baseline", help="Report to compare wall times against."
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="Relative change in wall time reported as slower or faster."
+    )
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    arguments = parser.parse_args(argv)
+
+    if arguments.worker is not None:
+        print(json.dumps(run_task(json.loads(arguments.worker))))
+        return 0
+    if arguments.report is not None:
+        with open(arguments.report, "r", encoding="utf-8") as report_file:
+            report = json.load(report_file)
+    else:
+        report = run_suite(arguments)
+    if arguments.output is not None:
+        with open(arguments.output, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=1)
+    if arguments.baseline is not None:
+        with open(arguments.baseline, "r", encoding="utf-8") as report_file:
+            baseline = json.load(report_file)
+        if compare_reports(baseline, report, arguments.threshold) > 0:
+            return 1
+    failures = sum("error" in result for result in report["results"])
+    return 1 if failures > 0 else 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
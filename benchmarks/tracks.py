@@ -0,0 +1,112 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from audiomorph import chapters, engine
+from audiomorph.config import DEFAULT_WORKERS, FFMPEG_PATH
+
+#----------------------------------------------------------------------#------#
+
+def make_source(path: str, seconds: int):
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            f"anoisesrc=d={seconds}:c=pink:a=0.5:r=44100", "-ac", "2", path
+        ], check=True
+    )
+    return path
+
+
+def convert_tracks(
+    input_file: str, track_list: list, output_format: str, directory: str,
+    seek: bool
+):
+    # One conversion per track, as running the converter on each would
+    for number, chapter in enumerate(track_list, start=1):
+        output_file = os.path.join(directory, f"{number:02}.{output_format}")
+        length = f"{chapter.end - chapter.start:.6f}"
+        if seek:
+            arguments = [
+                "-ss", f"{chapter.start:.6f}", "-t", length, "-i", input_file
+            ]
+        else:
+            arguments = [
+                "-i", input_file, "-ss", f"{chapter.start:.6f}", "-t", length
+            ]
+        if engine.run_ffmpeg([*arguments, output_file], 0) != 0:
+            raise engine.ConversionError(f"Could not write {output_file}")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Compare splitting a long file into tracks in one decode "
+        + "with converting each track on its own."
+    )
+    parser.add_argument("--minutes", type=int, default=20)
+    parser.add_argument("--tracks", type=int, default=12)
+    parser.add_argument("--source", default="flac")
+    parser.add_argument("--format", default="mp3")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    arguments = parser.parse_args(argv)
+    seconds = arguments.minutes * 60
+
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = make_source(
+            os.path.join(directory, f"source.{arguments.source}"), seconds
+        )
+        track_list = chapters.finish_chapters([
+            chapters.Chapter(seconds * number / arguments.tracks)
+            for number in range(arguments.tracks)
+        ], seconds)
+        chapter_file = os.path.join(directory, "tracks.txt")
+        with open(chapter_file, "w", encoding="utf-8") as timestamps:
+            for number, chapter in enumerate(track_list, start=1):
+                minutes, second = divmod(chapter.start, 60)
+                timestamps.write(
+                    f"{int(minutes)}:{second:06.3f} Track {number}\n"
+                )
+        runs = [
+            ("per track, decoding from the start", lambda output: (
+                convert_tracks(
+                    source_file, track_list, arguments.format, output, False
+                )
+            )),
+            ("per track, seeking", lambda output: convert_tracks(
+                source_file, track_list, arguments.format, output, True
+            )),
+            ("one decode, 1 worker", lambda output: chapters.split_many(
+                source_file, [os.path.join(output, f"1.{arguments.format}")],
+                chapter_file, 1
+            )),
+            (
+                f"one decode, {arguments.workers} workers",
+                lambda output: chapters.split_many(
+                    source_file,
+                    [os.path.join(output, f"n.{arguments.format}")],
+                    chapter_file, arguments.workers
+                )
+            ),
+        ]
+        for name, run in runs:
+            output = tempfile.mkdtemp(dir=directory)
+            start_time = time.perf_counter()
+            run(output)
+            elapsed = time.perf_counter() - start_time
+            print(
+                f"{name:>36}: {arguments.tracks} tracks of "
+                + f"{arguments.minutes} min {arguments.source} -> "
+                + f"{arguments.format} in {elapsed:.2f}s "
+                + f"({seconds / elapsed:.0f}x realtime)"
+            )
+    return 0
+
+
+#----------------------------------------------------------------------#------#
+
+if __name__ == "__main__":
+    sys.exit(main())
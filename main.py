@@ -1,31 +1,33 @@
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QTabWidget, QVBoxLayout, QLabel,
     QHBoxLayout, QPushButton, QComboBox, QStatusBar, QFileDialog, QProgressBar,
-    QLineEdit, QGraphicsDropShadowEffect
+    QLineEdit, QGraphicsDropShadowEffect, QSpinBox, QCheckBox
+)
+from PyQt6.QtCore import (
+    QThread, pyqtSignal, QRegularExpression, Qt, QObject, QEvent, QTimer,
+    QLineF
+)
+from PyQt6.QtGui import (
+    QRegularExpressionValidator, QIcon, QPainter, QColor, QPen
 )
-from PyQt6.QtCore import QThread, pyqtSignal, QRegularExpression, Qt
-from PyQt6.QtGui import QRegularExpressionValidator, QIcon
 import sys
 import os
-import subprocess
+import math
+import queue
 import threading
-from yt_dlp import YoutubeDL
-
-#----------------------------------------------------------------------#------#
-
-if getattr(sys, 'frozen', False):
-    BASE_PATH = os.path.dirname(sys.executable)
-else:
-    BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+import time
+import functools
 
-FFMPEG_PATH = os.path.join(BASE_PATH, "assets", "ffmpeg", "bin", "ffmpeg.exe")
-FFPROBE_PATH = os.path.join(
-    BASE_PATH, "assets", "ffmpeg", "bin", "ffprobe.exe"
+from audiomorph import (
+    backends, engine, events, ingest
 )
-
-AUDIO_FORMATS = (
-    "aac", "aiff", "flac", "mp3", "m4a", "ogg", "wav"
+from audiomorph.config import (
+    AUDIO_FORMATS, BASE_PATH, DEFAULT_BACKEND, DEFAULT_WORKERS,
+    DOWNLOADS_DIRECTORY
 )
+
+#----------------------------------------------------------------------#------#
+
 filter_parts = []
 for format in AUDIO_FORMATS:
     description = format.upper() + " Files"
@@ -35,13 +37,6 @@ AUDIO_FORMATS_FILTER = (
     f"All Files (*);;{";;".join(filter_parts)}"
 )
 
-if os.name == 'nt':
-    DOWNLOADS_DIRECTORY = os.path.join(os.environ['USERPROFILE'], 'Downloads')
-elif os.name == 'posix':
-    DOWNLOADS_DIRECTORY =  os.path.join(os.path.expanduser('~'), 'Downloads')
-else:
-    DOWNLOADS_DIRECTORY = ""
-
 BORDER_COLOR = "rgb(255, 255, 255)"
 BORDER_SIZE = "2px"
 BACKGROUND_COLOR = "rgb(58, 58, 58)"
@@ -50,6 +45,82 @@ BORDER_RADIUS = "7px"
 FOCUS_BORDER_SIZE = "3px"
 FOCUS_COLOR = "rgb(137, 207, 240)"
 
+STYLE_SHEET = f"""
+    QTabBar::tab {{
+        background-color: {SECONDARY_COLOR}; 
+        border: 1px solid {BORDER_COLOR};
+        border-radius: {BORDER_RADIUS};
+        padding: 5px;
+        font-weight: bold;
+        font-size: 16px; 
+    }}
+    QTabBar::tab:focus {{
+        border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
+        outline: none;
+    }}
+
+    QTabBar::tab:selected {{
+        background-color: {BACKGROUND_COLOR};
+        border-bottom: 0px;
+        border-bottom-right-radius: 0px;
+        border-bottom-left-radius: 0px;
+        padding-left: 15px;
+        padding-right: 15px;
+    }}
+
+    QTabBar::tab:hover {{
+        background-color:rgb(255, 255, 255);
+        color: rgb(0, 0, 0);
+    }}
+
+    QWidget {{
+        background-color: {BACKGROUND_COLOR};
+        font-family: 'Dancing Script', 'Pacifico', cursive;
+        font-size: 12px;
+    }}
+
+    QPushButton {{
+        background-color: {SECONDARY_COLOR};
+        border: {BORDER_SIZE} solid {BORDER_COLOR};
+        border-radius: {BORDER_RADIUS};
+        padding: 5px;
+    }}
+
+    QPushButton:hover {{
+        background-color:rgb(255, 255, 255);
+        color: rgb(0, 0, 0);
+    }}
+
+    QPushButton:focus {{
+        border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
+        outline: none;
+    }}
+
+    QLineEdit {{
+        padding: 5px;
+        font-family: 'Dancing Script', 'Pacifico', cursive;
+        font-size: 12px;
+    }}
+
+    QLineEdit:focus {{
+        border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
+        outline: none;
+    }}
+
+    QComboBox:focus {{
+        border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
+        outline: none;
+    }}
+"""
+
+WAVEFORM_COLOR = QColor(137, 207, 240)
+RMS_COLOR = QColor(255, 255, 255)
+CLIPPED_COLOR = QColor(240, 80, 80)
+WAVEFORM_BACKGROUND_COLOR = QColor(46, 46, 46)
+CLIP_LEVEL = 0.999
+
+STARTUP_BENCHMARK = os.environ.get("AUDIOMORPH_STARTUP_BENCHMARK", "") != ""
+
 #----------------------------------------------------------------------#------#
 
 class ShadowEffect(QGraphicsDropShadowEffect):
@@ -60,22 +131,196 @@ class ShadowEffect(QGraphicsDropShadowEffect):
         self.setColor(Qt.GlobalColor.black)
 
 
+class WaveformView(QWidget):
+    # Delivered from the thread reading the peaks
+    loaded = pyqtSignal(str, object)
+    load_progress = pyqtSignal(str, int)
+
+    ZOOM_STEP = 1.25
+    COLUMNS_PER_ROW = 4
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.file_path = ""
+        self.pyramid = None
+        self.message = ""
+        self.start = 0.0
+        self.end = 0.0
+        self.drag_x = None
+        self.drag_start = 0.0
+        self.setFixedHeight(120)
+        self.setToolTip(
+            "Scroll to zoom, drag to move, double-click to see the whole "
+            + "file."
+        )
+        self.loaded.connect(self.on_loaded)
+        self.load_progress.connect(self.on_load_progress)
+
+    def load(self, file_path: str):
+        self.file_path = file_path
+        self.pyramid = None
+        self.message = "Reading Waveform..."
+        self.setVisible(True)
+        self.update()
+        threading.Thread(
+            target=self.read_peaks, args=(file_path,), daemon=True
+        ).start()
+
+    def clear(self):
+        self.file_path = ""
+        self.pyramid = None
+        self.setVisible(False)
+
+    def read_peaks(self, file_path: str):
+        from audiomorph import peaks
+
+        def progress(percent: int):
+            self.load_progress.emit(file_path, percent)
+
+        # Waits for a conversion of the same file that stores its peaks
+        try:
+            self.loaded.emit(file_path, peaks.load(file_path, progress))
+        except peaks.PeakError as error:
+            self.loaded.emit(file_path, error)
+
+    def on_load_progress(self, file_path: str, percent: int):
+        if file_path == self.file_path and self.pyramid is None:
+            self.message = f"Reading Waveform... {percent}%"
+            self.update()
+
+    def on_loaded(self, file_path: str, result):
+        # Results for files that are no longer selected are dropped
+        if file_path != self.file_path:
+            return
+        if isinstance(result, Exception):
+            self.message = "No Waveform Available"
+        else:
+            self.pyramid = result
+            self.start = 0.0
+            self.end = result.duration
+        self.update()
+
+    def level_text(self):
+        minimum, maximum, rms = self.pyramid.summary()
+        levels = []
+        for name, value in (("Peak", max(maximum, -minimum)), ("RMS", rms)):
+            if value > 0:
+                levels.append(f"{name} {20 * math.log10(value):.1f} dBFS")
+            else:
+                levels.append(f"{name} -inf dBFS")
+        return " | ".join(levels)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), WAVEFORM_BACKGROUND_COLOR)
+        painter.setPen(RMS_COLOR)
+        if self.pyramid is None:
+            painter.drawText(
+                self.rect(), Qt.AlignmentFlag.AlignCenter, self.message
+            )
+            return
+        width = self.width()
+        middle = self.height() / 2
+        # Each paint reads about one row of the pyramid per column
+        minimums, maximums, rms = self.pyramid.view(
+            self.start, self.end, width
+        )
+        peak_lines = []
+        clipped_lines = []
+        rms_lines = []
+        for x in range(width):
+            if math.isnan(maximums[x]):
+                continue
+            top = middle - min(float(maximums[x]), 1.0) * middle
+            bottom = middle - max(float(minimums[x]), -1.0) * middle
+            line = QLineF(x, top, x, max(bottom, top + 1))
+            if max(maximums[x], -minimums[x]) >= CLIP_LEVEL:
+                clipped_lines.append(line)
+            else:
+                peak_lines.append(line)
+            level = min(float(rms[x]), 1.0) * middle
+            rms_lines.append(QLineF(x, middle - level, x, middle + level))
+        painter.setPen(QPen(WAVEFORM_COLOR))
+        painter.drawLines(peak_lines)
+        painter.setPen(QPen(CLIPPED_COLOR))
+        painter.drawLines(clipped_lines)
+        painter.setPen(QPen(RMS_COLOR))
+        painter.drawLines(rms_lines)
+        painter.drawText(
+            self.rect().adjusted(4, 2, -4, -2),
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+            self.level_text()
+        )
+        painter.drawText(
+            self.rect().adjusted(4, 2, -4, -2),
+            Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignTop,
+            f"{self.start:.2f}s - {self.end:.2f}s"
+        )
+
+    def show_range(self, start: float, span: float):
+        duration = self.pyramid.duration
+        # The finest level has a row per block of frames, shown at most
+        # this many columns wide
+        shortest = self.width() * self.pyramid.block_frames / max(
+            self.pyramid.sample_rate * self.COLUMNS_PER_ROW, 1
+        )
+        span = max(min(span, duration), shortest)
+        self.start = max(min(start, duration - span), 0.0)
+        self.end = self.start + span
+        self.update()
+
+    def wheelEvent(self, event):
+        if self.pyramid is None or event.angleDelta().y() == 0:
+            return
+        span = self.end - self.start
+        position = event.position().x() / max(self.width(), 1)
+        anchor = self.start + position * span
+        if event.angleDelta().y() > 0:
+            span /= self.ZOOM_STEP
+        else:
+            span *= self.ZOOM_STEP
+        self.show_range(anchor - position * span, span)
+
+    def mousePressEvent(self, event):
+        self.drag_x = event.position().x()
+        self.drag_start = self.start
+
+    def mouseMoveEvent(self, event):
+        if self.pyramid is None or self.drag_x is None:
+            return
+        span = self.end - self.start
+        moved = (event.position().x() - self.drag_x) / max(self.width(), 1)
+        self.show_range(self.drag_start - moved * span, span)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_x = None
+
+    def mouseDoubleClickEvent(self, event):
+        if self.pyramid is not None:
+            self.show_range(0.0, self.pyramid.duration)
+
+
 class SelectFile(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
 
-        self.selected_file_path = ""
-        self.selected_file_name = ""
+        self.selected_file_paths = []
 
-        self.DEFAULT_LABEL_TEXT = "Drag and Drop a File or"
+        self.DEFAULT_LABEL_TEXT = "Drag and Drop Files, Folders or"
         self.DEFAULT_BUTTON_TEXT = "Browse Files"
+        self.FOLDER_BUTTON_TEXT = "Browse Folder"
 
         self.setAcceptDrops(True)
         self.setFixedHeight(300)
 
+        # Vertical Layout
+        self.select_layout = QVBoxLayout()
+        self.setLayout(self.select_layout)
+        self.select_layout.addStretch(1)
+
         # Horizontal Layout
         self.file_drop_layout = QHBoxLayout()
-        self.setLayout(self.file_drop_layout)
+        self.select_layout.addLayout(self.file_drop_layout)
         self.file_drop_layout.addStretch(1)
 
         # File Drop Label
@@ -89,57 +334,309 @@ class SelectFile(QWidget):
         self.browse_files.setText(self.DEFAULT_BUTTON_TEXT)
         self.browse_files.clicked.connect(self.select_file)
         self.file_drop_layout.addWidget(self.browse_files)
+
+        # Browse Folder Button
+        self.browse_folder = QPushButton(self)
+        self.browse_folder.setGraphicsEffect(ShadowEffect())
+        self.browse_folder.setText(self.FOLDER_BUTTON_TEXT)
+        self.browse_folder.setToolTip(
+            "Convert every audio file in a folder and its subfolders, "
+            + "keeping their layout in the output directory."
+        )
+        self.browse_folder.clicked.connect(self.select_folder)
+        self.file_drop_layout.addWidget(self.browse_folder)
         self.file_drop_layout.addStretch(1)
 
-    def compare_selected_file(self, file_path: str):
-        self.selected_file_name = os.path.basename(file_path)
-        self.selected_file_path = file_path
-        if file_path == "":
+        # Waveform Preview (Single Files Only)
+        self.waveform = WaveformView(self)
+        self.waveform.setVisible(False)
+        self.select_layout.addWidget(self.waveform)
+        self.select_layout.addStretch(1)
+
+    def compare_selected_files(self, file_paths: list):
+        # Folders stay folders here; they are only read once converting
+        self.selected_file_paths = file_paths
+        folders = sum(os.path.isdir(file_path) for file_path in file_paths)
+        files = len(file_paths) - folders
+        from audiomorph import peaks
+
+        if files == 1 and folders == 0 and peaks.available():
+            self.waveform.load(file_paths[0])
+        else:
+            self.waveform.clear()
+        if len(file_paths) == 0:
             self.file_drop_label.setText(self.DEFAULT_LABEL_TEXT)
             self.browse_files.setText(self.DEFAULT_BUTTON_TEXT)
+            return
+        if len(file_paths) == 1:
+            name = os.path.basename(os.path.normpath(file_paths[0]))
+            self.file_drop_label.setText(
+                f"{name} (Folder)" if folders == 1 else name
+            )
+        elif folders == 0:
+            self.file_drop_label.setText(f"{files} Files Selected")
         else:
-            self.file_drop_label.setText(self.selected_file_name)
-            self.browse_files.setText("Change Selected File")
+            self.file_drop_label.setText(
+                f"{folders} Folder(s) and {files} File(s) Selected"
+            )
+        self.browse_files.setText("Change Selected Files")
 
     def select_file(self):
         global AUDIO_FORMATS_FILTER
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "Select an Audio File", filter=AUDIO_FORMATS_FILTER
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Select Audio Files", filter=AUDIO_FORMATS_FILTER
         )
-        self.compare_selected_file(file_path)
+        self.compare_selected_files(file_paths)
+
+    def select_folder(self):
+        folder_path = QFileDialog.getExistingDirectory(
+            self, "Select a Folder to Convert"
+        )
+        if folder_path != "":
+            self.compare_selected_files([folder_path])
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
-            if os.path.isdir(event.mimeData().urls()[0].toLocalFile()):
-                event.ignore()
-            else:
-                event.acceptProposedAction()
+            for url in event.mimeData().urls():
+                if os.path.exists(url.toLocalFile()):
+                    event.acceptProposedAction()
+                    return
+            event.ignore()
 
     def dropEvent(self, event):
-        file_path = event.mimeData().urls()[0].toLocalFile()
-        self.compare_selected_file(file_path)
-        
+        file_paths = [
+            url.toLocalFile() for url in event.mimeData().urls()
+            if os.path.isfile(url.toLocalFile())
+            or os.path.isdir(url.toLocalFile())
+        ]
+        self.compare_selected_files(file_paths)
+
+
+def shutdown_scheduler():
+    # Only a scheduler that conversions started has processes to kill
+    scheduler = sys.modules.get("audiomorph.scheduler")
+    if scheduler is not None:
+        scheduler.shutdown_default_scheduler()
+
+
+class ConversionBatch(QObject):
+    # Batches of coalesced events, delivered at most every bus interval
+    progress_events = pyqtSignal(list)
+    # Files found so far, and whether the scan is over
+    scanned = pyqtSignal(int, bool)
+    success = pyqtSignal(bool)
+
+    SCAN_BUFFER_SIZE = 256
+    SCAN_REPORT_INTERVAL = 0.1
+    JOBS_PER_WORKER = 8
+
+    def __init__(
+        self, parent, sources: list, output_directory: str,
+        output_formats: list, workers: int, split: bool, backend: str,
+        tracks: bool = False
+    ):
+        super().__init__(parent)
+        self.sources = sources
+        self.output_directory = output_directory
+        self.output_formats = output_formats
+        self.workers = workers
+        self.split = split
+        self.backend = backend
+        self.tracks = tracks
+        # Only the files between the scan and the scheduler are held, so
+        # memory stays flat however large the folders are
+        self.pending_jobs = queue.Queue(self.SCAN_BUFFER_SIZE)
+        self.running = {}
+        self.names = {}
+        self.found = 0
+        self.submitted = 0
+        self.finished = 0
+        self.scanning = True
+        self.failed = False
+        self.done = False
+        self.stopped = threading.Event()
+        self.bus = events.ProgressBus()
+        self.bus.subscribe(self.progress_events.emit)
+        self.progress_events.connect(self.on_progress_events)
+        self.scanned.connect(self.on_scanned)
+
+    def start(self):
+        # asyncio and the scheduler load with the first conversion
+        from audiomorph import peaks, scheduler
+
+        # Files converted here have their waveform ready when selected
+        # again, read from the conversion's own decode
+        peaks.get_default_cache().tap_conversions = True
+        self.scheduler = scheduler.get_default_scheduler()
+        # Long files are split across the workers, so run one file at a time
+        self.scheduler.set_workers(
+            1 if self.split or self.tracks else self.workers
+        )
+        self.bus.start()
+        threading.Thread(target=self.scan, daemon=True).start()
+
+    def scan(self):
+        found = 0
+        last_report = time.monotonic()
+        try:
+            for job in ingest.conversion_jobs(
+                self.sources, self.output_directory, self.output_formats
+            ):
+                try:
+                    self.pending_jobs.put_nowait(job)
+                except queue.Full:
+                    # Wait for the GUI to take jobs, telling it there are
+                    # some in case it has not heard yet
+                    self.scanned.emit(found, False)
+                    while not self.stopped.is_set():
+                        try:
+                            self.pending_jobs.put(job, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                if self.stopped.is_set():
+                    return
+                found += 1
+                if time.monotonic() - last_report >= (
+                    self.SCAN_REPORT_INTERVAL
+                ):
+                    last_report = time.monotonic()
+                    self.scanned.emit(found, False)
+        except OSError:
+            # Output folders that cannot be created end the scan early
+            pass
+        self.scanned.emit(found, True)
+
+    def on_scanned(self, found: int, finished: bool):
+        if self.stopped.is_set():
+            return
+        self.found = found
+        self.scanning = not finished
+        self.submit_jobs()
+        self.check_finished()
+
+    def submit_jobs(self):
+        # Only a few jobs per worker are handed to the scheduler at a time,
+        # the rest follow as they finish, so its queue never fills and
+        # blocks the GUI
+        while len(self.running) < self.workers * self.JOBS_PER_WORKER:
+            if self.stopped.is_set():
+                return
+            try:
+                input_file, output_files = self.pending_jobs.get_nowait()
+            except queue.Empty:
+                return
+            from audiomorph import scheduler
+
+            if self.tracks:
+                from audiomorph import chapters
+
+                function = scheduler.blocking(
+                    chapters.split_many, input_file, output_files,
+                    workers=self.workers, backend="ffmpeg"
+                )
+            elif self.split:
+                from audiomorph import segmented
+
+                function = scheduler.blocking(
+                    segmented.convert_many, input_file, output_files,
+                    workers=self.workers, backend=self.backend
+                )
+            else:
+                function = scheduler.conversion(
+                    input_file, output_files, backend=self.backend
+                )
+            index = self.submitted
+            self.names[index] = input_file
+            self.submitted += 1
+            self.running[index] = self.scheduler.submit(
+                function, progress=self.bus.publisher(index),
+                complete=functools.partial(self.bus.finish, index)
+            )
 
-class Execute(QThread):
+    def cancel(self):
+        self.stopped.set()
+        self.scanning = False
+        self.found = self.submitted
+        while not self.pending_jobs.empty():
+            self.pending_jobs.get_nowait()
+        for job in self.running.values():
+            self.scheduler.cancel(job)
+        self.check_finished()
+
+    def on_progress_events(self, progress_events: list):
+        for event in progress_events:
+            if event.finished:
+                self.finished += 1
+                self.failed |= isinstance(event.result, Exception)
+                self.running.pop(event.job, None)
+                self.names.pop(event.job, None)
+        self.submit_jobs()
+        self.check_finished()
+
+    def check_finished(self):
+        if self.done or self.scanning or self.finished < self.submitted:
+            return
+        if not self.stopped.is_set() and not self.pending_jobs.empty():
+            return
+        self.done = True
+        self.bus.stop()
+        # After every other receiver has seen these events
+        QTimer.singleShot(0, lambda: self.success.emit(
+            not self.failed and not self.stopped.is_set()
+        ))
+
+
+class DownloadExecute(QThread):
+    entries_found = pyqtSignal(int)
+    file_exists = pyqtSignal(str)
+    progress_events = pyqtSignal(list)
     success = pyqtSignal(bool)
 
-    def __init__(self, parent, process: callable, keyword_arguments: dict):
+    def __init__(
+        self, parent, urls: list, output_file_path: str,
+        profile: engine.OutputProfile, playlist: bool, workers: int,
+        streaming: bool, split_chapters: bool = False
+    ):
         super().__init__(parent)
-        self.process = process
-        self.keyword_arguments = keyword_arguments
-    
+        self.urls = urls
+        self.output_file_path = output_file_path
+        self.profile = profile
+        self.playlist = playlist
+        self.workers = workers
+        self.streaming = streaming
+        self.split_chapters = split_chapters
+        self.bus = events.ProgressBus()
+        self.bus.subscribe(self.progress_events.emit)
+
     def run(self):
-        try:
-            self.process(**self.keyword_arguments)
-            self.success.emit(True)
-        except Exception:
-            self.success.emit(False)
+        entries = engine.expand_urls(self.urls, self.playlist)
+        # Names from a template are only known once the videos are found
+        existing = engine.existing_outputs(
+            entries, self.output_file_path, self.profile, self.split_chapters
+        )
+        if len(existing) > 0:
+            self.file_exists.emit(existing[0])
+            return
+        self.entries_found.emit(len(entries))
+        self.bus.start()
+        results = engine.download_many(
+            entries, self.output_file_path, self.profile,
+            workers=self.workers, progress=self.bus.publish,
+            complete=self.bus.finish, streaming=self.streaming,
+            split_chapters=self.split_chapters
+        )
+        self.bus.stop()
+        self.success.emit(len(results) > 0 and not any(
+            isinstance(result, Exception) for result in results
+        ))
 
 
 class AudioConverter(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
         self.setObjectName("AudioConverter")
+        self.convert_batch = None
         self.DURATION = 6000
         self.CONVERT_TEXT = "Convert"
         self.DIRECTORY_TEXT = "Select Output Directory"
@@ -177,9 +674,65 @@ class AudioConverter(QWidget):
         self.format_select.setEditable(True)
         self.format_select.setFixedHeight(30)
         self.format_select.addItems(AUDIO_FORMATS)
+        self.format_select.setToolTip(
+            "Separate several formats with commas (flac, mp3, aac) to "
+            + "export all of them from a single decode."
+        )
         self.format_layout.addWidget(self.format_select)
         self.format_layout.addStretch(1)
 
+        # Workers Horizontal Layout
+        self.workers_layout = QHBoxLayout()
+        self.base_layout.addLayout(self.workers_layout)
+        self.workers_layout.addStretch(1)
+
+        # Workers Label
+        self.workers_label = QLabel("Parallel Conversions:", self)
+        self.workers_layout.addWidget(self.workers_label)
+
+        # Workers Spin Box
+        self.workers_select = QSpinBox(self)
+        self.workers_select.setFixedHeight(30)
+        self.workers_select.setRange(1, DEFAULT_WORKERS * 4)
+        self.workers_select.setValue(DEFAULT_WORKERS)
+        self.workers_layout.addWidget(self.workers_select)
+
+        # Split Check Box
+        self.split_select = QCheckBox("Split Long Files Across Cores", self)
+        self.split_select.setToolTip(
+            "Encode long lossless files in segments on every core, one file "
+            + "at a time, and join them without gaps."
+        )
+        self.workers_layout.addWidget(self.split_select)
+
+        # Tracks Check Box
+        self.tracks_select = QCheckBox("Split Into Tracks", self)
+        self.tracks_select.setToolTip(
+            "Write each chapter, or each track of a cue sheet with the same "
+            + "name, to its own file in a folder named after the input. "
+            + "Files without them are converted whole."
+        )
+        self.workers_layout.addWidget(self.tracks_select)
+
+        # Backend Combo Box
+        self.backend_select = QComboBox(self)
+        self.backend_select.setFixedHeight(30)
+        # Backends are only loaded once picked or used, which keeps PyAV
+        # out of the window's start-up
+        for name, backend in backends.BACKENDS.items():
+            self.backend_select.addItem(name)
+            self.backend_select.setItemData(
+                self.backend_select.count() - 1, backend.description,
+                Qt.ItemDataRole.ToolTipRole
+            )
+        self.backend_select.setCurrentText(DEFAULT_BACKEND)
+        self.backend_select.setToolTip(
+            "Conversion backend. Split long files always uses FFmpeg."
+        )
+        self.backend_select.activated.connect(self.check_backend)
+        self.workers_layout.addWidget(self.backend_select)
+        self.workers_layout.addStretch(1)
+
         # Directory Horizontal Layout
         self.directory_layout = QHBoxLayout()
         self.base_layout.addLayout(self.directory_layout)
@@ -208,6 +761,13 @@ class AudioConverter(QWidget):
         self.convert_button.setGraphicsEffect(ShadowEffect())
         self.convert_button.clicked.connect(self.convert)
         self.convert_layout.addWidget(self.convert_button)
+
+        # Cancel Button
+        self.cancel_button = QPushButton("Cancel", self)
+        self.cancel_button.setGraphicsEffect(ShadowEffect())
+        self.cancel_button.setVisible(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        self.convert_layout.addWidget(self.cancel_button)
         self.convert_layout.addStretch(1)
 
         # Progress Bar
@@ -217,6 +777,11 @@ class AudioConverter(QWidget):
         self.progress_bar.setValue(0)
         self.base_layout.addWidget(self.progress_bar)
 
+        # Active Files Label
+        self.active_files_label = QLabel(self)
+        self.active_files_label.setVisible(False)
+        self.base_layout.addWidget(self.active_files_label)
+
         # Status Bar
         self.status_bar = QStatusBar(self)
         self.base_layout.addWidget(self.status_bar)
@@ -231,100 +796,165 @@ class AudioConverter(QWidget):
             self.directory_select_button.setText(self.DIRECTORY_TEXT)
         else:
             self.directory_select_button.setText(file_path.replace("\\", "/"))
+
+    def show_batch_status(self):
+        done = (
+            self.completed_files + self.failed_files + self.cancelled_files
+        )
+        total = max(self.convert_batch.found, done)
+        if total > 0:
+            self.progress_bar.setValue(int(
+                (done*100 + sum(self.active_files.values())) / total
+            ))
+        elapsed = max(time.monotonic() - self.batch_start_time, 0.001)
+        # The total only grows while folders are still being read
+        found = f"{total}+" if self.convert_batch.scanning else f"{total}"
+        message = (
+            f"{done}/{found} Files | {done / elapsed:.2f} Files/s | "
+            + f"{self.converted_seconds / elapsed:.1f}x Realtime"
+        )
+        if self.copied_files > 0:
+            message += f" | {self.copied_files} Stream Copied"
+        if self.cached_files > 0:
+            message += f" | {self.cached_files} From Cache"
+        if self.failed_files > 0:
+            message += f" | {self.failed_files} Failed"
+        if self.cancelled_files > 0:
+            message += f" | {self.cancelled_files} Cancelled"
+        self.status_bar.showMessage(message)
+        active = [
+            f"{os.path.basename(self.convert_batch.names[index])} "
+            + f"{percent}%"
+            for index, percent in self.active_files.items()
+            if index in self.convert_batch.names
+        ]
+        if len(active) > 3:
+            active = active[:3] + [f"(+{len(active) - 3} More)"]
+        self.active_files_label.setText(" | ".join(active))
+
+    def on_progress_events(self, progress_events: list):
+        from audiomorph import scheduler
+
+        for event in progress_events:
+            if not event.finished:
+                self.active_files[event.job] = event.percent
+                continue
+            self.active_files.pop(event.job, None)
+            if isinstance(event.result, scheduler.JobCancelled):
+                self.cancelled_files += 1
+                continue
+            if isinstance(event.result, Exception):
+                self.failed_files += 1
+                continue
+            self.completed_files += 1
+            self.converted_seconds += event.result[0].duration
+            for output in event.result:
+                self.copied_files += output.mode == engine.COPY_MODE
+                self.cached_files += output.mode == engine.CACHED_MODE
+        self.show_batch_status()
         
     def on_complete(self, success: bool):
-        if success:
+        total = self.convert_batch.found
+        elapsed = max(time.monotonic() - self.batch_start_time, 0.001)
+        if total == 0 and not self.convert_batch.stopped.is_set():
+            self.status_bar.showMessage(
+                "No audio files found in the selected folders", self.DURATION
+            )
+        elif success:
+            self.status_bar.showMessage(
+                f"Successfully Converted {total} File(s) in {elapsed:.1f}s "
+                + f"({self.converted_seconds / elapsed:.1f}x Realtime, "
+                + f"{self.copied_files} Stream Copied, "
+                + f"{self.cached_files} From Cache)",
+                self.DURATION
+            )
+        elif self.failed_files == 0:
             self.status_bar.showMessage(
-                "Successfully Converted", self.DURATION
+                f"Cancelled: {self.completed_files} of {total} File(s) "
+                + "Converted",
+                self.DURATION
             )
         else:
             self.status_bar.showMessage(
-                "ERROR: 1) Validate your file. 2) Validate your format. "
+                f"ERROR: {self.failed_files} of {total} File(s) Failed. "
+                + "1) Validate your file. 2) Validate your format. "
                 + "3) Validate your directory. 4) Ensure FFmpeg compatibility",
                 self.DURATION
             )
         self.progress_bar.setVisible(False)
         self.progress_bar.setValue(0)
-        self.convert_thread = None
+        self.active_files_label.setVisible(False)
+        self.active_files_label.setText("")
+        self.convert_batch = None
+        self.cancel_button.setVisible(False)
         self.convert_button.setVisible(True)
+
+    def cancel(self):
+        if self.convert_batch is not None:
+            self.cancel_button.setEnabled(False)
+            self.convert_batch.cancel()
     
-    def run_command(self, input_file: str, output_file: str):
-        result = subprocess.run([
-                FFPROBE_PATH, "-show_entries", "format=duration", "-of",
-                "default=noprint_wrappers=1:nokey=1", input_file
-            ],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        total_length_ms = float(result.stdout.strip())*1000000
-        process = None
-        event = threading.Event()
-
-        def run():
-            nonlocal process
-            process = subprocess.Popen([
-                    FFMPEG_PATH, '-i', input_file, "-progress", "pipe:1", 
-                    "-stats_period", "0.05", "-loglevel", "-8", "-y", 
-                    output_file
-                ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            event.set()
-
-        thread = threading.Thread(target=run)
-        thread.start()
-        event.wait()
-        for lines in process.stdout:
-            line = lines.strip().split("=")
-            if line[0] == "out_time_ms":
-                self.progress_bar.setValue(
-                    int((int(line[1])/total_length_ms)*100)
-                )
-        if not os.path.exists(output_file):
-            raise Exception
+    def backend_error(self, name: str):
+        try:
+            backends.get_backend(name)
+        except backends.BackendError as error:
+            return str(error)
+        return None
+
+    def check_backend(self, index: int):
+        error = self.backend_error(self.backend_select.itemText(index))
+        if error is not None:
+            self.status_bar.showMessage(error, self.DURATION)
+            self.backend_select.setCurrentText(DEFAULT_BACKEND)
 
     def convert(self):
-        if self.file_drop.selected_file_path == "":
+        if len(self.file_drop.selected_file_paths) == 0:
             self.status_bar.showMessage("Select a file", self.DURATION)
             return
-        if self.format_select.currentText() == "":
+        output_formats = engine.parse_formats(self.format_select.currentText())
+        if len(output_formats) == 0:
             self.status_bar.showMessage("Select a format", self.DURATION)
             return
         if self.selected_output_directory_path == "":
             self.status_bar.showMessage("Select a directory", self.DURATION)
             return
+        # Splitting always runs FFmpeg, whatever backend is selected
+        if not self.split_select.isChecked() and not (
+            self.tracks_select.isChecked()
+        ):
+            error = self.backend_error(self.backend_select.currentText())
+            if error is not None:
+                self.status_bar.showMessage(error, self.DURATION)
+                return
         self.convert_button.setVisible(False)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setVisible(True)
         self.progress_bar.setVisible(True)
-        file_name_without_extension = os.path.splitext(
-            self.file_drop.selected_file_name
-        )[0]
-        output_file_path = os.path.join(
-            self.selected_output_directory_path, 
-            f"{file_name_without_extension}.{self.format_select.currentText()}"
+        self.active_files_label.setVisible(True)
+        self.active_files = {}
+        self.completed_files = 0
+        self.copied_files = 0
+        self.cached_files = 0
+        self.failed_files = 0
+        self.cancelled_files = 0
+        self.converted_seconds = 0.0
+        self.batch_start_time = time.monotonic()
+        self.convert_batch = ConversionBatch(
+            self, self.file_drop.selected_file_paths,
+            self.selected_output_directory_path, output_formats,
+            self.workers_select.value(), self.split_select.isChecked(),
+            self.backend_select.currentText(), self.tracks_select.isChecked()
         )
-        output_file_path = output_file_path.replace("\\", "/")
-        self.convert_thread = Execute(self, self.run_command, {
-            "input_file": self.file_drop.selected_file_path,
-            "output_file": output_file_path
-        })
-        self.convert_thread.success.connect(self.on_complete)
-        self.convert_thread.start()
-
-
-class MyLogger:
-    def debug(self, msg):
-        pass
-    def info(self, msg):
-        pass
-    def warning(self, msg):
-        pass
-    def error(self, msg):
-        pass
+        self.convert_batch.progress_events.connect(self.on_progress_events)
+        self.convert_batch.scanned.connect(self.show_batch_status)
+        self.convert_batch.success.connect(self.on_complete)
+        self.convert_batch.start()
 
 
 class YouTubeDownloader(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
 
-        self.OUTPUT_FORMAT = "flac"
         self.DURATION = 6000
         self.DOWNLOAD_TEXT = "Download"
         self.DIRECTORY_TEXT = "Select Output Directory"
@@ -346,9 +976,49 @@ class YouTubeDownloader(QWidget):
         self.base_layout.addStretch(1)
 
         self.line_edit = QLineEdit(self)
-        self.line_edit.setPlaceholderText("Enter a YouTube video link.")
+        self.line_edit.setPlaceholderText(
+            "Enter YouTube video or playlist links, separated by spaces."
+        )
         self.base_layout.addWidget(self.line_edit)
 
+        # Workers Horizontal Layout
+        self.workers_layout = QHBoxLayout()
+        self.base_layout.addLayout(self.workers_layout)
+        self.workers_layout.addStretch(1)
+
+        # Playlist Check Box
+        self.playlist_select = QCheckBox("Download Playlists", self)
+        self.playlist_select.setChecked(True)
+        self.workers_layout.addWidget(self.playlist_select)
+
+        # Streaming Check Box
+        self.streaming_select = QCheckBox("Encode While Downloading", self)
+        self.streaming_select.setToolTip(
+            "Pipe the download straight into FFmpeg instead of saving it "
+            + "first. Falls back for fragmented streams."
+        )
+        self.workers_layout.addWidget(self.streaming_select)
+
+        # Chapters Check Box
+        self.chapters_select = QCheckBox("Split Into Chapters", self)
+        self.chapters_select.setToolTip(
+            "Write each chapter of a video to its own file in a folder named "
+            + "after it. Videos are then saved before they are encoded."
+        )
+        self.workers_layout.addWidget(self.chapters_select)
+
+        # Workers Label
+        self.workers_label = QLabel("Parallel Downloads:", self)
+        self.workers_layout.addWidget(self.workers_label)
+
+        # Workers Spin Box
+        self.workers_select = QSpinBox(self)
+        self.workers_select.setFixedHeight(30)
+        self.workers_select.setRange(1, 16)
+        self.workers_select.setValue(engine.DEFAULT_DOWNLOAD_WORKERS)
+        self.workers_layout.addWidget(self.workers_select)
+        self.workers_layout.addStretch(1)
+
         # Directory Horizontal Layout
         self.directory_layout = QHBoxLayout()
         self.base_layout.addLayout(self.directory_layout)
@@ -373,13 +1043,36 @@ class YouTubeDownloader(QWidget):
                 )
             )
         )
+        self.file_name.setPlaceholderText("Video Title")
         self.directory_layout.addWidget(self.file_name)
 
         # File Extension Label
-        self.file_extension_label = QLabel("." + self.OUTPUT_FORMAT, self)
+        self.file_extension_label = QLabel(self)
         self.directory_layout.addWidget(self.file_extension_label)
         self.directory_layout.addStretch(1)
 
+        # Profile Horizontal Layout
+        self.profile_layout = QHBoxLayout()
+        self.base_layout.addLayout(self.profile_layout)
+        self.profile_layout.addStretch(1)
+
+        # Profile Label
+        self.profile_label = QLabel("Output Profile:", self)
+        self.profile_layout.addWidget(self.profile_label)
+
+        # Profile Combo Box
+        self.profile_select = QComboBox(self)
+        self.profile_select.setFixedHeight(30)
+        self.profile_select.addItems(engine.DOWNLOAD_PROFILES)
+        self.profile_select.setToolTip(
+            "Original Audio keeps the downloaded stream as it is and only "
+            + "changes its container."
+        )
+        self.profile_select.currentTextChanged.connect(self.on_profile_changed)
+        self.profile_layout.addWidget(self.profile_select)
+        self.profile_layout.addStretch(1)
+        self.on_profile_changed(self.profile_select.currentText())
+
         self.base_layout.addStretch(1)
 
         # Download Horizontal Layout
@@ -418,10 +1111,41 @@ class YouTubeDownloader(QWidget):
                 file_path.replace("\\", "/") + "/"
             )
 
+    def selected_profile(self):
+        return engine.DOWNLOAD_PROFILES[self.profile_select.currentText()]
+
+    def on_profile_changed(self, name: str):
+        extensions = engine.output_extensions(engine.DOWNLOAD_PROFILES[name])
+        if len(extensions) == 1:
+            self.file_extension_label.setText(f".{extensions[0]}")
+        else:
+            self.file_extension_label.setText(".*")
+
+    def on_entries_found(self, count: int):
+        self.download_percentages = [0] * count
+        self.completed_downloads = 0
+        self.failed_downloads = 0
+        self.status_bar.showMessage(f"Downloading {count} Video(s)")
+
+    def on_progress_events(self, progress_events: list):
+        for event in progress_events:
+            self.download_percentages[event.job] = event.percent
+            if event.finished and isinstance(event.result, Exception):
+                self.failed_downloads += 1
+            elif event.finished:
+                self.completed_downloads += 1
+        total = len(self.download_percentages)
+        self.progress_bar.setValue(int(sum(self.download_percentages) / total))
+        message = f"{self.completed_downloads}/{total} Downloaded"
+        if self.failed_downloads > 0:
+            message += f" | {self.failed_downloads} Failed"
+        self.status_bar.showMessage(message)
+
     def on_complete(self, success: bool):
         if success:
             self.status_bar.showMessage(
-                "Successfully Downloaded", self.DURATION
+                f"Successfully Downloaded {self.completed_downloads} "
+                + "Video(s)", self.DURATION
             )
         else:
             self.status_bar.showMessage(
@@ -436,71 +1160,53 @@ class YouTubeDownloader(QWidget):
         self.download_thread = None
         self.download_button.setVisible(True)
 
-    def run_command(self, url: str, output_file_path: str): 
-        def progress_hook(download):
-            if download['status'] == 'downloading':
-                self.progress_bar.setValue(
-                    int(
-                        download["downloaded_bytes"] * 100
-                        / download["total_bytes"]
-                    )
-                )
-
-        download_options = {
-            "progress_hooks": [progress_hook],
-            "format": "bestaudio/best",
-            "outtmpl": output_file_path + ".%(ext)s",
-            "ffmpeg_location": FFMPEG_PATH,
-            "postprocessors": [{
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": self.OUTPUT_FORMAT,
-                "preferredquality": "0",
-            }],
-            "quiet": True,
-            "no_warnings": True,
-            "logtostderr": True, 
-            "logger": MyLogger(),
-            "noplaylist": True
-        }
-        with YoutubeDL(download_options) as downloader:
-            downloader.download([url])
-
-        if not os.path.exists(output_file_path + ".flac"):
-            raise Exception
+    def on_file_exists(self, existing_name: str):
+        self.progress_bar.setVisible(False)
+        self.progress_bar.setValue(0)
+        self.download_thread = None
+        self.download_button.setVisible(True)
+        self.status_bar.showMessage(
+            f"File already exists: {existing_name}", self.DURATION
+        )
 
     def download(self):
-        if self.line_edit.text() == "":
+        urls = self.line_edit.text().split()
+        if len(urls) == 0:
             self.status_bar.showMessage("Type in a link", self.DURATION)
             return
         if self.selected_output_directory_path == "":
             self.status_bar.showMessage("Select a directory", self.DURATION)
             return
-        if self.file_name.text() == "":
-            self.status_bar.showMessage("Type in a name", self.DURATION)
-            return
         self.download_button.setVisible(False)
         self.progress_bar.setVisible(True)
         output_file_path = self.selected_output_directory_path.replace(
             "\\", "/"
         )
-        full_output_path = f"{output_file_path}/{self.file_name.text()}"
-        existing_name = f"{full_output_path}.{self.OUTPUT_FORMAT}"
-        if os.path.exists(existing_name):
-            self.progress_bar.setVisible(False)
-            self.progress_bar.setValue(0)
-            self.download_button.setVisible(True)
-            self.status_bar.showMessage(
-                f"File already exists: {existing_name}", self.DURATION
-            )
-            return
-        self.download_thread = Execute(self, self.run_command, {
-            "url": self.line_edit.text(),
-            "output_file_path": full_output_path,
-        })
+        name = self.file_name.text() or "%(title)s [%(id)s]"
+        full_output_path = f"{output_file_path}/{name}"
+        self.completed_downloads = 0
+        self.download_thread = DownloadExecute(
+            self, urls, full_output_path, self.selected_profile(),
+            self.playlist_select.isChecked(), self.workers_select.value(),
+            self.streaming_select.isChecked(),
+            self.chapters_select.isChecked()
+        )
+        self.download_thread.entries_found.connect(self.on_entries_found)
+        self.download_thread.file_exists.connect(self.on_file_exists)
+        self.download_thread.progress_events.connect(self.on_progress_events)
         self.download_thread.success.connect(self.on_complete)
         self.download_thread.start()
 
 
+class FirstPaintProbe(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            print("AUDIOMORPH_FIRST_PAINT", flush=True)
+            QTimer.singleShot(0, QApplication.instance().quit)
+        return False
+
+
 class AudioMorph(QApplication):
     def __init__(self, argv):
         super().__init__(argv)
@@ -509,6 +1215,7 @@ class AudioMorph(QApplication):
         self.main_window = QMainWindow()
         self.main_window.setWindowTitle("AudioMorph")
         self.main_window.setMinimumSize(400, 500)
+        self.main_window.setStyleSheet(STYLE_SHEET)
         self.setWindowIcon(
             QIcon(os.path.join(BASE_PATH, "assets", "Icon.png"))
         )
@@ -521,79 +1228,40 @@ class AudioMorph(QApplication):
         self.audio_converter_tab = AudioConverter(self.tabs)
         self.tabs.addTab(self.audio_converter_tab, "Audio Converter")
 
-        # YouTube Audio Downloader
-        self.YouTube_downloader = YouTubeDownloader(self.tabs)
-        self.tabs.addTab(self.YouTube_downloader, "YouTube Downloader")
-
-        self.main_window.setStyleSheet(f"""
-            QTabBar::tab {{
-                background-color: {SECONDARY_COLOR}; 
-                border: 1px solid {BORDER_COLOR};
-                border-radius: {BORDER_RADIUS};
-                padding: 5px;
-                font-weight: bold;
-                font-size: 16px; 
-            }}
-            QTabBar::tab:focus {{
-                border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
-                outline: none;
-            }}
-
-            QTabBar::tab:selected {{
-                background-color: {BACKGROUND_COLOR};
-                border-bottom: 0px;
-                border-bottom-right-radius: 0px;
-                border-bottom-left-radius: 0px;
-                padding-left: 15px;
-                padding-right: 15px;
-            }}
-
-            QTabBar::tab:hover {{
-                background-color:rgb(255, 255, 255);
-                color: rgb(0, 0, 0);
-            }}
-
-            QWidget {{
-                background-color: {BACKGROUND_COLOR};
-                font-family: 'Dancing Script', 'Pacifico', cursive;
-                font-size: 12px;
-            }}
-
-            QPushButton {{
-                background-color: {SECONDARY_COLOR};
-                border: {BORDER_SIZE} solid {BORDER_COLOR};
-                border-radius: {BORDER_RADIUS};
-                padding: 5px;
-            }}
-
-            QPushButton:hover {{
-                background-color:rgb(255, 255, 255);
-                color: rgb(0, 0, 0);
-            }}
-
-            QPushButton:focus {{
-                border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
-                outline: none;
-            }}
-
-            QLineEdit {{
-                padding: 5px;
-                font-family: 'Dancing Script', 'Pacifico', cursive;
-                font-size: 12px;
-            }}
-
-            QLineEdit:focus {{
-                border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
-                outline: none;
-            }}
-
-            QComboBox:focus {{
-                border: {FOCUS_BORDER_SIZE} solid {FOCUS_COLOR};
-                outline: none;
-            }}
-        """)
+        # YouTube Audio Downloader (Built When First Selected)
+        self.YouTube_downloader = None
+        self.YouTube_downloader_tab = QWidget(self.tabs)
+        self.YouTube_downloader_layout = QVBoxLayout()
+        self.YouTube_downloader_layout.setContentsMargins(0, 0, 0, 0)
+        self.YouTube_downloader_tab.setLayout(self.YouTube_downloader_layout)
+        self.tabs.addTab(self.YouTube_downloader_tab, "YouTube Downloader")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+
+        # Kills any FFmpeg processes still running when the window closes
+        self.aboutToQuit.connect(shutdown_scheduler)
+
+        # Tracing and profiling are set through the AUDIOMORPH_ variables;
+        # the metrics endpoint starts with the window when a port is set
+        from audiomorph import metrics
+
+        if metrics.METRICS_PORT > 0:
+            metrics.get_default_recorder()
+
+        if STARTUP_BENCHMARK:
+            self.first_paint_probe = FirstPaintProbe(self)
+            self.main_window.installEventFilter(self.first_paint_probe)
         self.main_window.show()
 
+    def on_tab_changed(self, index: int):
+        if (
+            self.YouTube_downloader is None
+            and self.tabs.widget(index) is self.YouTube_downloader_tab
+        ):
+            self.YouTube_downloader = YouTubeDownloader(
+                self.YouTube_downloader_tab
+            )
+            self.YouTube_downloader_layout.addWidget(self.YouTube_downloader)
+
 
 #----------------------------------------------------------------------#------#
  
@@ -0,0 +1,9 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Results, probes and peaks are cached away from the user's own cache
+CACHE_HOME = tempfile.mkdtemp(prefix="audiomorph-tests-")
+os.environ["XDG_CACHE_HOME"] = CACHE_HOME
+atexit.register(shutil.rmtree, CACHE_HOME, True)
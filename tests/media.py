@@ -0,0 +1,44 @@
+import shutil
+import subprocess
+
+import pytest
+
+from audiomorph.config import FFMPEG_PATH, FFPROBE_PATH
+
+#----------------------------------------------------------------------#------#
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which(FFMPEG_PATH) is None or shutil.which(FFPROBE_PATH) is None,
+    reason="FFmpeg is not installed"
+)
+
+
+def make_source(
+    path: str, seconds: float, sample_rate: int = 44100, channels: int = 2,
+    arguments: tuple = ()
+):
+    # Loud pink noise, with an odd number of frames
+    subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-y", "-f", "lavfi", "-i",
+            f"anoisesrc=d={seconds}:c=pink:a=1:r={sample_rate}",
+            "-ac", str(channels), "-frames:a",
+            str(int(seconds * sample_rate) | 1), *arguments, path
+        ], check=True
+    )
+    return path
+
+
+def describe(path: str):
+    # The stream's format and the MD5 of its samples, not of the headers
+    stream = subprocess.run([
+            FFPROBE_PATH, "-v", "error", "-select_streams", "a:0",
+            "-show_entries", "stream=codec_name,sample_rate,channels",
+            "-of", "csv=p=0", path
+        ], stdout=subprocess.PIPE, text=True, check=True
+    ).stdout.strip()
+    samples = subprocess.run([
+            FFMPEG_PATH, "-v", "error", "-i", path, "-map", "0:a", "-c",
+            "copy", "-f", "md5", "-"
+        ], stdout=subprocess.PIPE, text=True, check=True
+    ).stdout.strip()
+    return stream, samples
@@ -0,0 +1,20 @@
+import pytest
+
+from audiomorph import backends, conformance
+from tests.media import requires_ffmpeg
+
+#----------------------------------------------------------------------#------#
+
+pytestmark = requires_ffmpeg
+
+
+@pytest.mark.parametrize("check", conformance.CHECKS)
+@pytest.mark.parametrize("backend", backends.available_backends())
+def test_conformance(tmp_path, backend, check):
+    checks = dict(conformance.Conformance(backend, str(tmp_path)).checks())
+    checks[check]()
+
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(backends.BackendError):
+        backends.get_backend("missing")
@@ -0,0 +1,18 @@
+from audiomorph import ingest
+
+#----------------------------------------------------------------------#------#
+
+
+def test_output_directory_inside_a_source_is_not_read(tmp_path):
+    for name in ("in/song.wav", "in/out/in/song.flac", "in/sub/other.wav"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"")
+    jobs = sorted(ingest.conversion_jobs(
+        [str(tmp_path / "in")], str(tmp_path / "in" / "out"), ["flac"]
+    ))
+    assert jobs == [
+        (str(tmp_path / "in" / "song.wav"),
+            [str(tmp_path / "in" / "out" / "in" / "song.flac")]),
+        (str(tmp_path / "in" / "sub" / "other.wav"),
+            [str(tmp_path / "in" / "out" / "in" / "sub" / "other.flac")]),
+    ]
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from audiomorph import engine, pcm
+from tests.media import describe, make_source, requires_ffmpeg
+
+#----------------------------------------------------------------------#------#
+
+pytestmark = [
+    requires_ffmpeg,
+    pytest.mark.skipif(not pcm.available(), reason="NumPy is not installed")
+]
+
+SOURCES = [
+    ("wav", "pcm_u8", 2, 44100),
+    ("wav", "pcm_s16le", 1, 44100),
+    ("wav", "pcm_s24le", 2, 48000),
+    ("wav", "pcm_s32le", 6, 48000),
+    ("wav", "pcm_f32le", 2, 44100),
+    ("wav", "pcm_f64le", 2, 22050),
+    ("aiff", "pcm_s8", 1, 8000),
+    ("aiff", "pcm_s16be", 2, 44100),
+    ("aiff", "pcm_s24be", 2, 88200),
+    ("aiff", "pcm_s32be", 1, 48000),
+]
+DOWNMIX_SOURCES = [
+    ("wav", "pcm_u8"),
+    ("wav", "pcm_s16le"),
+    ("wav", "pcm_s24le"),
+    ("wav", "pcm_s32le"),
+    ("wav", "pcm_f32le"),
+    ("wav", "pcm_f64le"),
+    ("aiff", "pcm_s16be"),
+    ("aiff", "pcm_s24be"),
+    ("aiff", "pcm_s32be"),
+]
+
+
+def convert_ffmpeg(input_file: str, output_file: str, channels: int = None):
+    plan = engine.plan_conversion(
+        input_file, [output_file], False, channels=channels
+    )
+    engine.finish_conversion(
+        plan, engine.run_ffmpeg(plan.arguments, plan.duration)
+    )
+
+
+@pytest.mark.parametrize("output_format", ["wav", "aiff"])
+@pytest.mark.parametrize("container, codec, channels, sample_rate", SOURCES)
+def test_native_matches_ffmpeg(
+    tmp_path, container, codec, channels, sample_rate, output_format
+):
+    # Float sources are made loud enough to clip on the way to integers
+    source_file = make_source(
+        str(tmp_path / f"source.{container}"), 0.5, sample_rate, channels,
+        ("-af", "volume=1.5", "-c:a", codec)
+    )
+    native_file = str(tmp_path / f"native.{output_format}")
+    ffmpeg_file = str(tmp_path / f"ffmpeg.{output_format}")
+    results = engine.convert_native(source_file, [native_file])
+    convert_ffmpeg(source_file, ffmpeg_file)
+    assert results is not None
+    assert describe(native_file) == describe(ffmpeg_file)
+
+
+@pytest.mark.parametrize("output_format", ["wav", "aiff"])
+@pytest.mark.parametrize("container, codec", DOWNMIX_SOURCES)
+def test_native_downmix_matches_ffmpeg(
+    tmp_path, container, codec, output_format
+):
+    # Different channels, so that their sum is odd about half the time
+    source_file = make_source(
+        str(tmp_path / f"source.{container}"), 0.5, arguments=(
+            "-af", "aeval=val(0)|val(0)*sin(3000*t),volume=1.5",
+            "-c:a", codec
+        )
+    )
+    native_file = str(tmp_path / f"native.{output_format}")
+    ffmpeg_file = str(tmp_path / f"ffmpeg.{output_format}")
+    results = engine.convert_native(source_file, [native_file], channels=1)
+    convert_ffmpeg(source_file, ffmpeg_file, 1)
+    assert [result.mode for result in results] == [engine.NATIVE_MODE]
+    assert describe(native_file) == describe(ffmpeg_file)
+    assert describe(native_file)[0].endswith(",1")
+
+
+def test_other_channel_changes_are_left_to_ffmpeg(tmp_path):
+    source_file = make_source(str(tmp_path / "source.wav"), 0.5)
+    output_file = str(tmp_path / "output.wav")
+    results = engine.convert_native(source_file, [output_file], channels=6)
+    assert results is None
+    assert not os.path.exists(output_file)
+
+
+def test_tagged_source_is_left_to_ffmpeg(tmp_path):
+    source_file = make_source(
+        str(tmp_path / "source.wav"), 0.5,
+        arguments=("-metadata", "title=Song")
+    )
+    output_file = str(tmp_path / "output.aiff")
+    assert engine.convert_native(source_file, [output_file]) is None
+    assert not os.path.exists(output_file)
@@ -0,0 +1,23 @@
+from audiomorph import results
+
+#----------------------------------------------------------------------#------#
+
+
+def test_hits_and_misses_outlive_the_process(tmp_path):
+    def open_cache():
+        return results.ResultCache(
+            str(tmp_path / "results.sqlite3"), str(tmp_path / "results")
+        )
+
+    converted_file = tmp_path / "converted.mp3"
+    converted_file.write_bytes(b"audio")
+    cache = open_cache()
+    assert not cache.fetch("key", str(tmp_path / "first.mp3"))
+    cache.store("key", str(converted_file))
+    assert cache.fetch("key", str(tmp_path / "second.mp3"))
+
+    statistics = open_cache().statistics()
+    assert (statistics["hits"], statistics["misses"]) == (1, 1)
+    cache.clear()
+    statistics = open_cache().statistics()
+    assert (statistics["hits"], statistics["misses"]) == (0, 0)
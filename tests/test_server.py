@@ -0,0 +1,186 @@
+import hashlib
+import http.client
+import json
+import os
+
+import pytest
+
+from audiomorph import server
+from tests.media import describe, make_source, requires_ffmpeg
+
+#----------------------------------------------------------------------#------#
+
+pytestmark = requires_ffmpeg
+
+TOKEN = "secret"
+OTHER_TOKEN = "other"
+CLIENT = "token-" + hashlib.sha256(TOKEN.encode("utf-8")).hexdigest()[:12]
+
+
+@pytest.fixture
+def start_server(tmp_path):
+    job_servers = []
+
+    def start(**options):
+        job_server = server.JobServer(
+            str(tmp_path / "server"), 2, tokens=[TOKEN, OTHER_TOKEN],
+            use_cache=False, **options
+        )
+        job_servers.append(job_server)
+        return job_server, job_server.start(0)
+
+    yield start
+    for job_server in job_servers:
+        job_server.close()
+
+
+def request(
+    port: int, method: str, path: str, body=None, headers: dict = None,
+    token: str = TOKEN
+):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    connection.request(method, path, body, {
+        "Authorization": f"Bearer {token}", **(headers or {})
+    })
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+
+def upload(port: int, source_file: str, query: str):
+    with open(source_file, "rb") as source:
+        return request(port, "POST", f"/jobs?{query}", source.read())
+
+
+def follow(port: int, job_id: int):
+    # Every event of the job's stream, up to the one it finished with
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    connection.request(
+        "GET", f"/jobs/{job_id}/events",
+        headers={"Authorization": f"Bearer {TOKEN}"}
+    )
+    response = connection.getresponse()
+    assert response.status == 200
+    events = [
+        json.loads(line[6:]) for line in response
+        if line.startswith(b"data: ")
+    ]
+    connection.close()
+    return events
+
+
+def test_upload_events_download(tmp_path, start_server):
+    source_file = make_source(str(tmp_path / "song.wav"), 1)
+    _, port = start_server()
+    status, data = upload(port, source_file, "name=song.wav&format=flac")
+    assert status == 201
+    job_id = json.loads(data)["id"]
+    events = follow(port, job_id)
+    job = events[-1]
+    assert job["status"] == "done"
+    assert [output["name"] for output in job["files"]] == ["song.flac"]
+
+    status, data = request(port, "GET", job["files"][0]["url"])
+    assert status == 200
+    assert len(data) == job["files"][0]["size"]
+    output_file = tmp_path / "song.flac"
+    output_file.write_bytes(data)
+    assert describe(str(output_file))[0] == "flac,44100,2"
+
+    # Nor does anybody else
+    for path in (f"/jobs/{job_id}", job["files"][0]["url"]):
+        assert request(port, "GET", path, token=OTHER_TOKEN)[0] == 404
+    assert request(port, "GET", path, token="wrong")[0] == 401
+
+
+def test_restart_requeues_jobs(tmp_path, start_server):
+    source_file = make_source(str(tmp_path / "song.wav"), 1)
+    # Nothing runs with no slots per client, so both jobs are left waiting
+    job_server, port = start_server(per_client=0)
+    job_ids = []
+    for output_format in ("mp3", "flac"):
+        query = f"name=song.wav&format={output_format}"
+        status, data = upload(port, source_file, query)
+        assert status == 201
+        job_ids.append(json.loads(data)["id"])
+    job_server.close()
+    # One of them was running when the server stopped
+    server.JobStore(str(tmp_path / "server" / "jobs.sqlite3")).start(
+        job_ids[0]
+    )
+
+    _, port = start_server()
+    for job_id in job_ids:
+        assert follow(port, job_id)[-1]["status"] == "done"
+
+
+def test_higher_priority_runs_first(tmp_path, start_server):
+    source_file = make_source(str(tmp_path / "song.wav"), 1)
+    job_server, port = start_server(per_client=0)
+    job_ids = []
+    for priority in ("10", ""):
+        query = f"name=song.wav&format=flac&priority={priority}"
+        status, data = upload(port, source_file, query)
+        assert status == 201
+        job_ids.append(json.loads(data)["id"])
+    # The later job, with the default priority 0, is queued first
+    positions = [
+        json.loads(request(port, "GET", f"/jobs/{job_id}")[1])["position"]
+        for job_id in job_ids
+    ]
+    assert positions == [1, 0]
+    query = "name=song.wav&format=flac&priority=high"
+    assert upload(port, source_file, query)[0] == 400
+    job_server.close()
+
+    # One job at a time, in priority order after the restart too
+    _, port = start_server(per_client=1)
+    jobs = [follow(port, job_id)[-1] for job_id in job_ids]
+    assert [job["status"] for job in jobs] == ["done", "done"]
+    assert [job["priority"] for job in jobs] == [10, 0]
+    assert jobs[1]["finished"] <= jobs[0]["started"]
+
+
+def test_formats_cannot_leave_the_job_directory(tmp_path, start_server):
+    source_file = make_source(str(tmp_path / "song.wav"), 1)
+    _, port = start_server(input_directory=str(tmp_path))
+    for query in (
+        "name=song.wav&format=../../../escape",
+        "name=song.wav&format=mp3,/tmp/escape",
+    ):
+        assert upload(port, source_file, query)[0] == 400
+    for body in (
+        {"input": "song.wav", "formats": ["../escape"]},
+        {"type": "download", "url": "http://127.0.0.1/", "format": "../x"},
+    ):
+        status, _ = request(
+            port, "POST", "/jobs", json.dumps(body),
+            {"Content-Type": "application/json"}
+        )
+        assert status == 400
+    assert request(port, "GET", "/jobs/1/files/../../jobs.sqlite3")[0] == 404
+    assert not any(
+        name.startswith("escape") for name in os.listdir(tmp_path)
+    )
+
+
+def test_stored_formats_cannot_leave_the_job_directory(
+    tmp_path, start_server
+):
+    # A job queued before formats were checked is refused when it runs
+    source_file = make_source(str(tmp_path / "song.wav"), 1)
+    os.makedirs(tmp_path / "server")
+    store = server.JobStore(str(tmp_path / "server" / "jobs.sqlite3"))
+    job_id = store.add(CLIENT, "", {
+        "type": "convert", "input": source_file,
+        "formats": ["../../../../escape"], "dither": False,
+        "tracks": False, "backend": None
+    })
+    _, port = start_server()
+    job = follow(port, job_id)[-1]
+    assert job["status"] == "failed"
+    assert "outside" in job["error"]
+    assert not any(
+        name.startswith("escape") for name in os.listdir(tmp_path)
+    )
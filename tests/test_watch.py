@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from audiomorph import watch
+from tests.media import make_source, requires_ffmpeg
+
+#----------------------------------------------------------------------#------#
+
+pytestmark = requires_ffmpeg
+
+
+def make_watcher(tmp_path, output_directory: str):
+    return watch.Watcher(
+        [str(tmp_path / "in")], output_directory, ["flac"], workers=1,
+        settle_seconds=0, polling=True, use_cache=False,
+        state=watch.WatchState(str(tmp_path / "watch.sqlite3"))
+    )
+
+
+def test_subdirectories_keep_their_place(tmp_path):
+    for name in ("top.wav", "a/b/deep.wav", ".hidden/skipped.wav"):
+        os.makedirs(os.path.dirname(tmp_path / "in" / name), exist_ok=True)
+        make_source(str(tmp_path / "in" / name), 0.5)
+    make_watcher(tmp_path, str(tmp_path / "out")).run(once=True)
+    outputs = sorted(
+        os.path.relpath(os.path.join(directory, name), tmp_path / "out")
+        for directory, _, names in os.walk(tmp_path / "out")
+        for name in names
+    )
+    assert outputs == ["a/b/deep.flac", "top.flac"]
+
+
+def test_outputs_inside_a_watched_directory_are_refused(tmp_path):
+    os.makedirs(tmp_path / "in")
+    with pytest.raises(watch.WatchError):
+        make_watcher(tmp_path, str(tmp_path / "in" / "out"))